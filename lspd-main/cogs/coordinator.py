@@ -0,0 +1,48 @@
+import asyncio
+from discord.ext import commands, tasks
+from datetime import datetime
+
+# Importa a camada de coordenação entre instâncias (advisory locks + LISTEN/NOTIFY)
+from coordination import invalidation_listener, refresh_leadership, notify_resync, close_leadership
+from config import INSTANCE_ID, LEADER_ELECTION_INTERVAL_SECONDS
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+class CoordinatorCog(commands.Cog):
+    """Mantém a ligação de invalidação de caches e a eleição de líder das tarefas singleton."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._led_jobs = set()
+
+    async def cog_load(self):
+        self.coordination_task.start()
+
+    async def cog_unload(self):
+        self.coordination_task.cancel()
+        invalidation_listener.stop()
+        await asyncio.to_thread(close_leadership)
+
+    @tasks.loop(seconds=LEADER_ELECTION_INTERVAL_SECONDS)
+    async def coordination_task(self):
+        # (Re)liga o listener de invalidação se a ligação ainda não existe ou caiu.
+        if not invalidation_listener.running:
+            try:
+                await invalidation_listener.start()
+                # Notificações perdidas enquanto não havia ligação: ressincroniza todas as caches.
+                notify_resync()
+            except Exception as e:
+                print(log_message("ERROR", f"Falha ao ligar o listener de invalidação: {e}", "❌"))
+
+        led_jobs = await asyncio.to_thread(refresh_leadership)
+        if led_jobs != self._led_jobs:
+            lost = self._led_jobs - led_jobs
+            if lost:
+                print(log_message("WARNING", f"Instância {INSTANCE_ID} perdeu a liderança de: {', '.join(sorted(lost))}", "⚠️"))
+            self._led_jobs = led_jobs
+
+async def setup(bot):
+    await bot.add_cog(CoordinatorCog(bot))
@@ -0,0 +1,114 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import time
+from collections import Counter, deque
+
+# Importa as configurações do perfil de execução
+from config import LEAN_MODE, GATEWAY_EVENT_METRICS
+from runtime_profile import enabled_intent_names, process_rss_bytes
+from loop_watchdog import watchdog
+from outbound import outbound
+from database import replica_status
+
+# Janela (em segundos) usada para calcular a taxa de eventos do gateway
+EVENT_RATE_WINDOW_SECONDS = 60
+
+class DiagnosticsCog(commands.Cog):
+    """
+    Diagnóstico do processo: memória, tamanho das caches do discord.py e ritmo de eventos do gateway.
+    Serve para comparar o modo normal com o modo lean (LEAN_MODE).
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.started_at = time.monotonic()
+        self.event_totals = Counter()
+        # Um contador por segundo: (segundo, eventos) dos últimos EVENT_RATE_WINDOW_SECONDS segundos
+        self._event_buckets = deque()
+
+    async def cog_load(self):
+        # O evento socket_event_type é emitido para todos os eventos do gateway (não precisa de enable_debug_events)
+        if GATEWAY_EVENT_METRICS:
+            self.bot.add_listener(self._count_gateway_event, 'on_socket_event_type')
+
+    async def cog_unload(self):
+        self.bot.remove_listener(self._count_gateway_event, 'on_socket_event_type')
+
+    async def _count_gateway_event(self, event_type: str):
+        self.event_totals[event_type] += 1
+        second = int(time.monotonic())
+        if self._event_buckets and self._event_buckets[-1][0] == second:
+            self._event_buckets[-1][1] += 1
+        else:
+            self._event_buckets.append([second, 1])
+        while self._event_buckets and self._event_buckets[0][0] <= second - EVENT_RATE_WINDOW_SECONDS:
+            self._event_buckets.popleft()
+
+    def event_rate(self) -> float:
+        """Eventos do gateway por segundo, na última janela de EVENT_RATE_WINDOW_SECONDS segundos."""
+        now = int(time.monotonic())
+        recent = sum(count for second, count in self._event_buckets if second > now - EVENT_RATE_WINDOW_SECONDS)
+        window = min(EVENT_RATE_WINDOW_SECONDS, max(1.0, time.monotonic() - self.started_at))
+        return recent / window
+
+    @commands.hybrid_command(name="runtime", help="Mostra a memória, as caches, o ritmo de eventos do gateway e o lag do event loop deste processo.")
+    @commands.has_permissions(administrator=True)
+    @app_commands.default_permissions(administrator=True)
+    async def runtime_command(self, ctx):
+        """
+        Mostra o perfil de execução atual: intents, memória residente, caches, eventos do gateway e lag do event loop.
+        """
+        rss = process_rss_bytes()
+        cached_members = sum(len(guild.members) for guild in self.bot.guilds)
+
+        embed = discord.Embed(title="🧭 Perfil de Execução", color=discord.Color.dark_teal())
+        embed.add_field(name="Modo", value="`lean`" if LEAN_MODE else "`completo`", inline=True)
+        embed.add_field(name="Memória (RSS)", value=f"`{rss / (1024 * 1024):.1f} MiB`" if rss else "`indisponível`", inline=True)
+        embed.add_field(name="Servidores", value=f"`{len(self.bot.guilds)}`", inline=True)
+        embed.add_field(name="Utilizadores em cache", value=f"`{len(self.bot.users)}`", inline=True)
+        embed.add_field(name="Membros em cache", value=f"`{cached_members}`", inline=True)
+        embed.add_field(name="Shards", value=f"`{self.bot.shard_count or 1}`", inline=True)
+        embed.add_field(name="Intents", value=f"`{', '.join(enabled_intent_names(self.bot.intents))}`", inline=False)
+
+        lag = watchdog.lag_stats()
+        embed.add_field(
+            name="Lag do event loop",
+            value=f"Atual `{lag['current_ms']} ms`, p50 `{lag['p50_ms']} ms`, p99 `{lag['p99_ms']} ms`, máx. `{lag['max_ms']} ms`\n"
+                  f"Bloqueios acima de {watchdog.threshold * 1000:.0f} ms: `{watchdog.stall_count}`",
+            inline=False
+        )
+        pending = ", ".join(f"{lane}: {count}" for lane, count in outbound.pending().items())
+        embed.add_field(
+            name="Fila de saída",
+            value=f"Pendentes `{pending}`\nExecutados `{sum(outbound.stats[lane] for lane in outbound.pending())}`, juntados `{outbound.stats['coalesced']}`, falhados `{outbound.stats['failed']}`",
+            inline=False
+        )
+        replica = replica_status()
+        if replica:
+            lag_text = f"{replica['lag_seconds']:.1f}s" if replica['lag_seconds'] is not None else "?"
+            value = f"`{replica['state']}`, atraso `{lag_text}` (tolerância `{replica['max_lag_seconds']:.0f}s`)"
+            if replica['error']:
+                value += f"\nÚltimo erro: `{replica['error'][:200]}`"
+            embed.add_field(name="Réplica de leitura", value=value, inline=False)
+        if watchdog.blocking_calls:
+            top_calls = "\n".join(f"{count}× {site}" for site, count in watchdog.blocking_calls.most_common(3))
+            embed.add_field(name="Chamadas síncronas à base de dados no loop", value=f"```{top_calls[:1000]}```", inline=False)
+
+        if GATEWAY_EVENT_METRICS:
+            top_events = ", ".join(f"{name}: {count}" for name, count in self.event_totals.most_common(5)) or "nenhum"
+            embed.add_field(
+                name="Eventos do gateway",
+                value=f"`{self.event_rate():.2f}/s` (últimos {EVENT_RATE_WINDOW_SECONDS}s), `{sum(self.event_totals.values())}` no total\nMais frequentes: `{top_events}`",
+                inline=False
+            )
+        else:
+            embed.add_field(name="Eventos do gateway", value="`contagem desativada (GATEWAY_EVENT_METRICS)`", inline=False)
+        await ctx.send(embed=embed)
+
+
+async def setup(bot):
+    """
+    Função necessária para que o Discord.py possa carregar este cog.
+    """
+    await bot.add_cog(DiagnosticsCog(bot))
@@ -0,0 +1,123 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import re
+import asyncio
+from datetime import datetime
+
+# Importa a cache de configurações por servidor
+from guild_config import (
+    CHANNEL_KEYS, ROLE_KEYS, TICKET_CATEGORIES_KEY, TICKET_MODERATOR_ROLES_KEY,
+    get_guild_config, set_guild_settings, reset_guild_setting
+)
+from config import TICKET_CATEGORIES
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+def _parse_ids(value: str) -> list[int]:
+    """Extrai IDs numéricos de um texto (aceita IDs simples e menções como <#123> ou <@&123>)."""
+    return [int(match) for match in re.findall(r'\d{15,20}', value)]
+
+class GuildSettingsCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.hybrid_group(name="config", fallback="mostrar", invoke_without_command=True, help="Mostra a configuração deste servidor.")
+    @commands.has_permissions(administrator=True)
+    @commands.guild_only()
+    @app_commands.default_permissions(administrator=True)
+    async def config_group(self, ctx: commands.Context):
+        config = get_guild_config(ctx.guild.id)
+        embed = discord.Embed(title=f"⚙️ Configuração de {ctx.guild.name}", color=discord.Color.blue())
+        for key in CHANNEL_KEYS:
+            embed.add_field(name=key, value=f"<#{config[key]}>" if config[key] else "`não definido`", inline=True)
+        for key in ROLE_KEYS:
+            embed.add_field(name=key, value=f"<@&{config[key]}>" if config[key] else "`não definido`", inline=True)
+        for label, _, emoji, _ in TICKET_CATEGORIES:
+            category_id = config[TICKET_CATEGORIES_KEY].get(label)
+            role_ids = config[TICKET_MODERATOR_ROLES_KEY].get(label, [])
+            roles = " ".join(f"<@&{role_id}>" for role_id in role_ids) or "`nenhum`"
+            embed.add_field(
+                name=f"{emoji} {label}",
+                value=f"Categoria: {f'`{category_id}`' if category_id else '`não definida`'}\nModeradores: {roles}",
+                inline=False
+            )
+        embed.set_footer(text="Use !config set <chave> <valor>, !config categoria <label> <id>, !config moderadores <label> <cargos...> ou !config reset <chave>.")
+        await ctx.send(embed=embed)
+
+    @config_group.command(name="set", description="Define um canal ou cargo para este servidor.", help="Define um canal ou cargo para este servidor. Uso: !config set <chave> <id|menção>")
+    @commands.has_permissions(administrator=True)
+    @commands.guild_only()
+    async def config_set(self, ctx: commands.Context, key: str, *, value: str):
+        if key not in CHANNEL_KEYS and key not in ROLE_KEYS:
+            await ctx.send(f"Chave inválida. Chaves disponíveis: {', '.join(f'`{k}`' for k in CHANNEL_KEYS + ROLE_KEYS)}")
+            return
+
+        ids = _parse_ids(value)
+        if len(ids) != 1:
+            await ctx.send("Indique exatamente um ID (ou menção) de canal/cargo.")
+            return
+
+        if await asyncio.to_thread(set_guild_settings, ctx.guild.id, {key: ids[0]}):
+            await ctx.send(f"✅ `{key}` definido para `{ids[0]}` neste servidor.")
+            print(log_message("INFO", f"{ctx.author} definiu {key}={ids[0]} em {ctx.guild.name} ({ctx.guild.id})", "⚙️"))
+        else:
+            await ctx.send("❌ Erro ao guardar a configuração na base de dados.")
+
+    @config_group.command(name="categoria", description="Define a categoria do Discord para um tipo de ticket.", help="Define o ID da categoria do Discord para um tipo de ticket. Uso: !config categoria <label> <id>")
+    @commands.has_permissions(administrator=True)
+    @commands.guild_only()
+    async def config_category(self, ctx: commands.Context, label: str, category: discord.CategoryChannel):
+        if label not in {cat[0] for cat in TICKET_CATEGORIES}:
+            await ctx.send(f"Label inválido. Labels disponíveis: {', '.join(f'`{cat[0]}`' for cat in TICKET_CATEGORIES)}")
+            return
+
+        categories = dict(get_guild_config(ctx.guild.id)[TICKET_CATEGORIES_KEY])
+        categories[label] = category.id
+        if await asyncio.to_thread(set_guild_settings, ctx.guild.id, {TICKET_CATEGORIES_KEY: categories}):
+            await ctx.send(f"✅ Categoria de `{label}` definida para **{category.name}**.")
+            print(log_message("INFO", f"{ctx.author} definiu categoria '{label}'={category.id} em {ctx.guild.name} ({ctx.guild.id})", "⚙️"))
+        else:
+            await ctx.send("❌ Erro ao guardar a configuração na base de dados.")
+
+    @config_group.command(name="moderadores", description="Define os cargos moderadores de um tipo de ticket.", help="Define os cargos moderadores de um tipo de ticket. Uso: !config moderadores <label> <cargos...>")
+    @commands.has_permissions(administrator=True)
+    @commands.guild_only()
+    async def config_moderators(self, ctx: commands.Context, label: str, *, roles: str):
+        if label not in {cat[0] for cat in TICKET_CATEGORIES}:
+            await ctx.send(f"Label inválido. Labels disponíveis: {', '.join(f'`{cat[0]}`' for cat in TICKET_CATEGORIES)}")
+            return
+
+        role_ids = _parse_ids(roles)
+        if not role_ids:
+            await ctx.send("Indique pelo menos um cargo (ID ou menção).")
+            return
+
+        moderator_roles = dict(get_guild_config(ctx.guild.id)[TICKET_MODERATOR_ROLES_KEY])
+        moderator_roles[label] = role_ids
+        if await asyncio.to_thread(set_guild_settings, ctx.guild.id, {TICKET_MODERATOR_ROLES_KEY: moderator_roles}):
+            await ctx.send(f"✅ Moderadores de `{label}`: {' '.join(f'<@&{role_id}>' for role_id in role_ids)}")
+            print(log_message("INFO", f"{ctx.author} definiu moderadores de '{label}'={role_ids} em {ctx.guild.name} ({ctx.guild.id})", "⚙️"))
+        else:
+            await ctx.send("❌ Erro ao guardar a configuração na base de dados.")
+
+    @config_group.command(name="reset", description="Volta a usar o valor padrão de uma chave.", help="Volta a usar o valor padrão de uma chave. Uso: !config reset <chave>")
+    @commands.has_permissions(administrator=True)
+    @commands.guild_only()
+    async def config_reset(self, ctx: commands.Context, key: str):
+        valid_keys = CHANNEL_KEYS + ROLE_KEYS + (TICKET_CATEGORIES_KEY, TICKET_MODERATOR_ROLES_KEY)
+        if key not in valid_keys:
+            await ctx.send(f"Chave inválida. Chaves disponíveis: {', '.join(f'`{k}`' for k in valid_keys)}")
+            return
+
+        if await asyncio.to_thread(reset_guild_setting, ctx.guild.id, key):
+            await ctx.send(f"✅ `{key}` voltou ao valor padrão.")
+            print(log_message("INFO", f"{ctx.author} repôs {key} em {ctx.guild.name} ({ctx.guild.id})", "⚙️"))
+        else:
+            await ctx.send("❌ Erro ao guardar a configuração na base de dados.")
+
+async def setup(bot):
+    await bot.add_cog(GuildSettingsCog(bot))
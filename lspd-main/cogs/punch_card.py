@@ -1,12 +1,21 @@
 import discord
-from discord.ext import commands
+from discord import app_commands
+from discord.ext import commands, tasks
 import os
-from datetime import datetime
+import asyncio
+from datetime import datetime, timezone
 
-# Importa funções do módulo database
-from database import record_punch_in, record_punch_out
+# As picagens passam pelo journal local (confirmadas de imediato e reaplicadas no PostgreSQL em segundo plano)
+import punch_journal
+# Ranking de horas em memória, atualizado a cada saída de serviço
+from leaderboard import leaderboard
+# Fila de saída para o Discord (os logs seguem com prioridade baixa e são juntados por canal)
+from outbound import outbound, Priority
 # Importa configurações do módulo config
-from config import PUNCH_CHANNEL_ID, PUNCH_MESSAGE_FILE, PUNCH_LOGS_CHANNEL_ID, ROLE_ID
+from config import PUNCH_MESSAGE_FILE, PUNCH_JOURNAL_REPLAY_INTERVAL_SECONDS
+# Configurações por servidor (canais e cargos resolvidos pelo ID do servidor)
+from guild_config import get_guild_config, set_guild_settings
+from startup_profiler import startup_profiler
 
 # Função auxiliar para formatar logs
 def log_message(level: str, message: str, emoji: str = "") -> str:
@@ -24,16 +33,27 @@ class PunchCardView(discord.ui.View):
         member = interaction.user
         current_time_str = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
 
-        success = record_punch_in(member.id, member.display_name)
+        success, coalesced = await self.cog.run_punch_operation(
+            member.id, interaction.guild_id, 'in', punch_journal.punch_in, member.id, member.display_name, interaction.guild_id
+        )
+        if coalesced:
+            # Clique repetido enquanto o primeiro ainda estava em curso: mesma resposta, sem novo log
+            if success:
+                await interaction.response.send_message(f"Você entrou em serviço em: {current_time_str}", ephemeral=True)
+            else:
+                await interaction.response.send_message("Você já está em serviço! Utilize o botão de 'Sair' para registrar sua saída.", ephemeral=True)
+            return
         if success:
+            self.cog.schedule_replay()
             await interaction.response.send_message(f"Você entrou em serviço em: {current_time_str}", ephemeral=True)
             print(log_message("INFO", f"{member.display_name} ({member.id}) entrou em serviço", "🟢"))
-            logs_channel = self.cog.bot.get_channel(PUNCH_LOGS_CHANNEL_ID)
+            logs_channel_id = get_guild_config(interaction.guild_id)['punch_logs_channel_id']
+            logs_channel = self.cog.bot.get_channel(logs_channel_id)
             if logs_channel:
                 log_message_text = f"🟢 **{member.display_name}** (`{member.id}`) entrou em serviço em: `{current_time_str}`."
-                await logs_channel.send(log_message_text)
+                outbound.send(logs_channel, log_message_text, priority=Priority.LOG, coalesce=True)
             else:
-                print(log_message("ERROR", f"Canal de logs com ID {PUNCH_LOGS_CHANNEL_ID} não encontrado", "❌"))
+                print(log_message("ERROR", f"Canal de logs com ID {logs_channel_id} não encontrado", "❌"))
         else:
             await interaction.response.send_message("Você já está em serviço! Utilize o botão de 'Sair' para registrar sua saída.", ephemeral=True)
             print(log_message("WARNING", f"{member.display_name} ({member.id}) tentou entrar em serviço, mas já está em serviço", "⚠️"))
@@ -43,20 +63,31 @@ class PunchCardView(discord.ui.View):
         member = interaction.user
         current_time_str = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
 
-        success, time_diff = record_punch_out(member.id)
+        (success, time_diff, session_id), coalesced = await self.cog.run_punch_operation(
+            member.id, interaction.guild_id, 'out', punch_journal.punch_out, member.id, interaction.guild_id
+        )
         if success:
             total_seconds = int(time_diff.total_seconds())
             hours, remainder = divmod(total_seconds, 3600)
             minutes, seconds = divmod(remainder, 60)
             formatted_time_diff = f"{hours}h {minutes}m {seconds}s"
             await interaction.response.send_message(f"Você saiu de serviço em: {current_time_str}. Tempo em serviço: {formatted_time_diff}", ephemeral=True)
+            if coalesced:
+                # Clique repetido enquanto o primeiro ainda estava em curso: mesma resposta, sem novo log
+                return
+            self.cog.schedule_replay()
+            leaderboard.record_session(
+                session_id, interaction.guild_id, member.id, member.display_name,
+                datetime.now(timezone.utc) - time_diff, time_diff.total_seconds()
+            )
             print(log_message("INFO", f"{member.display_name} ({member.id}) saiu de serviço. Tempo: {formatted_time_diff}", "🔴"))
-            logs_channel = self.cog.bot.get_channel(PUNCH_LOGS_CHANNEL_ID)
+            logs_channel_id = get_guild_config(interaction.guild_id)['punch_logs_channel_id']
+            logs_channel = self.cog.bot.get_channel(logs_channel_id)
             if logs_channel:
                 log_message_text = f"🔴 **{member.display_name}** (`{member.id}`) saiu de serviço em: `{current_time_str}`. Tempo total: `{formatted_time_diff}`."
-                await logs_channel.send(log_message_text)
+                outbound.send(logs_channel, log_message_text, priority=Priority.LOG, coalesce=True)
             else:
-                print(log_message("ERROR", f"Canal de logs com ID {PUNCH_LOGS_CHANNEL_ID} não encontrado", "❌"))
+                print(log_message("ERROR", f"Canal de logs com ID {logs_channel_id} não encontrado", "❌"))
         else:
             await interaction.response.send_message("Você não está em serviço! Utilize o botão de 'Entrar' para registrar sua entrada.", ephemeral=True)
             print(log_message("WARNING", f"{member.display_name} ({member.id}) tentou sair de serviço, mas não está em serviço", "⚠️"))
@@ -65,56 +96,129 @@ class PunchCardView(discord.ui.View):
 class PunchCardCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self._punch_message_id = None
+        self._replay_lock = asyncio.Lock()
+        # Picagens em curso por utilizador: {(user_id, guild_id, operação): Future com o resultado}
+        self._inflight_punches: dict[tuple, asyncio.Future] = {}
+        # Um lock por utilizador para serializar entradas e saídas do mesmo oficial
+        self._user_punch_locks: dict[tuple, asyncio.Lock] = {}
+        self.coalesced_punches = 0
+
+    async def cog_load(self):
+        await asyncio.to_thread(punch_journal.initialize)
+        self.replay_journal_task.start()
+        # A View é persistente (custom_id fixo), por isso atende os botões de todos os servidores.
+        # Registada aqui (e não no on_ready) para que um !reload a substitua pela do novo cog sem esperar por um on_ready.
+        self.bot.add_view(PunchCardView(self))
+
+    async def cog_unload(self):
+        self.replay_journal_task.cancel()
+
+    async def _replay_journal(self):
+        """Aplica as picagens pendentes do journal no PostgreSQL (uma reaplicação de cada vez)."""
+        if self._replay_lock.locked():
+            return
+        async with self._replay_lock:
+            applied, remaining = await asyncio.to_thread(punch_journal.replay_pending)
+            if remaining:
+                print(log_message("WARNING", f"Journal de picagens: {applied} aplicada(s), {remaining} ainda pendente(s)", "📒"))
+
+    async def run_punch_operation(self, user_id: int, guild_id: int | None, operation: str, func, *args):
+        """
+        Executa a picagem (função bloqueante) numa thread, serializada por utilizador.
+        Cliques repetidos na mesma operação enquanto a primeira ainda está em curso não fazem um novo
+        pedido: esperam pelo mesmo resultado. Retorna (resultado, coalesced), onde coalesced indica
+        se o resultado veio de uma operação já em curso.
+        """
+        key = (user_id, guild_id, operation)
+        inflight = self._inflight_punches.get(key)
+        if inflight is not None:
+            self.coalesced_punches += 1
+            return await asyncio.shield(inflight), True
 
-    async def _load_punch_message_id(self):
-        """Carrega o ID da mensagem de picagem de ponto de um arquivo."""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_punches[key] = future
+        user_key = (user_id, guild_id)
+        lock = self._user_punch_locks.setdefault(user_key, asyncio.Lock())
+        try:
+            async with lock:
+                result = await asyncio.to_thread(func, *args)
+            future.set_result(result)
+            return result, False
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Marca a exceção como lida quando não há cliques repetidos à espera
+            raise
+        finally:
+            del self._inflight_punches[key]
+            if not lock.locked() and not any(k[:2] == user_key for k in self._inflight_punches):
+                self._user_punch_locks.pop(user_key, None)
+
+    def schedule_replay(self):
+        """Pede uma reaplicação imediata do journal, sem atrasar a resposta ao utilizador."""
+        asyncio.create_task(self._replay_journal())
+
+    @tasks.loop(seconds=PUNCH_JOURNAL_REPLAY_INTERVAL_SECONDS)
+    async def replay_journal_task(self):
+        # Recupera as picagens que ficaram no journal durante uma falha da base de dados
+        await self._replay_journal()
+
+    def _get_punch_message_id(self, guild_id: int | None) -> int | None:
+        """Retorna o ID da mensagem de picagem de ponto do servidor (guardado em guild_settings)."""
+        return get_guild_config(guild_id)['punch_message_id']
+
+    def _load_legacy_punch_message_id(self) -> int | None:
+        """Lê o ID do arquivo antigo (anterior ao armazenamento por servidor), apenas para migração."""
         try:
             with open(PUNCH_MESSAGE_FILE, 'r') as f:
-                self._punch_message_id = int(f.read().strip())
-            print(log_message("INFO", f"ID da mensagem de ponto carregado: {self._punch_message_id}", "📄"))
+                return int(f.read().strip())
         except (FileNotFoundError, ValueError):
-            self._punch_message_id = None
-            print(log_message("WARNING", f"Arquivo {PUNCH_MESSAGE_FILE} não encontrado ou inválido", "⚠️"))
+            return None
 
-    async def _save_punch_message_id(self, message_id: int):
-        """Salva o ID da mensagem de picagem de ponto em um arquivo."""
-        self._punch_message_id = message_id
-        with open(PUNCH_MESSAGE_FILE, 'w') as f:
-            f.write(str(message_id))
-        print(log_message("INFO", f"ID da mensagem de ponto salvo: {self._punch_message_id}", "💾"))
+    async def _save_punch_message_id(self, guild_id: int, message_id: int):
+        """Salva o ID da mensagem de picagem de ponto do servidor na base de dados (partilhado entre instâncias)."""
+        if await asyncio.to_thread(set_guild_settings, guild_id, {'punch_message_id': message_id}):
+            print(log_message("INFO", f"ID da mensagem de ponto salvo: {message_id} (servidor {guild_id})", "💾"))
+        else:
+            print(log_message("ERROR", f"Falha ao salvar ID da mensagem de ponto {message_id} (servidor {guild_id})", "❌"))
 
     @commands.Cog.listener()
     async def on_ready(self):
         print(log_message("INFO", "PunchCardCog está pronto", "✅"))
-        await self._load_punch_message_id()
-
-        if self._punch_message_id:
-            try:
-                channel = self.bot.get_channel(PUNCH_CHANNEL_ID)
-                if channel:
-                    await channel.fetch_message(self._punch_message_id)
-                    self.bot.add_view(PunchCardView(self))
-                    print(log_message("INFO", f"View de picagem de ponto persistente adicionada para mensagem ID: {self._punch_message_id}", "🔗"))
-                else:
-                    print(log_message("WARNING", f"Canal de picagem de ponto (ID: {PUNCH_CHANNEL_ID}) não encontrado para re-associar a View", "⚠️"))
-                    self._punch_message_id = None
-            except discord.NotFound:
-                print(log_message("WARNING", f"Mensagem de picagem de ponto (ID: {self._punch_message_id}) não encontrada, será recriada no próximo setup", "⚠️"))
-                self._punch_message_id = None
-            except Exception as e:
-                print(log_message("ERROR", f"Erro ao re-associar a View de picagem de ponto: {e}", "❌"))
-                self._punch_message_id = None
-
-    @commands.command(name="setuppunch", help="Envia a mensagem de picagem de ponto para o canal configurado.")
+        with startup_profiler.phase("view_reattach:punch_card"):
+            legacy_message_id = self._load_legacy_punch_message_id()
+            for guild in self.bot.guilds:
+                message_id = self._get_punch_message_id(guild.id) or legacy_message_id
+                if not message_id:
+                    continue
+                channel = self.bot.get_channel(get_guild_config(guild.id)['punch_channel_id'])
+                if channel is None or channel.guild.id != guild.id:
+                    print(log_message("WARNING", f"Canal de picagem de ponto não encontrado em {guild.name} para re-associar a View", "⚠️"))
+                    continue
+                try:
+                    await channel.fetch_message(message_id)
+                    if not self._get_punch_message_id(guild.id):
+                        # Migra o ID do arquivo antigo para a configuração do servidor onde a mensagem existe
+                        await self._save_punch_message_id(guild.id, message_id)
+                    print(log_message("INFO", f"View de picagem de ponto persistente adicionada para mensagem ID: {message_id} ({guild.name})", "🔗"))
+                except discord.NotFound:
+                    if message_id != legacy_message_id:
+                        print(log_message("WARNING", f"Mensagem de picagem de ponto (ID: {message_id}) não encontrada em {guild.name}, será recriada no próximo setup", "⚠️"))
+                except Exception as e:
+                    print(log_message("ERROR", f"Erro ao re-associar a View de picagem de ponto em {guild.name}: {e}", "❌"))
+
+    @commands.hybrid_command(name="setuppunch", help="Envia a mensagem de picagem de ponto para o canal configurado.")
     @commands.has_permissions(administrator=True)
+    @app_commands.default_permissions(administrator=True)
     async def setup_punch_message(self, ctx: commands.Context):
         await ctx.defer(ephemeral=True)
 
-        channel = self.bot.get_channel(PUNCH_CHANNEL_ID)
+        guild_id = ctx.guild.id if ctx.guild else None
+        punch_channel_id = get_guild_config(guild_id)['punch_channel_id']
+        punch_message_id = self._get_punch_message_id(guild_id)
+        channel = self.bot.get_channel(punch_channel_id)
         if not channel:
-            await ctx.send(f"Erro: Canal de picagem de ponto com ID {PUNCH_CHANNEL_ID} não encontrado.", ephemeral=True)
-            print(log_message("ERROR", f"Canal de picagem de ponto (ID: {PUNCH_CHANNEL_ID}) não encontrado para comando !setuppunch por {ctx.author.display_name} ({ctx.author.id})", "❌"))
+            await ctx.send(f"Erro: Canal de picagem de ponto com ID {punch_channel_id} não encontrado.", ephemeral=True)
+            print(log_message("ERROR", f"Canal de picagem de ponto (ID: {punch_channel_id}) não encontrado para comando !setuppunch por {ctx.author.display_name} ({ctx.author.id})", "❌"))
             return
 
         embed = discord.Embed(
@@ -133,20 +237,20 @@ class PunchCardCog(commands.Cog):
         view = PunchCardView(self)
 
         try:
-            if self._punch_message_id:
-                message = await channel.fetch_message(self._punch_message_id)
-                await message.edit(embed=embed, view=view)
+            if punch_message_id:
+                message = await channel.fetch_message(punch_message_id)
+                await outbound.edit(message, embed=embed, view=view)
                 await ctx.send("Mensagem de picagem de ponto atualizada com sucesso!", ephemeral=True)
-                print(log_message("INFO", f"Mensagem de picagem de ponto atualizada (ID: {self._punch_message_id}) por {ctx.author.display_name} ({ctx.author.id})", "🔄"))
+                print(log_message("INFO", f"Mensagem de picagem de ponto atualizada (ID: {punch_message_id}) por {ctx.author.display_name} ({ctx.author.id})", "🔄"))
             else:
-                message = await channel.send(embed=embed, view=view)
-                await self._save_punch_message_id(message.id)
+                message = await outbound.send(channel, embed=embed, view=view)
+                await self._save_punch_message_id(guild_id, message.id)
                 await ctx.send("Mensagem de picagem de ponto enviada com sucesso!", ephemeral=True)
                 print(log_message("INFO", f"Mensagem de picagem de ponto enviada (ID: {message.id}) por {ctx.author.display_name} ({ctx.author.id})", "📩"))
         except discord.NotFound:
-            print(log_message("WARNING", f"Mensagem de picagem de ponto (ID: {self._punch_message_id}) não encontrada, recriando...", "⚠️"))
-            message = await channel.send(embed=embed, view=view)
-            await self._save_punch_message_id(message.id)
+            print(log_message("WARNING", f"Mensagem de picagem de ponto (ID: {punch_message_id}) não encontrada, recriando...", "⚠️"))
+            message = await outbound.send(channel, embed=embed, view=view)
+            await self._save_punch_message_id(guild_id, message.id)
             await ctx.send("Mensagem de picagem de ponto recriada com sucesso!", ephemeral=True)
             print(log_message("INFO", f"Mensagem de picagem de ponto recriada (ID: {message.id}) por {ctx.author.display_name} ({ctx.author.id})", "📩"))
         except Exception as e:
@@ -0,0 +1,108 @@
+import discord
+from discord.ext import commands, tasks
+from discord import app_commands
+import asyncio
+from datetime import datetime
+
+# Ranking de horas em memória (semana e mês correntes)
+from leaderboard import leaderboard, PERIODS
+from coordination import register_invalidation_handler, unregister_invalidation_handler
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+def format_duration(seconds: float) -> str:
+    hours, remainder = divmod(int(seconds), 3600)
+    return f"{hours}h {remainder // 60:02d}m"
+
+RANKING_SIZE = 10
+# Notificações que pedem uma reconstrução completa (ressincronização, importação, limpeza) seguidas são agrupadas
+REBUILD_DEBOUNCE_SECONDS = 5
+MEDALS = {1: "🥇", 2: "🥈", 3: "🥉"}
+
+class RankingCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self._rebuild_lock = asyncio.Lock()
+        self._scheduled_rebuild: asyncio.Task | None = None
+
+    async def cog_load(self):
+        # Sessões terminadas noutra instância: somadas ao ranking local (ou reconstrução, numa ressincronização)
+        register_invalidation_handler('punches', self._on_punches_invalidated)
+        self.rollover_task.start()
+
+    async def cog_unload(self):
+        unregister_invalidation_handler('punches', self._on_punches_invalidated)
+        self.rollover_task.cancel()
+        if self._scheduled_rebuild:
+            self._scheduled_rebuild.cancel()
+
+    def _on_punches_invalidated(self, payload: dict):
+        """Executado numa thread pelo listener de invalidações."""
+        if payload.get('session_id'):
+            leaderboard.record_session(
+                payload['session_id'], payload.get('guild_id'), payload['user_id'], payload.get('username'),
+                datetime.fromisoformat(payload['punch_in_time']), payload['seconds']
+            )
+        elif payload.get('op') != 'in':
+            # As entradas em serviço não mudam o ranking; o resto (ressincronização, importação, limpeza) reconstrói
+            self.bot.loop.call_soon_threadsafe(self._schedule_rebuild)
+
+    def _schedule_rebuild(self):
+        if self._scheduled_rebuild is None or self._scheduled_rebuild.done():
+            self._scheduled_rebuild = asyncio.create_task(self._debounced_rebuild())
+
+    async def _debounced_rebuild(self):
+        await asyncio.sleep(REBUILD_DEBOUNCE_SECONDS)
+        # Uma notificação que chegue a partir daqui agenda outra reconstrução (que espera por esta no lock)
+        self._scheduled_rebuild = None
+        await self.rebuild()
+
+    async def rebuild(self):
+        # Uma reconstrução de cada vez; as sessões somadas entretanto são conciliadas pelo próprio leaderboard
+        async with self._rebuild_lock:
+            try:
+                await asyncio.to_thread(leaderboard.rebuild, [guild.id for guild in self.bot.guilds])
+            except Exception as e:
+                print(log_message("ERROR", f"Erro ao reconstruir o ranking de horas, nova tentativa em 1 minuto: {e}", "❌"))
+
+    @tasks.loop(minutes=1)
+    async def rollover_task(self):
+        # Constrói o ranking no arranque e reconstrói-o quando começa uma nova semana ou mês
+        if leaderboard.needs_rollover():
+            await self.rebuild()
+
+    @rollover_task.before_loop
+    async def before_rollover_task(self):
+        await self.bot.wait_until_ready()
+
+    @app_commands.command(name="ranking", description="Ranking de horas de serviço da semana ou do mês atual.")
+    @app_commands.describe(periodo="Período do ranking (padrão: semana atual).")
+    @app_commands.choices(periodo=[app_commands.Choice(name=label, value=key) for key, label in PERIODS.items()])
+    @app_commands.guild_only()
+    async def ranking_command(self, interaction: discord.Interaction, periodo: app_commands.Choice[str] = None):
+        period = periodo.value if periodo else 'semana'
+        if not leaderboard.ready:
+            await interaction.response.send_message("O ranking ainda está a ser carregado. Tente novamente dentro de momentos.", ephemeral=True)
+            return
+
+        top = leaderboard.top(period, interaction.guild_id, RANKING_SIZE)
+        embed = discord.Embed(title=f"🏆 Ranking de Horas — {PERIODS[period]}", color=discord.Color.gold())
+        if top:
+            embed.description = "\n".join(
+                f"{MEDALS.get(position, f'`{position}.`')} **{username}** — `{format_duration(seconds)}`"
+                for position, (user_id, username, seconds) in enumerate(top, start=1)
+            )
+        else:
+            embed.description = "Ainda ninguém terminou um turno neste período."
+
+        own = leaderboard.position(period, interaction.guild_id, interaction.user.id)
+        if own and own[0] > RANKING_SIZE:
+            embed.add_field(name="A tua posição", value=f"`{own[0]}.º` de {leaderboard.size(period, interaction.guild_id)} — `{format_duration(own[1])}`", inline=False)
+        embed.set_footer(text="Contam os turnos terminados, no período em que começaram.")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(RankingCog(bot))
@@ -1,20 +1,177 @@
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands # Importa app_commands para slash commands
-from datetime import datetime, timedelta, timezone # Importa timezone para lidar com datas UTC
+from datetime import date, datetime, timedelta, timezone # Importa timezone para lidar com datas UTC
+from zoneinfo import ZoneInfo
+import asyncio
 
-# Importa funções do nosso módulo database (agora para PostgreSQL)
-from database import get_punches_for_period
+# Importa a consulta de horas do repositório (consultas preparadas, registos com datetimes nativos)
+from repository import (
+    get_punches_for_period, get_duty_totals_for_days, get_last_report_run,
+    claim_report_run, complete_report_run, release_report_run, expire_report_claims
+)
+# Mapa de cobertura por hora da semana (varrimento de eventos de entrada/saída)
+from duty_coverage import WEEKDAYS, compute_coverage, render_heatmap
+from config import DISPLAY_TIMEZONE, REPORT_SCHEDULE_PERIODS, REPORT_SCHEDULER_INTERVAL_MINUTES, REPORT_CATCH_UP_LIMIT
 # Importa configurações do nosso módulo config
-from config import ROLE_ID # ROLE_ID ainda é usado para permissões do comando /horas
+# O cargo autorizado para o comando /horas é resolvido pela configuração de cada servidor
+from guild_config import has_guild_role, get_guild_config
+# Com várias instâncias em execução, só a líder da tarefa 'scheduled_reports' publica os relatórios
+from coordination import register_singleton_job, is_leader
+from outbound import outbound, Priority
+
+SCHEDULED_REPORTS_JOB = 'scheduled_reports'
+SCHEDULED_PERIOD_TITLES = {'semana': "Semanal", 'mes': "Mensal"}
+# Uma publicação reclamada e não completada durante este tempo (instância parada a meio) volta a ser tentada
+REPORT_CLAIM_TIMEOUT = timedelta(hours=1)
+
+def period_bounds(period: str, day: date) -> tuple[date, date]:
+    """Início (inclusive) e fim (exclusive) da semana (segunda a domingo) ou do mês que contém o dia."""
+    if period == 'semana':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+def format_duration(total_seconds: float) -> str:
+    hours, remainder = divmod(int(total_seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}h {minutes}m {seconds}s"
+
+def build_report_embed(title: str, period_text: str, sorted_users: list[tuple[int, str, float]]) -> discord.Embed:
+    """Embed do relatório de horas: [(user_id, nome, segundos)] já ordenados do maior para o menor tempo."""
+    embed = discord.Embed(
+        title=title,
+        description=f"**Período:** `{period_text}`",
+        color=discord.Color.from_rgb(50, 205, 50) # Verde vibrante
+    )
+    embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1260308350776774817/1386713008256061512/Untitled_1024_x_1024_px_4.png") # Logo LSPD
+
+    # Adiciona os membros como campos da embed
+    if sorted_users:
+        current_field_value = ""
+        field_count = 0
+
+        for i, (user_id, username, total_seconds) in enumerate(sorted_users):
+            # Linha para o relatório
+            line = f"**{i+1}. {username}** (`{user_id}`)\nTempo Total: `{format_duration(total_seconds)}`"
+
+            # Verifica se a linha atual e o separador excederão o limite do campo (1024 chars)
+            if len(current_field_value) + len(line) + 1 > 1024 and current_field_value:
+                embed.add_field(name=f"Membros em Serviço (parte {field_count + 1})", value=current_field_value, inline=False)
+                current_field_value = line
+                field_count += 1
+            else:
+                if current_field_value:
+                    current_field_value += "\n" + line
+                else:
+                    current_field_value = line
+
+        # Adiciona o último campo (se não estiver vazio)
+        if current_field_value:
+            if field_count == 0: # Se tudo coube em um único campo
+                embed.add_field(name="Membros em Serviço", value=current_field_value, inline=False)
+            else: # Se foram criados múltiplos campos
+                embed.add_field(name=f"Membros em Serviço (parte {field_count + 1})", value=current_field_value, inline=False)
+    else:
+        embed.add_field(name="Membros em Serviço", value="Nenhum registro de ponto neste período.", inline=False)
+
+    embed.set_footer(
+        text="Relatório gerado automaticamente pelo Sistema de Ponto LSPD.",
+        icon_url="https://cdn.discordapp.com/attachments/1387870298526978231/1387874932561547437/IMG_6522.jpg" # Logo "Developed by Dyas"
+    )
+    return embed
 
 class ReportsCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        # A tarefa de relatório semanal automático foi removida.
-        print("ReportsCog está pronto. Tarefa de relatório semanal automático desativada.")
+        register_singleton_job(SCHEDULED_REPORTS_JOB)
+        print(f"ReportsCog está pronto. Relatórios agendados: {', '.join(REPORT_SCHEDULE_PERIODS) or 'nenhum'}.")
+
+    async def cog_load(self):
+        if REPORT_SCHEDULE_PERIODS:
+            self.scheduled_reports_task.start()
+
+    async def cog_unload(self):
+        self.scheduled_reports_task.cancel()
+
+    # --- RELATÓRIOS AGENDADOS ---
+    # A cada REPORT_SCHEDULER_INTERVAL_MINUTES, a instância líder publica no canal de relatórios de cada servidor
+    # os períodos terminados que ainda não estão em 'report_runs'. Depois de uma paragem, os períodos em falta
+    # são publicados por ordem; na primeira execução num servidor, só o último período terminado.
 
-    # A função cog_unload() e a tarefa weekly_report_task (e seu before_loop) foram removidas.
+    @tasks.loop(minutes=REPORT_SCHEDULER_INTERVAL_MINUTES)
+    async def scheduled_reports_task(self):
+        if not is_leader(SCHEDULED_REPORTS_JOB):
+            return
+        try:
+            expired = await asyncio.to_thread(expire_report_claims, REPORT_CLAIM_TIMEOUT)
+            if expired:
+                print(f"Relatórios agendados: {expired} publicação(ões) interrompida(s) voltam a ser tentadas.")
+        except Exception as e:
+            print(f"Erro nos relatórios agendados (base de dados indisponível?): {e}")
+            return
+
+        today = datetime.now(ZoneInfo(DISPLAY_TIMEZONE)).date()
+        for guild in self.bot.guilds:
+            channel = self.bot.get_channel(get_guild_config(guild.id)['weekly_report_channel_id'] or 0)
+            if channel is None:
+                continue
+            for period in REPORT_SCHEDULE_PERIODS:
+                if period not in SCHEDULED_PERIOD_TITLES:
+                    print(f"Período de relatório agendado desconhecido em REPORT_SCHEDULE_PERIODS: '{period}'")
+                    continue
+                try:
+                    await self._catch_up_reports(guild, channel, period, today)
+                except Exception as e:
+                    print(f"Erro ao publicar relatórios '{period}' em {guild.name} ({guild.id}): {e}")
+
+    @scheduled_reports_task.before_loop
+    async def before_scheduled_reports(self):
+        await self.bot.wait_until_ready()
+
+    async def _catch_up_reports(self, guild: discord.Guild, channel, period: str, today: date):
+        """Publica, do mais antigo para o mais recente, os períodos terminados desde o último publicado."""
+        last_published = await asyncio.to_thread(get_last_report_run, guild.id, period)
+        current_start, _ = period_bounds(period, today)
+
+        missing = []
+        start = current_start
+        while len(missing) < REPORT_CATCH_UP_LIMIT:
+            start, end = period_bounds(period, start - timedelta(days=1))
+            if last_published is not None and start <= last_published:
+                break
+            missing.append((start, end))
+            if last_published is None:
+                break
+        else:
+            older_start, _ = period_bounds(period, start - timedelta(days=1))
+            if last_published is not None and older_start > last_published:
+                print(f"Relatórios '{period}' em {guild.name}: mais de {REPORT_CATCH_UP_LIMIT} períodos em falta, só os últimos serão publicados.")
+
+        for start, end in reversed(missing):
+            if not await self._publish_scheduled_report(guild, channel, period, start, end):
+                # Tenta de novo na próxima execução, para manter a ordem dos períodos
+                break
+
+    async def _publish_scheduled_report(self, guild: discord.Guild, channel, period: str, start: date, end: date) -> bool:
+        if not await asyncio.to_thread(claim_report_run, guild.id, period, start, end):
+            return True  # Já publicado (ou em publicação) por outra instância
+        try:
+            totals = await asyncio.to_thread(get_duty_totals_for_days, guild.id, start, end)
+            embed = build_report_embed(
+                f"📊 Relatório {SCHEDULED_PERIOD_TITLES[period]} de Horas de Serviço (LSPD)",
+                f"{start.strftime('%d/%m/%Y')} - {(end - timedelta(days=1)).strftime('%d/%m/%Y')}",
+                [(total.user_id, total.username, total.total_seconds) for total in totals]
+            )
+            message = await outbound.send(channel, embed=embed, priority=Priority.BULK)
+        except Exception as e:
+            await asyncio.to_thread(release_report_run, guild.id, period, start)
+            print(f"Erro ao publicar o relatório '{period}' de {start} em {guild.name} ({guild.id}): {e}")
+            return False
+        await asyncio.to_thread(complete_report_run, guild.id, period, start, message.id)
+        print(f"Relatório '{period}' de {start.strftime('%d/%m/%Y')} publicado em {guild.name} ({len(totals)} membros).")
+        return True
 
     # Função auxiliar para gerar e enviar o relatório, agora sempre acionada por comando
     async def _generate_and_send_report(self, interaction: discord.Interaction, start_date: datetime, end_date: datetime):
@@ -33,7 +190,7 @@ class ReportsCog(commands.Cog):
 
         print(f"Gerando relatório de {start_of_period.strftime('%d/%m/%Y %H:%M')} a {end_of_period.strftime('%d/%m/%Y %H:%M')}")
 
-        records = get_punches_for_period(start_of_period, end_of_period)
+        records = await asyncio.to_thread(get_punches_for_period, start_of_period, end_of_period, interaction.guild_id)
         user_total_times = {}
 
         if not records:
@@ -41,68 +198,22 @@ class ReportsCog(commands.Cog):
             return
 
         for record in records:
-            user_id = record['user_id']
-            username = record['username']
-            # punch_in_time e punch_out_time já vêm como strings ISO do DB para compatibilidade
-            punch_in = datetime.fromisoformat(record['punch_in_time'])
-            punch_out = datetime.fromisoformat(record['punch_out_time'])
-            
-            duration = punch_out - punch_in
-            
-            user_total_times.setdefault(user_id, {'username': username, 'total_duration': timedelta(0)})
-            user_total_times[user_id]['total_duration'] += duration
+            # punch_in_time e punch_out_time já vêm como datetimes do repositório
+            duration = record.punch_out_time - record.punch_in_time
 
-        # --- CONSTRUÇÃO DA EMBED DO RELATÓRIO ---
-        embed = discord.Embed(
-            title=f"📊 Relatório de Horas de Serviço (LSPD)",
-            description=f"**Período:** `{start_of_period.strftime('%d/%m/%Y')} - {end_of_period.strftime('%d/%m/%Y')}`",
-            color=discord.Color.from_rgb(50, 205, 50) # Verde vibrante
-        )
-        embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1260308350776774817/1386713008256061512/Untitled_1024_x_1024_px_4.png") # Logo LSPD
-        
-        # Ordena os utilizadores pelo tempo total em serviço (do maior para o menor)
-        sorted_users = sorted(user_total_times.items(), key=lambda item: item[1]['total_duration'], reverse=True)
+            user_total_times.setdefault(record.user_id, {'username': record.username, 'total_duration': timedelta(0)})
+            user_total_times[record.user_id]['total_duration'] += duration
 
-        # Adiciona os membros como campos da embed
-        if sorted_users:
-            current_field_value = ""
-            field_count = 0
-            
-            for i, (user_id, data) in enumerate(sorted_users):
-                username = data['username']
-                total_duration = data['total_duration']
-                
-                total_seconds = int(total_duration.total_seconds())
-                hours, remainder = divmod(total_seconds, 3600)
-                minutes, seconds = divmod(remainder, 60)
-                formatted_total_time = f"{hours}h {minutes}m {seconds}s"
-                
-                # Linha para o relatório
-                line = f"**{i+1}. {username}** (`{user_id}`)\nTempo Total: `{formatted_total_time}`"
-                
-                # Verifica se a linha atual e o separador excederão o limite do campo (1024 chars)
-                if len(current_field_value) + len(line) + 1 > 1024 and current_field_value: 
-                    embed.add_field(name=f"Membros em Serviço (parte {field_count + 1})", value=current_field_value, inline=False)
-                    current_field_value = line
-                    field_count += 1
-                else:
-                    if current_field_value:
-                        current_field_value += "\n" + line
-                    else:
-                        current_field_value = line
-            
-            # Adiciona o último campo (se não estiver vazio)
-            if current_field_value:
-                if field_count == 0: # Se tudo coube em um único campo
-                    embed.add_field(name="Membros em Serviço", value=current_field_value, inline=False)
-                else: # Se foram criados múltiplos campos
-                    embed.add_field(name=f"Membros em Serviço (parte {field_count + 1})", value=current_field_value, inline=False)
-
-        embed.set_footer(
-            text="Relatório gerado automaticamente pelo Sistema de Ponto LSPD.",
-            icon_url="https://cdn.discordapp.com/attachments/1387870298526978231/1387874932561547437/IMG_6522.jpg" # Logo "Developed by Dyas"
+        # Ordena os utilizadores pelo tempo total em serviço (do maior para o menor)
+        sorted_users = sorted(
+            ((user_id, data['username'], data['total_duration'].total_seconds()) for user_id, data in user_total_times.items()),
+            key=lambda item: item[2], reverse=True
+        )
+        embed = build_report_embed(
+            "📊 Relatório de Horas de Serviço (LSPD)",
+            f"{start_of_period.strftime('%d/%m/%Y')} - {end_of_period.strftime('%d/%m/%Y')}",
+            sorted_users
         )
-        # --- FIM DA CONSTRUÇÃO DA EMBED ---
 
         # Envia o relatório para o canal do comando
         await interaction.followup.send(embed=embed, ephemeral=True)
@@ -114,8 +225,8 @@ class ReportsCog(commands.Cog):
         data_inicio="A data de início do período (DD/MM/YYYY).",
         data_fim="A data de fim do período (DD/MM/YYYY)."
     )
-    # Verifica se o utilizador tem o cargo especificado em ROLE_ID
-    @app_commands.checks.has_role(ROLE_ID) 
+    # Verifica se o utilizador tem o cargo autorizado (role_id) configurado para o servidor
+    @has_guild_role()
     async def horas_command(self, interaction: discord.Interaction, data_inicio: str, data_fim: str):
         """
         Comando de barra para gerar um relatório de horas de serviço para um período específico.
@@ -136,5 +247,63 @@ class ReportsCog(commands.Cog):
             await interaction.followup.send(f"Ocorreu um erro ao gerar o relatório: `{e}`", ephemeral=True)
             print(f"Erro ao gerar relatório de ponto via /horas: {e}")
 
+    # --- COMANDO DE BARRA PARA COBERTURA POR HORA ---
+    @app_commands.command(name="cobertura", description="Mostra quantos oficiais estão em serviço por dia da semana e hora.")
+    @app_commands.describe(
+        data_inicio="A data de início do período (DD/MM/YYYY).",
+        data_fim="A data de fim do período (DD/MM/YYYY)."
+    )
+    @has_guild_role()
+    async def cobertura_command(self, interaction: discord.Interaction, data_inicio: str, data_fim: str):
+        """
+        Comando de barra para ver as horas da semana com menos oficiais em serviço num período.
+        """
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            # As datas são dias no fuso horário de exibição; o fim inclui o dia inteiro
+            display_tz = ZoneInfo(DISPLAY_TIMEZONE)
+            start_of_period = datetime.strptime(data_inicio, '%d/%m/%Y').replace(tzinfo=display_tz)
+            end_of_period = datetime.strptime(data_fim, '%d/%m/%Y').replace(tzinfo=display_tz) + timedelta(days=1)
+        except ValueError:
+            await interaction.followup.send("Formato de data inválido. Use DD/MM/YYYY. Ex: `/cobertura 01/01/2025 31/03/2025`", ephemeral=True)
+            return
+        if start_of_period >= end_of_period:
+            await interaction.followup.send("Erro: A data de início não pode ser posterior à data de fim.", ephemeral=True)
+            return
+
+        try:
+            # Também as sessões iniciadas na véspera, que podem continuar já dentro do período
+            records = await asyncio.to_thread(
+                get_punches_for_period, start_of_period - timedelta(days=1), end_of_period, interaction.guild_id
+            )
+            sessions = [(record.punch_in_time, record.punch_out_time) for record in records]
+            if not sessions:
+                await interaction.followup.send("Nenhum registro de ponto encontrado para o período especificado.", ephemeral=True)
+                return
+            grid = await asyncio.to_thread(compute_coverage, sessions, start_of_period, end_of_period)
+        except Exception as e:
+            await interaction.followup.send(f"Ocorreu um erro ao gerar o relatório: `{e}`", ephemeral=True)
+            print(f"Erro ao gerar relatório de cobertura via /cobertura: {e}")
+            return
+
+        embed = discord.Embed(
+            title="🗓️ Cobertura de Serviço por Hora (LSPD)",
+            description=(
+                f"**Período:** `{start_of_period.strftime('%d/%m/%Y')} - {(end_of_period - timedelta(days=1)).strftime('%d/%m/%Y')}` "
+                f"({DISPLAY_TIMEZONE})\n```\n{render_heatmap(grid)}\n```"
+            ),
+            color=discord.Color.from_rgb(50, 205, 50)
+        )
+        weakest = "\n".join(
+            f"**{WEEKDAYS[weekday]} {hour:02d}h**: média `{average:.1f}` oficiais, sem ninguém `{uncovered:.0%}` do tempo"
+            for weekday, hour, average, uncovered in grid.weakest()
+        )
+        embed.add_field(name="Horas com menos cobertura", value=weakest or "`sem dados`", inline=False)
+        embed.set_footer(text=f"{len(sessions)} sessões analisadas.")
+
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        print(f"Relatório de cobertura enviado para {interaction.user.display_name}.")
+
 async def setup(bot):
     await bot.add_cog(ReportsCog(bot))
@@ -0,0 +1,88 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+# Importa o cálculo das estatísticas (feito no PostgreSQL)
+from database import get_duty_statistics
+# O cargo autorizado é resolvido pela configuração de cada servidor (o mesmo do /horas)
+from guild_config import has_guild_role
+
+# Número máximo de oficiais listados no embed (ordenados pelo tempo total)
+MAX_OFFICERS_LISTED = 10
+
+def format_duration(seconds: float) -> str:
+    total_seconds = int(seconds)
+    hours, remainder = divmod(total_seconds, 3600)
+    minutes, _ = divmod(remainder, 60)
+    return f"{hours}h {minutes:02d}m"
+
+def _stats_lines(stats: dict) -> str:
+    return (
+        f"Sessões: `{stats['sessions']}` ({stats['sessions_per_week']:.1f}/semana) · Total: `{format_duration(stats['total_seconds'])}`\n"
+        f"Mediana: `{format_duration(stats['median_seconds'])}` · p90: `{format_duration(stats['p90_seconds'])}` · Média: `{format_duration(stats['mean_seconds'])}`\n"
+        f"Média diária 7d: `{format_duration(stats['rolling_7d_daily_seconds'])}` · 30d: `{format_duration(stats['rolling_30d_daily_seconds'])}`"
+    )
+
+class StatisticsCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @app_commands.command(name="estatisticas", description="Estatísticas de serviço (mediana, p90, sessões por semana, médias móveis).")
+    @app_commands.describe(
+        data_inicio="Início do período (DD/MM/YYYY). Padrão: há 30 dias.",
+        data_fim="Fim do período (DD/MM/YYYY). Padrão: hoje.",
+        membro="Mostrar apenas este oficial."
+    )
+    @has_guild_role()
+    async def estatisticas_command(self, interaction: discord.Interaction, data_inicio: str = None,
+                                   data_fim: str = None, membro: discord.Member = None):
+        await interaction.response.defer(ephemeral=True)
+
+        # Mesma convenção do /horas: dias completos em UTC
+        try:
+            today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+            end_date = datetime.strptime(data_fim, '%d/%m/%Y') if data_fim else today
+            start_date = datetime.strptime(data_inicio, '%d/%m/%Y') if data_inicio else end_date - timedelta(days=29)
+        except ValueError:
+            await interaction.followup.send("Formato de data inválido. Use DD/MM/YYYY. Ex: `/estatisticas 01/01/2025 31/01/2025`", ephemeral=True)
+            return
+        start_of_period = start_date.replace(tzinfo=timezone.utc)
+        end_of_period = end_date.replace(hour=23, minute=59, second=59, microsecond=999999, tzinfo=timezone.utc)
+        if start_of_period > end_of_period:
+            await interaction.followup.send("Erro: A data de início não pode ser posterior à data de fim.", ephemeral=True)
+            return
+
+        try:
+            results = await asyncio.to_thread(
+                get_duty_statistics, start_of_period, end_of_period, interaction.guild_id, membro.id if membro else None
+            )
+        except Exception as e:
+            await interaction.followup.send(f"Ocorreu um erro ao calcular as estatísticas: `{e}`", ephemeral=True)
+            print(f"Erro ao calcular estatísticas via /estatisticas: {e}")
+            return
+
+        unit = next((row for row in results if row['user_id'] is None), None)
+        officers = sorted((row for row in results if row['user_id'] is not None), key=lambda row: row['total_seconds'], reverse=True)
+        if unit is None:
+            await interaction.followup.send("Nenhum registro de ponto encontrado para o período especificado.", ephemeral=True)
+            return
+
+        embed = discord.Embed(
+            title=f"📈 Estatísticas de Serviço{f' — {membro.display_name}' if membro else ' (LSPD)'}",
+            description=f"**Período:** `{start_of_period.strftime('%d/%m/%Y')} - {end_of_period.strftime('%d/%m/%Y')}`",
+            color=discord.Color.from_rgb(50, 205, 50)
+        )
+        if not membro:
+            embed.add_field(name=f"Unidade ({len(officers)} oficiais)", value=_stats_lines(unit), inline=False)
+        for i, stats in enumerate(officers[:MAX_OFFICERS_LISTED]):
+            embed.add_field(name=f"{i + 1}. {stats['username']}", value=_stats_lines(stats), inline=False)
+        if len(officers) > MAX_OFFICERS_LISTED:
+            embed.set_footer(text=f"Mostrando os {MAX_OFFICERS_LISTED} oficiais com mais horas de {len(officers)}. Use o parâmetro membro para ver outro oficial.")
+
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        print(f"Estatísticas de serviço enviadas a {interaction.user.display_name}.")
+
+async def setup(bot):
+    await bot.add_cog(StatisticsCog(bot))
@@ -1,21 +1,109 @@
 import discord
+from discord import app_commands
 from discord.ext import commands, tasks
-import random
+import time
 import asyncio
 
 # Importa as configurações de status do nosso arquivo config.py
-from config import DEFAULT_STATUS_TYPE, BOT_ACTIVITIES, ACTIVITY_CHANGE_INTERVAL_SECONDS
+from config import (
+    DEFAULT_STATUS_TYPE, BOT_ACTIVITIES, ACTIVITY_CHANGE_INTERVAL_SECONDS,
+    PRESENCE_MIN_GATEWAY_BUDGET, ACTIVITY_MAX_SLOWDOWN
+)
+# Com várias instâncias em execução, só a líder da tarefa 'presence' faz a rotação de atividades
+from coordination import register_singleton_job, is_leader
+
+PRESENCE_JOB = 'presence'
+
+class PresenceManager:
+    """
+    Envia as atualizações de presença do bot poupando o orçamento de comandos do gateway:
+    as atividades são construídas uma única vez, as atualizações que não mudam nada não são enviadas,
+    e a presença atual fica guardada no cliente para seguir no IDENTIFY de uma reconexão (sem comando extra).
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.current_activity = None
+        self.current_status = None
+        # Contadores de atualizações de presença
+        self.sent = 0
+        self.skipped_unchanged = 0
+        self.dropped_budget = 0
+        self.failed = 0
+
+    @staticmethod
+    def _activity_key(activity):
+        if activity is None:
+            return None
+        return (activity.type, activity.name, getattr(activity, 'url', None))
+
+    def remember(self, activity, status: discord.Status):
+        """Guarda a presença no cliente: é enviada no IDENTIFY das próximas ligações ao gateway."""
+        self.bot.activity = activity
+        self.bot.status = status
+
+    def gateway_budget(self) -> tuple[int, int] | None:
+        """
+        Retorna (comandos restantes, máximo) na janela atual do rate limiter do gateway,
+        considerando o shard com menos comandos restantes. None se não houver ligação ao gateway.
+        """
+        budget = None
+        for shard_id in self.bot.shards:
+            try:
+                limiter = self.bot._get_websocket(shard_id=shard_id)._rate_limiter
+            except Exception:
+                continue
+            # Fora da janela atual, o rate limiter volta a ter o orçamento completo
+            remaining = limiter.max if time.time() > limiter.window + limiter.per else limiter.remaining
+            if budget is None or remaining < budget[0]:
+                budget = (remaining, limiter.max)
+        return budget
+
+    def has_budget(self) -> bool:
+        budget = self.gateway_budget()
+        return budget is None or budget[0] >= PRESENCE_MIN_GATEWAY_BUDGET
+
+    async def apply(self, activity, status: discord.Status, *, respect_budget: bool = False) -> bool:
+        """
+        Envia a presença se for diferente da atual. Com respect_budget, a atualização é descartada
+        quando o gateway tem pouco orçamento livre. Retorna True se a presença foi enviada.
+        """
+        if self._activity_key(activity) == self._activity_key(self.current_activity) and status == self.current_status:
+            self.skipped_unchanged += 1
+            return False
+        if respect_budget and not self.has_budget():
+            self.dropped_budget += 1
+            return False
+        try:
+            await self.bot.change_presence(activity=activity, status=status)
+        except Exception:
+            self.failed += 1
+            raise
+        self.sent += 1
+        self.current_activity = activity
+        self.current_status = status
+        self.remember(activity, status)
+        return True
 
 class StatusChangerCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self._current_activity_index = 0
         self._last_set_activity = None # Para manter o estado da atividade
+        self.presence = PresenceManager(bot)
+        # As atividades são construídas uma única vez, em vez de a cada rotação
+        self._activities = [self._create_activity(activity_type, message, url) for activity_type, message, url in BOT_ACTIVITIES]
+        self._slowdown = 1
+        register_singleton_job(PRESENCE_JOB)
 
         # Inicia a tarefa de alternar atividades se houver alguma configurada
-        if BOT_ACTIVITIES:
+        if self._activities:
+            # A primeira atividade segue no IDENTIFY (o cog é carregado antes da ligação ao gateway)
+            self._last_set_activity = self._activities[0]
+            self.presence.remember(self._activities[0], DEFAULT_STATUS_TYPE)
             self.change_activity_task.start()
         else:
+            self.presence.remember(None, DEFAULT_STATUS_TYPE)
             print("Nenhuma atividade de bot configurada em BOT_ACTIVITIES. A tarefa de mudança de atividade não será iniciada.")
 
     def cog_unload(self):
@@ -26,33 +114,17 @@ class StatusChangerCog(commands.Cog):
     @commands.Cog.listener()
     async def on_ready(self):
         """
-        Define o status inicial do bot quando ele está pronto.
-        Se houver atividades configuradas, a primeira será usada.
-        Caso contrário, o bot ficará sem atividade definida.
+        Regista a presença inicial do bot quando ele está pronto.
+        A presença guardada no cliente já segue no IDENTIFY (e persiste num RESUME),
+        por isso nem a primeira ligação nem as reconexões precisam de enviar uma atualização de presença.
         """
         print("StatusChangerCog está pronto.")
-        # Se houver atividades, define a primeira como atividade inicial
-        if BOT_ACTIVITIES and not self.change_activity_task.running:
-            # Se a tarefa não está rodando (e.g., BOT_ACTIVITIES estava vazia e foi preenchida depois)
-            # ou se é o primeiro on_ready, define a primeira atividade.
-            activity_type, message, url = BOT_ACTIVITIES[0]
-            activity = self._create_activity(activity_type, message, url)
-            await self.bot.change_presence(activity=activity, status=DEFAULT_STATUS_TYPE)
-            self._last_set_activity = activity
-            print(f"Status inicial do bot definido: {activity.name} ({activity_type.name})")
-        elif not BOT_ACTIVITIES:
-            # Se não houver atividades configuradas, apenas define o status padrão.
-            await self.bot.change_presence(status=DEFAULT_STATUS_TYPE)
-            print(f"Status inicial do bot definido (sem atividade): {DEFAULT_STATUS_TYPE}")
-        elif self.change_activity_task.running and self._last_set_activity:
-            # Se a tarefa já está rodando (bot reconectou) e já tinha uma atividade, tenta redefinir a última
-            await self.bot.change_presence(activity=self._last_set_activity, status=DEFAULT_STATUS_TYPE)
-            print(f"Bot reconectado, mantendo status: {self._last_set_activity.name}")
+        self.presence.current_activity = self._last_set_activity
+        self.presence.current_status = self.bot.status
+        if self._last_set_activity:
+            print(f"Status do bot definido no IDENTIFY: {self._last_set_activity.name}")
         else:
-            # fallback genérico se as condições acima não cobrirem (raro)
-            await self.bot.change_presence(status=DEFAULT_STATUS_TYPE)
-            print(f"Bot reconectado, status padrão definido.")
-
+            print(f"Status do bot definido no IDENTIFY (sem atividade): {self.bot.status}")
 
     def _create_activity(self, activity_type: discord.ActivityType, message: str, url: str = None):
         """Função auxiliar para criar um objeto de atividade com base no tipo."""
@@ -74,29 +146,47 @@ class StatusChangerCog(commands.Cog):
             print(f"Aviso: Tipo de atividade '{activity_type}' não reconhecido. Usando Playing para '{message}'.")
             return discord.Game(name=message)
 
+    def _adjust_rotation_speed(self, gateway_busy: bool):
+        """Alarga o intervalo de rotação enquanto o gateway está ocupado e repõe-no quando alivia."""
+        slowdown = min(self._slowdown * 2, ACTIVITY_MAX_SLOWDOWN) if gateway_busy else 1
+        if slowdown != self._slowdown:
+            self._slowdown = slowdown
+            self.change_activity_task.change_interval(seconds=ACTIVITY_CHANGE_INTERVAL_SECONDS * slowdown)
+            print(f"Intervalo de rotação de atividades ajustado para {ACTIVITY_CHANGE_INTERVAL_SECONDS * slowdown}s (gateway {'ocupado' if gateway_busy else 'livre'}).")
 
     @tasks.loop(seconds=ACTIVITY_CHANGE_INTERVAL_SECONDS)
     async def change_activity_task(self):
         """
         Tarefa em loop para alternar a atividade do bot periodicamente.
         """
-        if not BOT_ACTIVITIES:
+        if not self._activities:
             print("Nenhuma atividade configurada para alternar. Parando a tarefa de mudança de atividade.")
             self.change_activity_task.cancel()
             return
 
-        activity_type, message, url = BOT_ACTIVITIES[self._current_activity_index]
-        activity = self._create_activity(activity_type, message, url)
+        if not is_leader(PRESENCE_JOB):
+            # Outra instância está a rodar as atividades; esta não envia atualizações de presença.
+            return
+
+        next_index = (self._current_activity_index + 1) % len(self._activities)
+        activity = self._activities[next_index]
 
         try:
-            await self.bot.change_presence(activity=activity, status=DEFAULT_STATUS_TYPE)
-            self._last_set_activity = activity # Armazena a última atividade definida
-            print(f"Atividade do bot alterada para: {message} ({activity_type.name})")
+            sent = await self.presence.apply(activity, DEFAULT_STATUS_TYPE, respect_budget=True)
         except Exception as e:
             print(f"Erro ao tentar mudar a atividade do bot: {e}")
+            return
 
-        # Avança para a próxima atividade ou volta para o início
-        self._current_activity_index = (self._current_activity_index + 1) % len(BOT_ACTIVITIES)
+        gateway_busy = not sent and not self.presence.has_budget()
+        self._adjust_rotation_speed(gateway_busy)
+        if gateway_busy:
+            # Rotação adiada: mantém a atividade atual e tenta a mesma na próxima volta
+            return
+
+        self._last_set_activity = activity # Armazena a última atividade definida
+        self._current_activity_index = next_index
+        if sent:
+            print(f"Atividade do bot alterada para: {activity.name} ({activity.type.name})")
 
 
     @change_activity_task.before_loop
@@ -108,8 +198,10 @@ class StatusChangerCog(commands.Cog):
 
     # --- Comandos Manuais de Status (apenas para administradores) ---
 
-    @commands.command(name="setstatus", help="Define o status do bot. Uso: !setstatus <online|idle|dnd|invisible>")
+    @commands.hybrid_command(name="setstatus", description="Define o status do bot.", help="Define o status do bot. Uso: !setstatus <online|idle|dnd|invisible>")
     @commands.has_permissions(administrator=True)
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(status="online, idle, dnd ou invisible")
     async def set_status_command(self, ctx, status: str):
         """
         Define o status online/idle/dnd/invisible do bot.
@@ -126,7 +218,7 @@ class StatusChangerCog(commands.Cog):
             try:
                 # Tenta manter a última atividade definida, se houver
                 current_activity = self._last_set_activity if self._last_set_activity else None
-                await self.bot.change_presence(activity=current_activity, status=chosen_status)
+                await self.presence.apply(current_activity, chosen_status)
                 await ctx.send(f"Status do bot alterado para: **{status.upper()}**.")
                 print(f"Admin {ctx.author} alterou o status do bot para {status.upper()}")
             except Exception as e:
@@ -134,8 +226,11 @@ class StatusChangerCog(commands.Cog):
         else:
             await ctx.send("Status inválido. Use: `online`, `idle`, `dnd` ou `invisible`.")
 
-    @commands.command(name="setactivity", help="Define a atividade do bot. Uso: !setactivity <playing|watching|listening|streaming> <mensagem> [url]")
+    @commands.hybrid_command(name="setactivity", description="Define a atividade do bot.", help="Define a atividade do bot. Uso: !setactivity <playing|watching|listening|streaming> <mensagem> [url]")
     @commands.has_permissions(administrator=True)
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.rename(activity_type_str="tipo", message_and_url="mensagem")
+    @app_commands.describe(activity_type_str="playing, watching, listening ou streaming", message_and_url="Mensagem da atividade (e URL no fim, para streaming)")
     async def set_activity_command(self, ctx, activity_type_str: str, *, message_and_url: str):
         """
         Define a atividade do bot (jogando, assistindo, ouvindo, transmitindo).
@@ -183,22 +278,24 @@ class StatusChangerCog(commands.Cog):
                 self.change_activity_task.cancel()
                 print("Tarefa de mudança de atividade suspensa para atividade manual.")
 
-            await self.bot.change_presence(activity=activity, status=DEFAULT_STATUS_TYPE)
+            await self.presence.apply(activity, DEFAULT_STATUS_TYPE)
             self._last_set_activity = activity # Armazena a atividade manual
             await ctx.send(f"Atividade do bot alterada para **{chosen_activity_type.name.upper()}**: `{message}`.")
             print(f"Admin {ctx.author} alterou a atividade do bot para {chosen_activity_type.name.upper()}: '{message}'")
         except Exception as e:
             await ctx.send(f"Erro ao alterar a atividade: {e}")
 
-    @commands.command(name="resetactivity", help="Reinicia a alternância automática de atividades do bot.")
+    @commands.hybrid_command(name="resetactivity", help="Reinicia a alternância automática de atividades do bot.")
     @commands.has_permissions(administrator=True)
+    @app_commands.default_permissions(administrator=True)
     async def reset_activity_command(self, ctx):
         """
         Reinicia a alternância automática de atividades.
         """
-        if BOT_ACTIVITIES:
+        if self._activities:
             if not self.change_activity_task.is_running():
-                self._current_activity_index = 0 # Reinicia o contador para começar da primeira atividade
+                # Reinicia o contador para a próxima rotação começar pela primeira atividade
+                self._current_activity_index = len(self._activities) - 1
                 self.change_activity_task.start()
                 await ctx.send("Alternância automática de atividades reiniciada.")
                 print("Alternância automática de atividades reiniciada por admin.")
@@ -207,6 +304,28 @@ class StatusChangerCog(commands.Cog):
         else:
             await ctx.send("Não há atividades configuradas para reiniciar a alternância automática.")
 
+    @commands.hybrid_command(name="presencestats", help="Mostra as estatísticas de atualizações de presença e o orçamento do gateway.")
+    @commands.has_permissions(administrator=True)
+    @app_commands.default_permissions(administrator=True)
+    async def presence_stats_command(self, ctx):
+        """
+        Mostra quantas atualizações de presença foram enviadas, ignoradas e descartadas.
+        """
+        budget = self.presence.gateway_budget()
+        embed = discord.Embed(title="📡 Presença do Bot", color=discord.Color.blurple())
+        embed.add_field(name="Enviadas", value=f"`{self.presence.sent}`", inline=True)
+        embed.add_field(name="Ignoradas (sem alteração)", value=f"`{self.presence.skipped_unchanged}`", inline=True)
+        embed.add_field(name="Descartadas (gateway ocupado)", value=f"`{self.presence.dropped_budget}`", inline=True)
+        embed.add_field(name="Falhadas", value=f"`{self.presence.failed}`", inline=True)
+        embed.add_field(name="Intervalo de rotação", value=f"`{ACTIVITY_CHANGE_INTERVAL_SECONDS * self._slowdown}s`", inline=True)
+        embed.add_field(
+            name="Orçamento do gateway",
+            value=f"`{budget[0]}/{budget[1]}` comandos restantes" if budget else "`sem ligação`",
+            inline=True
+        )
+        embed.add_field(name="Líder da rotação", value="Sim" if is_leader(PRESENCE_JOB) else "Não (outra instância)", inline=True)
+        await ctx.send(embed=embed)
+
 
 async def setup(bot):
     """
@@ -1,18 +1,46 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 from typing import Union
 import json
-import os
-from datetime import datetime, timezone
+import io
+from datetime import datetime, timedelta, timezone
 import asyncio
+from contextlib import asynccontextmanager
 
 from config import (
-    TICKET_PANEL_CHANNEL_ID, TICKET_PANEL_MESSAGE_FILE, TICKET_MESSAGES_FILE,
-    TICKET_CATEGORIES, TICKET_MODERATOR_ROLE_ID, TICKET_TRANSCRIPTS_CHANNEL_ID,
-    ROLE_ID, TICKET_MODERATOR_ROLES
+    TICKET_PANEL_MESSAGE_FILE, TICKET_MESSAGES_FILE, TICKET_CATEGORIES, TICKET_ARCHIVE_ATTACHMENTS,
+    TICKET_MESSAGE_FLUSH_SECONDS, TICKET_MESSAGE_BATCH_SIZE, TICKET_MAX_OPEN_PER_USER,
+    TICKET_INACTIVITY_HOURS, TICKET_INACTIVITY_DEFAULT_HOURS, TICKET_INACTIVITY_WARNING_HOURS,
+    TICKET_INACTIVITY_SWEEP_MINUTES, TICKET_ACTIVITY_FLUSH_SECONDS, TICKET_CLOSE_DELAY_SECONDS
 )
-from database import add_ticket_to_db, remove_ticket_from_db, get_all_open_tickets
+from database import (
+    save_ticket_messages, delete_ticket_messages, get_ticket_messages, get_last_ticket_message_ids,
+    purge_orphan_ticket_messages, save_ticket_transcript
+)
+# Abertura, fecho e consulta de tickets (consultas preparadas, registos TicketRecord)
+from repository import (
+    reserve_ticket, attach_ticket_channel, release_ticket_reservation, remove_ticket, get_open_tickets, get_open_ticket,
+    touch_ticket_activity, get_idle_tickets, mark_ticket_warned
+)
+# Configurações por servidor (canais, categorias e cargos resolvidos pelo ID do servidor)
+from guild_config import get_guild_config, set_guild_settings, get_ticket_category_id, get_ticket_moderator_role_ids
+from coordination import (
+    try_acquire_leadership, release_leadership, register_invalidation_handler, unregister_invalidation_handler,
+    register_singleton_job, is_leader
+)
+from startup_profiler import startup_profiler
+# Fila de saída para o Discord (mensagens por prioridade, com o ritmo de cada canal)
+from outbound import outbound, Priority
+from ticket_archive import archive_attachments, refresh_attachment_urls, AttachmentArchive, StoredAttachment
+
+# Tarefa singleton: só a instância líder avisa e fecha tickets inativos
+INACTIVITY_SWEEPER_JOB = 'ticket_inactivity_sweeper'
+
+def inactivity_threshold(category: str) -> timedelta | None:
+    """Prazo de inatividade da categoria (None se o fecho automático estiver desativado para ela)."""
+    hours = TICKET_INACTIVITY_HOURS.get(category, TICKET_INACTIVITY_DEFAULT_HOURS)
+    return timedelta(hours=hours) if hours > 0 else None
 
 # Função auxiliar para formatar logs
 def log_message(level: str, message: str, emoji: str = "") -> str:
@@ -35,16 +63,32 @@ def load_ticket_messages():
         print(log_message("ERROR", f"Erro ao decodificar JSON em {TICKET_MESSAGES_FILE}: {e}", "❌"))
         TICKET_MESSAGES = {}
 
+def message_to_row(message: discord.Message) -> dict:
+    """Converte uma mensagem do Discord num registo da tabela ticket_messages."""
+    return {
+        'message_id': message.id,
+        'channel_id': message.channel.id,
+        'author_id': message.author.id,
+        'author_name': message.author.display_name,
+        'content': message.content,
+        'attachments': [
+            {'id': a.id, 'filename': a.filename, 'url': a.url, 'size': a.size, 'content_type': a.content_type}
+            for a in message.attachments
+        ],
+        'embeds': [{'title': e.title, 'description': e.description} for e in message.embeds],
+        'created_at': message.created_at
+    }
+
 # --- Views e Componentes ---
 
 class TicketPanelView(discord.ui.View):
-    def __init__(self, cog_instance):
+    def __init__(self, cog_instance, guild_id: int = None):
         super().__init__(timeout=None)
         self.cog = cog_instance
-        self.add_item(TicketCategorySelect(cog_instance))
+        self.add_item(TicketCategorySelect(cog_instance, guild_id))
 
 class TicketCategorySelect(discord.ui.Select):
-    def __init__(self, cog_instance):
+    def __init__(self, cog_instance, guild_id: int = None):
         self.cog = cog_instance
         options = []
         if not TICKET_MESSAGES:
@@ -55,7 +99,8 @@ class TicketCategorySelect(discord.ui.Select):
         if missing := valid_categories - set(json_categories):
             print(log_message("WARNING", f"Categorias ausentes em ticket_messages.json: {missing}", "⚠️"))
 
-        for label, _, emoji, category_id in TICKET_CATEGORIES:
+        for label, _, emoji, _ in TICKET_CATEGORIES:
+            category_id = get_ticket_category_id(guild_id, label)
             category_data = TICKET_MESSAGES.get("categories", {}).get(label, {})
             dropdown_description = category_data.get("dropdown_description", f"Descrição para {label}")
             if len(dropdown_description) > 100:
@@ -83,31 +128,42 @@ class TicketCategorySelect(discord.ui.Select):
             print(log_message("ERROR", f"Categoria '{selected_category}' inválida para {interaction.user}", "❌"))
             return
 
-        _, _, _, category_id = category_info
+        guild = interaction.guild
+        category_id = get_ticket_category_id(guild.id, selected_category)
+        category_channel = guild.get_channel(category_id)
+        if not category_channel or not isinstance(category_channel, discord.CategoryChannel):
+            await interaction.followup.send("Categoria inválida ou não encontrada.", ephemeral=True)
+            print(log_message("ERROR", f"Categoria ID {category_id} inválida", "❌"))
+            return
+
+        # Seleções repetidas do mesmo utilizador são tratadas uma de cada vez nesta instância;
+        # entre instâncias, a reserva na base de dados (lock por criador + índice único) garante o mesmo.
+        async with self.cog.ticket_creation_lock(guild.id, interaction.user.id):
+            await self._create_ticket(interaction, selected_category, category_channel)
 
-        all_open_tickets = get_all_open_tickets()
-        user_tickets = [t for t in all_open_tickets if t['creator_id'] == interaction.user.id]
-        if len(user_tickets) >= 2:
-            await interaction.followup.send("Limite de 2 tickets atingido.", ephemeral=True)
-            print(log_message("WARNING", f"Limite de tickets atingido por {interaction.user}", "⚠️"))
+    async def _create_ticket(self, interaction: discord.Interaction, selected_category: str, category_channel: discord.CategoryChannel):
+        guild = interaction.guild
+        try:
+            status, value = await asyncio.to_thread(reserve_ticket, guild.id, interaction.user.id, interaction.user.display_name, selected_category)
+        except Exception as e:
+            await interaction.followup.send(TICKET_MESSAGES.get("error_creating_ticket", "").format(erro=str(e)), ephemeral=True)
+            print(log_message("ERROR", f"Erro ao reservar ticket para {interaction.user}: {e}", "❌"))
             return
 
-        existing_ticket = next((t for t in user_tickets if t['category'] == selected_category), None)
-        if existing_ticket:
-            channel = self.cog.bot.get_channel(existing_ticket['channel_id'])
-            mention = channel.mention if channel else f"ID: {existing_ticket['channel_id']}"
+        if status == 'limit':
+            await interaction.followup.send(f"Limite de {TICKET_MAX_OPEN_PER_USER} tickets atingido.", ephemeral=True)
+            print(log_message("WARNING", f"Limite de tickets atingido por {interaction.user}", "⚠️"))
+            return
+        if status == 'exists':
+            channel = self.cog.bot.get_channel(value) if value else None
+            mention = channel.mention if channel else (f"ID: {value}" if value else "(em criação)")
             await interaction.followup.send(TICKET_MESSAGES.get("ticket_already_open", "").format(canal_mencao=mention), ephemeral=True)
             print(log_message("WARNING", f"Ticket existente para {interaction.user} em {mention}", "⚠️"))
             return
 
+        ticket_id = value
+        ticket_channel = None
         try:
-            guild = interaction.guild
-            category_channel = guild.get_channel(category_id)
-            if not category_channel or not isinstance(category_channel, discord.CategoryChannel):
-                await interaction.followup.send("Categoria inválida ou não encontrada.", ephemeral=True)
-                print(log_message("ERROR", f"Categoria ID {category_id} inválida", "❌"))
-                return
-
             # Definir permissões para restringir acesso apenas ao criador e aos cargos específicos da categoria
             overwrites = {
                 guild.default_role: discord.PermissionOverwrite(read_messages=False),  # Bloquear acesso geral
@@ -116,7 +172,7 @@ class TicketCategorySelect(discord.ui.Select):
             # Garantir que o bot tenha permissões completas
             overwrites[guild.me] = discord.PermissionOverwrite(read_messages=True, send_messages=True, embed_links=True, attach_files=True, manage_channels=True)
             # Adicionar os cargos moderadores específicos da categoria
-            moderator_role_ids = list(dict.fromkeys(TICKET_MODERATOR_ROLES.get(selected_category, [])))  # Remove duplicatas
+            moderator_role_ids = list(dict.fromkeys(get_ticket_moderator_role_ids(guild.id, selected_category)))  # Remove duplicatas
             for role_id in moderator_role_ids:
                 moderator_role = guild.get_role(role_id)
                 if moderator_role:
@@ -132,9 +188,8 @@ class TicketCategorySelect(discord.ui.Select):
                 topic=f"Ticket para {interaction.user.display_name} ({selected_category})",
                 reason=f"Ticket criado por {interaction.user.display_name}"
             )
-
-            add_ticket_to_db(ticket_channel.id, interaction.user.id, interaction.user.display_name, selected_category)
-            print(log_message("INFO", f"Ticket criado para {interaction.user} em {ticket_channel.name}", "🎫"))
+            # Registado antes da mensagem de boas-vindas, para que ela também fique no transcrito
+            self.cog.track_ticket_channel(ticket_channel.id)
 
             category_data = TICKET_MESSAGES.get("categories", {}).get(selected_category, {})
             welcome_data = category_data.get("welcome_embed", TICKET_MESSAGES.get("ticket_welcome_embed", {}))
@@ -158,21 +213,48 @@ class TicketCategorySelect(discord.ui.Select):
                 data_hora=datetime.now(timezone.utc).astimezone().strftime('%d/%m/%Y %H:%M')
             ))
 
-            # Enviar mensagem sem menções de cargos
-            await ticket_channel.send(
-                content=f"{interaction.user.mention}",  # Apenas o criador, sem mentions de cargos
-                embed=embed,
-                view=TicketControlView(self.cog)
+            # Passos independentes em paralelo: associar o canal à reserva e enviar as boas-vindas.
+            # Espera pelos dois antes de decidir, para o rollback não correr com um deles ainda em curso.
+            attached, welcome = await asyncio.gather(
+                asyncio.to_thread(attach_ticket_channel, ticket_id, ticket_channel.id, guild.id),
+                # Enviar mensagem sem menções de cargos
+                outbound.send(
+                    ticket_channel,
+                    content=f"{interaction.user.mention}",  # Apenas o criador, sem mentions de cargos
+                    embed=embed,
+                    view=TicketControlView(self.cog),
+                    priority=Priority.INTERACTIVE
+                ),
+                return_exceptions=True
             )
-
-            await interaction.followup.send(
-                TICKET_MESSAGES.get("ticket_created_success", "").format(canal_mencao=ticket_channel.mention),
-                ephemeral=True
-            )
-
+            for result in (attached, welcome):
+                if isinstance(result, Exception):
+                    raise result
+            if not attached:
+                raise RuntimeError("a reserva do ticket expirou antes de o canal ser criado")
         except Exception as e:
+            await self._rollback_ticket(ticket_id, ticket_channel)
             await interaction.followup.send(TICKET_MESSAGES.get("error_creating_ticket", "").format(erro=str(e)), ephemeral=True)
             print(log_message("ERROR", f"Erro ao criar ticket para {interaction.user}: {e}", "❌"))
+            return
+
+        print(log_message("INFO", f"Ticket criado para {interaction.user} em {ticket_channel.name}", "🎫"))
+        await interaction.followup.send(
+            TICKET_MESSAGES.get("ticket_created_success", "").format(canal_mencao=ticket_channel.mention),
+            ephemeral=True
+        )
+
+    async def _rollback_ticket(self, ticket_id: int, ticket_channel: discord.TextChannel | None):
+        """Desfaz uma criação falhada: apaga o canal (se chegou a ser criado) e liberta a reserva."""
+        if ticket_channel is not None:
+            self.cog.untrack_ticket_channel(ticket_channel.id)
+            try:
+                await outbound.delete(ticket_channel, priority=Priority.INTERACTIVE, reason="Falha na criação do ticket")
+            except discord.NotFound:
+                pass
+            except Exception as e:
+                print(log_message("ERROR", f"Não foi possível apagar o canal {ticket_channel.id} da criação falhada: {e}", "❌"))
+        await asyncio.to_thread(release_ticket_reservation, ticket_id)
 
 class TicketControlView(discord.ui.View):
     def __init__(self, cog_instance):
@@ -183,10 +265,10 @@ class TicketControlView(discord.ui.View):
     async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer(ephemeral=True)
         guild = interaction.guild
-        ticket_data = next((t for t in get_all_open_tickets() if t['channel_id'] == interaction.channel.id), None)
-        category = ticket_data['category'] if ticket_data else ""
-        is_moderator = any(guild.get_role(role_id) in interaction.user.roles for role_id in TICKET_MODERATOR_ROLES.get(category, []))
-        is_creator = ticket_data and ticket_data['creator_id'] == interaction.user.id
+        ticket_data = await asyncio.to_thread(get_open_ticket, interaction.channel.id)
+        category = ticket_data.category if ticket_data else ""
+        is_moderator = any(guild.get_role(role_id) in interaction.user.roles for role_id in get_ticket_moderator_role_ids(guild.id, category))
+        is_creator = ticket_data and ticket_data.creator_id == interaction.user.id
 
         if not is_moderator and not is_creator:
             await interaction.followup.send(TICKET_MESSAGES.get("no_permission_close_ticket", ""), ephemeral=True)
@@ -195,97 +277,342 @@ class TicketControlView(discord.ui.View):
 
         for item in self.children:
             item.disabled = True
-        await interaction.message.edit(view=self)
-
-        await interaction.channel.send(TICKET_MESSAGES.get("close_message", ""))
-        await asyncio.sleep(5)
-        await self.cog.create_ticket_transcript(interaction.channel)
+        await outbound.edit(interaction.message, view=self, priority=Priority.INTERACTIVE)
 
         try:
-            await interaction.channel.delete()
-            remove_ticket_from_db(interaction.channel.id)
-            print(log_message("INFO", f"Ticket {interaction.channel.name} fechado por {interaction.user}", "🔒"))
+            await self.cog.close_ticket_channel(interaction.channel, str(interaction.user), TICKET_MESSAGES.get("close_message", ""))
         except Exception as e:
             await interaction.followup.send(f"Erro ao deletar: {e}", ephemeral=True)
             print(log_message("ERROR", f"Erro ao deletar {interaction.channel.name}: {e}", "❌"))
             for item in self.children:
                 item.disabled = False
-            await interaction.message.edit(view=self)
+            await outbound.edit(interaction.message, view=self, priority=Priority.INTERACTIVE)
 
 class TicketsCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self._ticket_panel_message_id = None
-        self.ticket_moderator_role = None  # Ignorado, usamos TICKET_MODERATOR_ROLES
+        self.ticket_moderator_role = None  # Ignorado, usamos os cargos moderadores configurados por servidor
         load_ticket_messages()
-
-    async def _load_ticket_panel_message_id(self):
+        # Canais de ticket abertos cujas mensagens são guardadas na tabela ticket_messages
+        self._ticket_channels: set[int] = set()
+        # Mensagens por guardar: {message_id: registo}, para que uma edição substitua a versão anterior no mesmo lote
+        self._pending_messages: dict[int, dict] = {}
+        self._deleted_messages: set[int] = set()
+        self._flush_lock = asyncio.Lock()
+        # Criações de ticket em curso por utilizador: {(guild_id, user_id): [Lock, tarefas que o usam ou esperam por ele]}
+        self._ticket_creation_locks: dict[tuple[int, int], list] = {}
+        # Última atividade por gravar: {channel_id: data da última mensagem de um utilizador}
+        self._pending_activity: dict[int, datetime] = {}
+        register_singleton_job(INACTIVITY_SWEEPER_JOB)
+
+    async def cog_load(self):
+        tickets = await asyncio.to_thread(get_open_tickets)
+        self._ticket_channels = {ticket.channel_id for ticket in tickets}
+        register_invalidation_handler('tickets', self._on_tickets_invalidated)
+        self.flush_messages_task.start()
+        self.flush_activity_task.start()
+        self.inactivity_sweeper_task.start()
+        # O botão de fechar tem custom_id fixo: uma única View persistente atende os tickets de todos os canais.
+        self.bot.add_view(TicketControlView(self))
+        if self.bot.is_ready():
+            # Recarregamento a quente (!reload): não há on_ready, por isso os painéis passam já para o novo cog
+            self._reattach_panel_views()
+
+    async def cog_unload(self):
+        unregister_invalidation_handler('tickets', self._on_tickets_invalidated)
+        self.flush_messages_task.cancel()
+        self.flush_activity_task.cancel()
+        self.inactivity_sweeper_task.cancel()
+        await self.flush_ticket_messages()
+        await self.flush_ticket_activity()
+
+    @asynccontextmanager
+    async def ticket_creation_lock(self, guild_id: int, user_id: int):
+        """Serializa as criações de ticket do mesmo utilizador nesta instância."""
+        key = (guild_id, user_id)
+        entry = self._ticket_creation_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
         try:
-            with open(TICKET_PANEL_MESSAGE_FILE, 'r', encoding='utf-8') as f:
-                self._ticket_panel_message_id = int(f.read().strip())
-            print(log_message("INFO", f"ID do painel carregado: {self._ticket_panel_message_id}", "📄"))
-        except (FileNotFoundError, ValueError):
-            self._ticket_panel_message_id = None
-            print(log_message("WARNING", f"Arquivo {TICKET_PANEL_MESSAGE_FILE} não encontrado", "⚠️"))
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._ticket_creation_locks[key]
+
+    # --- Captura das mensagens dos tickets ---
+
+    def track_ticket_channel(self, channel_id: int):
+        self._ticket_channels.add(channel_id)
+
+    def untrack_ticket_channel(self, channel_id: int):
+        self._ticket_channels.discard(channel_id)
+        self._pending_activity.pop(channel_id, None)
+        for message_id in [mid for mid, row in self._pending_messages.items() if row['channel_id'] == channel_id]:
+            del self._pending_messages[message_id]
+
+    def _on_tickets_invalidated(self, payload: dict):
+        """Outra instância abriu ou fechou um ticket (executado numa thread)."""
+        if payload.get('action') == 'add':
+            self._ticket_channels.add(payload['channel_id'])
+        elif payload.get('action') == 'remove':
+            self._ticket_channels.discard(payload['channel_id'])
+        else:
+            # Ressincronização: um canal a mais no conjunto não tem custo (um canal apagado não recebe mensagens)
+            self._ticket_channels |= {ticket.channel_id for ticket in get_open_tickets()}
 
-    async def _save_ticket_panel_message_id(self, message_id: int):
-        self._ticket_panel_message_id = message_id
-        with open(TICKET_PANEL_MESSAGE_FILE, 'w', encoding='utf-8') as f:
-            f.write(str(message_id))
-        print(log_message("INFO", f"ID do painel salvo: {self._ticket_panel_message_id}", "💾"))
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if message.channel.id not in self._ticket_channels:
+            return
+        self._pending_messages[message.id] = message_to_row(message)
+        self._record_activity(message)
+        if len(self._pending_messages) >= TICKET_MESSAGE_BATCH_SIZE:
+            asyncio.create_task(self.flush_ticket_messages())
 
     @commands.Cog.listener()
-    async def on_ready(self):
-        print(log_message("INFO", "TicketsCog pronto", "✅"))
-        await self._load_ticket_panel_message_id()
+    async def on_message_edit(self, before: discord.Message, after: discord.Message):
+        # Só as mensagens em cache do discord.py chegam aqui; as outras ficam com o conteúdo original
+        if after.channel.id in self._ticket_channels:
+            self._pending_messages[after.id] = message_to_row(after)
 
-        if self._ticket_panel_message_id:
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if payload.channel_id in self._ticket_channels:
+            self._pending_messages.pop(payload.message_id, None)
+            self._deleted_messages.add(payload.message_id)
+
+    async def flush_ticket_messages(self):
+        """Guarda as mensagens pendentes num único INSERT. Se falhar, ficam pendentes para a próxima tentativa."""
+        async with self._flush_lock:
+            if not self._pending_messages and not self._deleted_messages:
+                return
+            batch, self._pending_messages = self._pending_messages, {}
+            deleted, self._deleted_messages = self._deleted_messages, set()
             try:
-                channel = self.bot.get_channel(TICKET_PANEL_CHANNEL_ID)
-                if channel:
-                    await channel.fetch_message(self._ticket_panel_message_id)
-                    self.bot.add_view(TicketPanelView(self), message_id=self._ticket_panel_message_id)
-                    print(log_message("INFO", f"View do painel reativada: {self._ticket_panel_message_id}", "🔗"))
-                else:
-                    print(log_message("WARNING", f"Canal {TICKET_PANEL_CHANNEL_ID} não encontrado", "⚠️"))
-                    self._ticket_panel_message_id = None
-            except discord.NotFound:
-                print(log_message("WARNING", f"Mensagem {self._ticket_panel_message_id} não encontrada", "⚠️"))
-                self._ticket_panel_message_id = None
-            except Exception as e:
-                print(log_message("ERROR", f"Erro ao reativar view: {e}", "❌"))
-                self._ticket_panel_message_id = None
+                await asyncio.to_thread(save_ticket_messages, list(batch.values()))
+            except Exception:
+                # Mantém as versões mais recentes que tenham chegado entretanto
+                self._pending_messages = {**batch, **self._pending_messages}
+                self._deleted_messages |= deleted
+                return
+            try:
+                await asyncio.to_thread(delete_ticket_messages, list(deleted))
+            except Exception:
+                self._deleted_messages |= deleted
+
+    @tasks.loop(seconds=TICKET_MESSAGE_FLUSH_SECONDS)
+    async def flush_messages_task(self):
+        await self.flush_ticket_messages()
+
+    # --- Inatividade dos tickets ---
+
+    def _record_activity(self, message: discord.Message):
+        """Só as mensagens de utilizadores contam como atividade (os avisos do bot não adiam o fecho)."""
+        if message.author.bot:
+            return
+        previous = self._pending_activity.get(message.channel.id)
+        if previous is None or message.created_at > previous:
+            self._pending_activity[message.channel.id] = message.created_at
 
-        if not TICKET_MODERATOR_ROLES:
-            print(log_message("WARNING", "TICKET_MODERATOR_ROLES não configurado em config.py", "⚠️"))
+    async def flush_ticket_activity(self):
+        """Grava a última atividade acumulada de todos os tickets numa só instrução."""
+        if not self._pending_activity:
+            return
+        batch, self._pending_activity = self._pending_activity, {}
+        try:
+            await asyncio.to_thread(touch_ticket_activity, batch)
+        except Exception as e:
+            print(log_message("ERROR", f"Falha ao gravar a atividade de {len(batch)} ticket(s), nova tentativa mais tarde: {e}", "❌"))
+            for channel_id, at in batch.items():
+                if channel_id in self._ticket_channels:
+                    self._pending_activity[channel_id] = max(at, self._pending_activity.get(channel_id, at))
+
+    @tasks.loop(seconds=TICKET_ACTIVITY_FLUSH_SECONDS)
+    async def flush_activity_task(self):
+        await self.flush_ticket_activity()
+
+    @tasks.loop(minutes=TICKET_INACTIVITY_SWEEP_MINUTES)
+    async def inactivity_sweeper_task(self):
+        if not is_leader(INACTIVITY_SWEEPER_JOB):
+            return
+        thresholds = [threshold for label, *_ in TICKET_CATEGORIES if (threshold := inactivity_threshold(label))]
+        default_threshold = inactivity_threshold(None)
+        if default_threshold:
+            thresholds.append(default_threshold)
+        if not thresholds:
+            return
 
-        for ticket in get_all_open_tickets():
+        # Grava primeiro a atividade pendente, para não avisar um ticket que acabou de receber mensagens
+        await self.flush_ticket_activity()
+        now = datetime.now(timezone.utc)
+        warning = timedelta(hours=TICKET_INACTIVITY_WARNING_HOURS)
+        try:
+            idle_tickets = await asyncio.to_thread(get_idle_tickets, now - max(min(thresholds) - warning, timedelta(0)))
+        except Exception as e:
+            print(log_message("ERROR", f"Verificação de tickets inativos adiada: {e}", "❌"))
+            return
+
+        for ticket in idle_tickets:
+            threshold = inactivity_threshold(ticket.category)
+            channel = self.bot.get_channel(ticket.channel_id)
+            if threshold is None or channel is None:
+                # Canais já apagados são tratados pela reconciliação de arranque
+                continue
+            idle_for = now - ticket.last_activity_at
             try:
-                channel = self.bot.get_channel(ticket['channel_id'])
-                if channel:
-                    async for message in channel.history(limit=50):
-                        prefix = TICKET_MESSAGES.get("ticket_welcome_embed", {}).get("title", "").split('{')[0].strip()
-                        if message.author == self.bot.user and message.embeds and message.embeds[0].title.startswith(prefix):
-                            self.bot.add_view(TicketControlView(self), message_id=message.id)
-                            print(log_message("INFO", f"View reativada para {channel.name}", "🔗"))
-                            break
-                    else:
-                        print(log_message("WARNING", f"Mensagem não encontrada em {channel.name}", "⚠️"))
-                else:
-                    print(log_message("WARNING", f"Canal {ticket['channel_id']} não encontrado, removido do DB", "⚠️"))
-                    remove_ticket_from_db(ticket['channel_id'])
+                if ticket.inactivity_warned_at is None:
+                    if idle_for >= threshold - warning:
+                        await outbound.send(channel, TICKET_MESSAGES.get("inactivity_warning", "").format(
+                            horas=int(idle_for.total_seconds() // 3600), aviso=TICKET_INACTIVITY_WARNING_HOURS
+                        ), priority=Priority.NORMAL)
+                        await asyncio.to_thread(mark_ticket_warned, ticket.channel_id, now)
+                        print(log_message("INFO", f"Aviso de inatividade enviado em {channel.name}", "⏰"))
+                elif idle_for >= threshold and now - ticket.inactivity_warned_at >= warning:
+                    # Fecha pelo mesmo caminho do botão "Fechar Ticket" (mensagem, transcrito, remoção)
+                    await self.close_ticket_channel(
+                        channel, "fecho automático por inatividade", TICKET_MESSAGES.get("inactivity_close_message", ""),
+                        priority=Priority.BULK
+                    )
+            except Exception as e:
+                print(log_message("ERROR", f"Erro ao tratar o ticket inativo {channel.name}: {e}", "❌"))
+
+    @inactivity_sweeper_task.before_loop
+    async def before_inactivity_sweeper(self):
+        await self.bot.wait_until_ready()
+
+    async def close_ticket_channel(self, channel: discord.TextChannel, closed_by: str, close_message: str, priority: Priority = Priority.INTERACTIVE):
+        """
+        Fecha um ticket: avisa no canal, gera o transcrito, apaga o canal e remove o ticket da base de dados.
+        Usado pelo botão "Fechar Ticket" e pelo fecho automático por inatividade. Levanta a exceção se o canal
+        não puder ser apagado (o ticket continua aberto).
+        """
+        await outbound.send(channel, close_message, priority=priority)
+        await asyncio.sleep(TICKET_CLOSE_DELAY_SECONDS)
+        await self.create_ticket_transcript(channel)
+
+        await outbound.delete(channel, priority=priority)
+        await asyncio.to_thread(remove_ticket, channel.id)
+        self.untrack_ticket_channel(channel.id)
+        print(log_message("INFO", f"Ticket {channel.name} fechado por {closed_by}", "🔒"))
+
+    async def catch_up_ticket_messages(self):
+        """
+        Depois de um arranque ou de uma reconexão, vai buscar ao Discord só as mensagens posteriores
+        à última guardada de cada ticket (as que chegaram enquanto o bot estava desligado).
+        """
+        channels = [channel for channel_id in list(self._ticket_channels) if (channel := self.bot.get_channel(channel_id))]
+        if not channels:
+            return
+        try:
+            last_ids = await asyncio.to_thread(get_last_ticket_message_ids, [channel.id for channel in channels])
+        except Exception as e:
+            print(log_message("ERROR", f"Recuperação de mensagens de tickets adiada: {e}", "❌"))
+            return
+
+        recovered = 0
+        for channel in channels:
+            last_id = last_ids.get(channel.id)
+            after = discord.Object(id=last_id) if last_id else None
+            try:
+                async for message in channel.history(limit=None, after=after, oldest_first=True):
+                    self._pending_messages.setdefault(message.id, message_to_row(message))
+                    self._record_activity(message)
+                    recovered += 1
             except Exception as e:
-                print(log_message("ERROR", f"Erro ao re-adicionar view em {ticket['channel_id']}: {e}", "❌"))
+                print(log_message("ERROR", f"Erro ao recuperar mensagens de {channel.name}: {e}", "❌"))
+        await self.flush_ticket_messages()
+        if recovered:
+            print(log_message("INFO", f"{recovered} mensagem(ns) de tickets recuperada(s) após a desconexão", "📥"))
+
+    def _get_ticket_panel_message_id(self, guild_id: int | None) -> int | None:
+        """Retorna o ID da mensagem do painel de tickets do servidor (guardado em guild_settings)."""
+        return get_guild_config(guild_id)['ticket_panel_message_id']
+
+    def _load_legacy_ticket_panel_message_id(self) -> int | None:
+        """Lê o ID do arquivo antigo (anterior ao armazenamento por servidor), apenas para migração."""
+        try:
+            with open(TICKET_PANEL_MESSAGE_FILE, 'r', encoding='utf-8') as f:
+                return int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    async def _save_ticket_panel_message_id(self, guild_id: int, message_id: int):
+        if await asyncio.to_thread(set_guild_settings, guild_id, {'ticket_panel_message_id': message_id}):
+            print(log_message("INFO", f"ID do painel salvo: {message_id} (servidor {guild_id})", "💾"))
+        else:
+            print(log_message("ERROR", f"Falha ao salvar ID do painel {message_id} (servidor {guild_id})", "❌"))
 
-    @commands.command(name="setuptickets")
+    def _reattach_panel_views(self):
+        """Associa a View do painel deste cog às mensagens de painel já conhecidas (sem pedidos à API)."""
+        for guild in self.bot.guilds:
+            message_id = self._get_ticket_panel_message_id(guild.id)
+            if message_id:
+                self.bot.add_view(TicketPanelView(self, guild.id), message_id=message_id)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        print(log_message("INFO", "TicketsCog pronto", "✅"))
+        with startup_profiler.phase("view_reattach:tickets"):
+            legacy_message_id = self._load_legacy_ticket_panel_message_id()
+            for guild in self.bot.guilds:
+                message_id = self._get_ticket_panel_message_id(guild.id) or legacy_message_id
+                if not get_guild_config(guild.id)['ticket_moderator_roles']:
+                    print(log_message("WARNING", f"Cargos moderadores de tickets não configurados para {guild.name}", "⚠️"))
+                if not message_id:
+                    continue
+                channel = self.bot.get_channel(get_guild_config(guild.id)['ticket_panel_channel_id'])
+                if channel is None or channel.guild.id != guild.id:
+                    print(log_message("WARNING", f"Canal do painel de tickets não encontrado em {guild.name}", "⚠️"))
+                    continue
+                try:
+                    await channel.fetch_message(message_id)
+                    if not self._get_ticket_panel_message_id(guild.id):
+                        # Migra o ID do arquivo antigo para a configuração do servidor onde a mensagem existe
+                        await self._save_ticket_panel_message_id(guild.id, message_id)
+                    self.bot.add_view(TicketPanelView(self, guild.id), message_id=message_id)
+                    print(log_message("INFO", f"View do painel reativada: {message_id} ({guild.name})", "🔗"))
+                except discord.NotFound:
+                    if message_id != legacy_message_id:
+                        print(log_message("WARNING", f"Mensagem {message_id} não encontrada em {guild.name}", "⚠️"))
+                except Exception as e:
+                    print(log_message("ERROR", f"Erro ao reativar view em {guild.name}: {e}", "❌"))
+
+            # Recupera em segundo plano as mensagens enviadas nos tickets enquanto o bot estava desligado
+            asyncio.create_task(self.catch_up_ticket_messages())
+
+            # A limpeza de tickets cujos canais já não existem é uma tarefa singleton: só uma instância a executa.
+            if await asyncio.to_thread(try_acquire_leadership, 'startup_reconciliation'):
+                try:
+                    for ticket in await asyncio.to_thread(get_open_tickets):
+                        if self.bot.get_channel(ticket.channel_id) is None:
+                            print(log_message("WARNING", f"Canal {ticket.channel_id} não encontrado, removido do DB", "⚠️"))
+                            await asyncio.to_thread(remove_ticket, ticket.channel_id)
+                            self.untrack_ticket_channel(ticket.channel_id)
+                    purged = await asyncio.to_thread(purge_orphan_ticket_messages)
+                    if purged:
+                        print(log_message("INFO", f"{purged} mensagem(ns) órfã(s) de tickets removida(s)", "🧹"))
+                except Exception as e:
+                    print(log_message("ERROR", f"Erro na reconciliação de tickets: {e}", "❌"))
+                finally:
+                    # Liberta o lock para que a próxima instância a arrancar (por exemplo, num deploy) possa reconciliar.
+                    await asyncio.to_thread(release_leadership, 'startup_reconciliation')
+            else:
+                print(log_message("INFO", "Reconciliação de tickets ignorada: outra instância é a líder", "ℹ️"))
+
+    @commands.hybrid_command(name="setuptickets", help="Envia ou atualiza o painel de tickets no canal configurado.")
     @commands.has_permissions(administrator=True)
+    @app_commands.default_permissions(administrator=True)
     async def setup_tickets_panel(self, ctx: commands.Context):
         await ctx.defer(ephemeral=True)
 
-        channel = self.bot.get_channel(TICKET_PANEL_CHANNEL_ID)
+        guild_id = ctx.guild.id if ctx.guild else None
+        panel_channel_id = get_guild_config(guild_id)['ticket_panel_channel_id']
+        panel_message_id = self._get_ticket_panel_message_id(guild_id)
+        channel = self.bot.get_channel(panel_channel_id)
         if not channel:
             await ctx.send("Canal não encontrado.", ephemeral=True)
-            print(log_message("ERROR", f"Canal {TICKET_PANEL_CHANNEL_ID} não encontrado", "❌"))
+            print(log_message("ERROR", f"Canal {panel_channel_id} não encontrado", "❌"))
             return
 
         if not TICKET_MESSAGES:
@@ -307,67 +634,105 @@ class TicketsCog(commands.Cog):
             embed.set_thumbnail(url=thumbnail)
         embed.set_footer(text=panel_data.get("footer", "").format(data_hora=datetime.now(timezone.utc).astimezone().strftime('%d/%m/%Y %H:%M')))
 
-        view = TicketPanelView(self)
+        view = TicketPanelView(self, guild_id)
         try:
-            if self._ticket_panel_message_id:
-                message = await channel.fetch_message(self._ticket_panel_message_id)
-                await message.edit(embed=embed, view=view)
+            if panel_message_id:
+                message = await channel.fetch_message(panel_message_id)
+                await outbound.edit(message, embed=embed, view=view)
                 await ctx.send("Painel atualizado.", ephemeral=True)
                 print(log_message("INFO", f"Painel atualizado por {ctx.author}", "🔄"))
             else:
-                message = await channel.send(embed=embed, view=view)
-                await self._save_ticket_panel_message_id(message.id)
+                message = await outbound.send(channel, embed=embed, view=view)
+                await self._save_ticket_panel_message_id(guild_id, message.id)
                 await ctx.send("Painel enviado.", ephemeral=True)
                 print(log_message("INFO", f"Painel enviado por {ctx.author} (ID: {message.id})", "📩"))
         except discord.NotFound:
-            message = await channel.send(embed=embed, view=view)
-            await self._save_ticket_panel_message_id(message.id)
+            message = await outbound.send(channel, embed=embed, view=view)
+            await self._save_ticket_panel_message_id(guild_id, message.id)
             await ctx.send("Painel recriado.", ephemeral=True)
             print(log_message("INFO", f"Painel recriado por {ctx.author} (ID: {message.id})", "📩"))
         except Exception as e:
             await ctx.send(f"Erro: {e}", ephemeral=True)
             print(log_message("ERROR", f"Erro ao enviar painel por {ctx.author}: {e}", "❌"))
 
+    async def _load_ticket_rows(self, channel: discord.TextChannel) -> list[dict]:
+        """
+        Mensagens do ticket para o transcrito, lidas da tabela ticket_messages (sem pedidos à API do Discord).
+        Se a base de dados falhar ou o ticket não tiver mensagens guardadas (por exemplo, aberto antes da captura),
+        volta a ler o histórico do canal.
+        """
+        await self.flush_ticket_messages()
+        try:
+            rows = await asyncio.to_thread(get_ticket_messages, channel.id)
+            if rows:
+                return rows
+        except Exception as e:
+            print(log_message("WARNING", f"Mensagens de {channel.name} indisponíveis na base de dados, a ler o histórico: {e}", "⚠️"))
+        return [message_to_row(msg) async for msg in channel.history(limit=None, oldest_first=True)]
+
     async def create_ticket_transcript(self, channel: discord.TextChannel):
-        transcript_channel = self.bot.get_channel(TICKET_TRANSCRIPTS_CHANNEL_ID)
+        transcripts_channel_id = get_guild_config(channel.guild.id)['ticket_transcripts_channel_id']
+        transcript_channel = self.bot.get_channel(transcripts_channel_id)
         if not transcript_channel:
-            print(log_message("ERROR", f"Canal {TICKET_TRANSCRIPTS_CHANNEL_ID} não encontrado", "❌"))
-            return
+            # O transcrito continua a ser guardado na base de dados (pesquisa com /transcript search)
+            print(log_message("ERROR", f"Canal {transcripts_channel_id} não encontrado", "❌"))
 
-        ticket_data = next((t for t in get_all_open_tickets() if t['channel_id'] == channel.id), None)
-        creator = ticket_data['creator_name'] if ticket_data else "Desconhecido"
-        category = ticket_data['category'] if ticket_data else "N/A"
+        ticket_data = await asyncio.to_thread(get_open_ticket, channel.id)
+        creator = ticket_data.creator_name if ticket_data else "Desconhecido"
+        category = ticket_data.category if ticket_data else "N/A"
+        closed_at = datetime.now(timezone.utc)
 
         content = (
             f"--- Transcrito: {channel.name} ({category}) ---\n"
-            f"Criado por: {creator} ({ticket_data['creator_id'] if ticket_data else 'Desconhecido'}) em {ticket_data['created_at'] if ticket_data else 'N/A'}\n"
-            f"Fechado em: {datetime.now(timezone.utc).astimezone().strftime('%d/%m/%Y %H:%M:%S')}\n\n"
+            f"Criado por: {creator} ({ticket_data.creator_id if ticket_data else 'Desconhecido'}) em {ticket_data.created_at.isoformat() if ticket_data else 'N/A'}\n"
+            f"Fechado em: {closed_at.astimezone().strftime('%d/%m/%Y %H:%M:%S')}\n\n"
         )
 
-        messages = [msg async for msg in channel.history(limit=None, oldest_first=True)]
+        rows = await self._load_ticket_rows(channel)
+        attachments = []
         prefix = TICKET_MESSAGES.get("ticket_welcome_embed", {}).get("title", "").split('{')[0].strip()
 
-        for msg in messages:
-            if (msg.author == self.bot.user and msg.embeds and msg.embeds[0].title.startswith(prefix)) or \
-               (msg.author == self.bot.user and msg.content == TICKET_MESSAGES.get("close_message", "")):
+        for row in rows:
+            from_bot = row['author_id'] == self.bot.user.id
+            if (from_bot and row['embeds'] and (row['embeds'][0]['title'] or "").startswith(prefix)) or \
+               (from_bot and row['content'] in (TICKET_MESSAGES.get("close_message", ""), TICKET_MESSAGES.get("inactivity_close_message", ""))):
                 continue
-            timestamp = msg.created_at.astimezone().strftime('%d/%m/%Y %H:%M:%S')
-            content += f"[{timestamp}] {msg.author.display_name}: {msg.content}\n"
-            for attach in msg.attachments:
-                content += f"     [Anexo: {attach.url}]\n"
-            if msg.embeds:
-                for embed in msg.embeds:
-                    desc = (embed.description[:100] + "...") if embed.description and len(embed.description) > 100 else embed.description or ""
-                    content += f"     [Embed: '{embed.title or 'Sem Título'}', '{desc}']\n"
+            timestamp = row['created_at'].astimezone().strftime('%d/%m/%Y %H:%M:%S')
+            content += f"[{timestamp}] {row['author_name']}: {row['content']}\n"
+            for attach in row['attachments']:
+                content += f"     [Anexo: {attach['url']}]\n"
+                attachments.append(StoredAttachment.from_dict(attach))
+            for embed in row['embeds']:
+                desc = (embed['description'][:100] + "...") if embed['description'] and len(embed['description']) > 100 else embed['description'] or ""
+                content += f"     [Embed: '{embed['title'] or 'Sem Título'}', '{desc}']\n"
+
+        # Os links do CDN expiram: os anexos seguem num .zip ao lado do transcrito
+        archive = AttachmentArchive()
+        if TICKET_ARCHIVE_ATTACHMENTS and attachments and transcript_channel:
+            # O .zip e o transcrito vão na mesma mensagem, por isso partilham o limite de upload do servidor
+            size_limit = channel.guild.filesize_limit - len(content.encode('utf-8')) - 64 * 1024
+            try:
+                attachments = await refresh_attachment_urls(self.bot.http, attachments)
+                archive = await archive_attachments(attachments, size_limit)
+            except Exception as e:
+                print(log_message("ERROR", f"Erro ao arquivar anexos de {channel.name}: {e}", "❌"))
+            content += "\n--- Anexos ---\n"
+            for attach in attachments:
+                if attach.id in archive.archived:
+                    content += f"{attach.filename}: arquivado como {archive.archived[attach.id]}\n"
+                else:
+                    content += f"{attach.filename}: não arquivado ({archive.skipped.get(attach.id, 'erro')}) - {attach.url}\n"
 
         content += "\n--- Fim do Transcrito ---\n"
 
-        file_path = f"{channel.name}_transcript.txt"
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-
+        transcript_message = None
         try:
-            file = discord.File(file_path, filename=f"{channel.name}.txt")
+            if not transcript_channel:
+                raise RuntimeError(f"canal de transcritos {transcripts_channel_id} não encontrado")
+            # O transcrito é enviado a partir da memória (sem escrita em disco no event loop)
+            files = [discord.File(io.BytesIO(content.encode('utf-8')), filename=f"{channel.name}.txt")]
+            if archive.file is not None:
+                files.append(discord.File(archive.file, filename=f"{channel.name}_anexos.zip"))
             transcript_data = TICKET_MESSAGES.get("transcript_embed", {})
             embed = discord.Embed(
                 title=transcript_data.get("title", "").format(canal=channel.name),
@@ -377,13 +742,29 @@ class TicketsCog(commands.Cog):
             if thumbnail := transcript_data.get("thumbnail_url"):
                 embed.set_thumbnail(url=thumbnail)
             embed.set_footer(text=transcript_data.get("footer", "").format(data_hora=datetime.now(timezone.utc).astimezone().strftime('%d/%m/%Y %H:%M')))
-            await transcript_channel.send(embed=embed, file=file)
+            transcript_message = await outbound.send(transcript_channel, embed=embed, files=files, priority=Priority.LOG)
             print(log_message("INFO", f"Transcrito de {channel.name} enviado", "📄"))
         except Exception as e:
             print(log_message("ERROR", f"Erro ao enviar transcrito de {channel.name}: {e}", "❌"))
         finally:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            archive.close()
+
+        # Guarda o transcrito para a pesquisa de texto integral
+        saved = await asyncio.to_thread(save_ticket_transcript, {
+            'channel_id': channel.id,
+            'guild_id': channel.guild.id,
+            'channel_name': channel.name,
+            'category': category,
+            'creator_id': ticket_data.creator_id if ticket_data else None,
+            'creator_name': creator,
+            'created_at': ticket_data.created_at if ticket_data else None,
+            'closed_at': closed_at,
+            'content': content.replace('\x00', ''),  # O PostgreSQL não aceita NUL em TEXT
+            'transcript_channel_id': transcript_message.channel.id if transcript_message else None,
+            'transcript_message_id': transcript_message.id if transcript_message else None
+        })
+        if not saved:
+            print(log_message("ERROR", f"Transcrito de {channel.name} não foi guardado na base de dados", "❌"))
 
     @app_commands.command(name="add", description="Adiciona um usuário ou cargo ao ticket.")
     @app_commands.describe(target="Usuário ou cargo a adicionar.")
@@ -393,17 +774,17 @@ class TicketsCog(commands.Cog):
             print(log_message("WARNING", f"/add fora de canal de texto por {interaction.user}", "⚠️"))
             return
 
-        ticket_data = next((t for t in get_all_open_tickets() if t['channel_id'] == interaction.channel.id), None)
+        ticket_data = await asyncio.to_thread(get_open_ticket, interaction.channel.id)
         if not ticket_data:
             await interaction.response.send_message("Use em canal de ticket.", ephemeral=True)
             print(log_message("WARNING", f"/add fora de ticket por {interaction.user}", "⚠️"))
             return
 
         guild = interaction.guild
-        category = ticket_data['category']
-        moderator_role_ids = TICKET_MODERATOR_ROLES.get(category, [])
+        category = ticket_data.category
+        moderator_role_ids = get_ticket_moderator_role_ids(guild.id, category)
         is_moderator = any(guild.get_role(role_id) in interaction.user.roles for role_id in moderator_role_ids)
-        is_creator = ticket_data and ticket_data['creator_id'] == interaction.user.id
+        is_creator = ticket_data and ticket_data.creator_id == interaction.user.id
 
         if not is_moderator and not is_creator:
             await interaction.response.send_message("Você não tem permissão para usar este comando.", ephemeral=True)
@@ -429,17 +810,17 @@ class TicketsCog(commands.Cog):
             print(log_message("WARNING", f"/remove fora de canal de texto por {interaction.user}", "⚠️"))
             return
 
-        ticket_data = next((t for t in get_all_open_tickets() if t['channel_id'] == interaction.channel.id), None)
+        ticket_data = await asyncio.to_thread(get_open_ticket, interaction.channel.id)
         if not ticket_data:
             await interaction.response.send_message("Use em canal de ticket.", ephemeral=True)
             print(log_message("WARNING", f"/remove fora de ticket por {interaction.user}", "⚠️"))
             return
 
         guild = interaction.guild
-        category = ticket_data['category']
-        moderator_role_ids = TICKET_MODERATOR_ROLES.get(category, [])
+        category = ticket_data.category
+        moderator_role_ids = get_ticket_moderator_role_ids(guild.id, category)
         is_moderator = any(guild.get_role(role_id) in interaction.user.roles for role_id in moderator_role_ids)
-        is_creator = ticket_data and ticket_data['creator_id'] == interaction.user.id
+        is_creator = ticket_data and ticket_data.creator_id == interaction.user.id
 
         if not is_moderator and not is_creator:
             await interaction.response.send_message("Você não tem permissão para usar este comando.", ephemeral=True)
@@ -465,17 +846,17 @@ class TicketsCog(commands.Cog):
             print(log_message("WARNING", f"/rename fora de canal de texto por {interaction.user}", "⚠️"))
             return
 
-        ticket_data = next((t for t in get_all_open_tickets() if t['channel_id'] == interaction.channel.id), None)
+        ticket_data = await asyncio.to_thread(get_open_ticket, interaction.channel.id)
         if not ticket_data:
             await interaction.response.send_message("Use em canal de ticket.", ephemeral=True)
             print(log_message("WARNING", f"/rename fora de ticket por {interaction.user}", "⚠️"))
             return
 
         guild = interaction.guild
-        category = ticket_data['category']
-        moderator_role_ids = TICKET_MODERATOR_ROLES.get(category, [])
+        category = ticket_data.category
+        moderator_role_ids = get_ticket_moderator_role_ids(guild.id, category)
         is_moderator = any(guild.get_role(role_id) in interaction.user.roles for role_id in moderator_role_ids)
-        is_creator = ticket_data and ticket_data['creator_id'] == interaction.user.id
+        is_creator = ticket_data and ticket_data.creator_id == interaction.user.id
 
         if not is_moderator and not is_creator:
             await interaction.response.send_message("Você não tem permissão para usar este comando.", ephemeral=True)
@@ -490,7 +871,7 @@ class TicketsCog(commands.Cog):
         formatted_name = ''.join(c for c in new_name.lower().replace(' ', '-') if c.isalnum() or c == '-')
         try:
             old_name = interaction.channel.name
-            await interaction.channel.edit(name=formatted_name)
+            await outbound.submit(interaction.channel.id, lambda: interaction.channel.edit(name=formatted_name), priority=Priority.INTERACTIVE)
             await interaction.response.send_message(f"✅ Renomeado de `{old_name}` para `{formatted_name}`.", ephemeral=True)
             print(log_message("INFO", f"{interaction.user} renomeou {old_name} para {formatted_name}", "✏️"))
         except discord.Forbidden:
@@ -500,11 +881,12 @@ class TicketsCog(commands.Cog):
             await interaction.response.send_message(f"❌ Erro: {e}", ephemeral=True)
             print(log_message("ERROR", f"Erro ao renomear {interaction.channel.name} por {interaction.user}: {e}", "❌"))
 
-    @commands.command(name="cleartickets")
+    @commands.hybrid_command(name="cleartickets", help="Apaga todos os tickets abertos deste servidor.")
     @commands.has_permissions(administrator=True)
+    @app_commands.default_permissions(administrator=True)
     async def clear_all_tickets(self, ctx: commands.Context):
         await ctx.defer(ephemeral=True)
-        tickets = get_all_open_tickets()
+        tickets = await asyncio.to_thread(get_open_tickets, ctx.guild.id if ctx.guild else None)
         if not tickets:
             await ctx.send("Nenhum ticket aberto.", ephemeral=True)
             print(log_message("INFO", f"Sem tickets para limpar por {ctx.author}", "ℹ️"))
@@ -516,21 +898,24 @@ class TicketsCog(commands.Cog):
         print(log_message("INFO", f"Iniciando limpeza de {len(tickets)} tickets por {ctx.author}", "🧹"))
 
         for ticket in tickets:
-            channel_id = ticket['channel_id']
-            name = f"ticket-{ticket.get('creator_name', 'unknown').lower().replace(' ', '-')}"
+            channel_id = ticket.channel_id
+            name = f"ticket-{(ticket.creator_name or 'unknown').lower().replace(' ', '-')}"
             try:
                 channel = self.bot.get_channel(channel_id)
                 if channel:
-                    await channel.delete(reason="!cleartickets")
-                    remove_ticket_from_db(channel_id)
+                    await outbound.delete(channel, priority=Priority.BULK, reason="!cleartickets")
+                    await asyncio.to_thread(remove_ticket, channel_id)
+                    self.untrack_ticket_channel(channel_id)
                     deleted += 1
                     print(log_message("INFO", f"Ticket {name} (ID: {channel_id}) deletado", "🗑️"))
                 else:
-                    remove_ticket_from_db(channel_id)
+                    await asyncio.to_thread(remove_ticket, channel_id)
+                    self.untrack_ticket_channel(channel_id)
                     deleted += 1
                     print(log_message("INFO", f"Ticket {name} (ID: {channel_id}) removido do DB", "🗑️"))
             except discord.NotFound:
-                remove_ticket_from_db(channel_id)
+                await asyncio.to_thread(remove_ticket, channel_id)
+                self.untrack_ticket_channel(channel_id)
                 deleted += 1
                 print(log_message("INFO", f"Ticket {name} (ID: {channel_id}) já deletado", "🗑️"))
             except Exception as e:
@@ -0,0 +1,138 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+import asyncio
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+# Importa a pesquisa de texto integral nos transcritos guardados
+from database import search_ticket_transcripts
+from config import TICKET_CATEGORIES, DISPLAY_TIMEZONE
+# O cargo autorizado é resolvido pela configuração de cada servidor (o mesmo do /horas)
+from guild_config import has_guild_role
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+RESULTS_PER_PAGE = 5
+
+def _parse_date(value: str | None, end_of_day: bool = False) -> datetime | None:
+    """Converte DD/MM/YYYY (no fuso horário de exibição) num datetime com fuso horário."""
+    if not value:
+        return None
+    day = datetime.strptime(value, '%d/%m/%Y').replace(tzinfo=ZoneInfo(DISPLAY_TIMEZONE))
+    return day + timedelta(days=1) - timedelta(microseconds=1) if end_of_day else day
+
+class TranscriptSearchView(discord.ui.View):
+    """Botões de paginação dos resultados de /transcript search (apenas para quem fez a pesquisa)."""
+
+    def __init__(self, cog, user_id: int, filters: dict, total: int, page: int = 0):
+        super().__init__(timeout=300)
+        self.cog = cog
+        self.user_id = user_id
+        self.filters = filters
+        self.total = total
+        self.page = page
+        self._update_buttons()
+
+    @property
+    def page_count(self) -> int:
+        return max(1, (self.total + RESULTS_PER_PAGE - 1) // RESULTS_PER_PAGE)
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.user_id
+
+    async def _show_page(self, interaction: discord.Interaction, page: int):
+        await interaction.response.defer()
+        self.page = page
+        embed, self.total = await self.cog.build_results_embed(self.filters, page)
+        self._update_buttons()
+        await interaction.edit_original_response(embed=embed, view=self)
+
+    @discord.ui.button(label="Anterior", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page - 1)
+
+    @discord.ui.button(label="Seguinte", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page + 1)
+
+class TranscriptsCog(commands.Cog):
+    transcript_group = app_commands.Group(name="transcript", description="Transcritos dos tickets fechados.", guild_only=True)
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def build_results_embed(self, filters: dict, page: int) -> tuple[discord.Embed, int]:
+        """Executa a pesquisa para a página indicada. Retorna (embed, total de resultados)."""
+        started = time.perf_counter()
+        total, results = await asyncio.to_thread(
+            search_ticket_transcripts, **filters, limit=RESULTS_PER_PAGE, offset=page * RESULTS_PER_PAGE
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        embed = discord.Embed(
+            title=f"🔎 Transcritos: \"{filters['query']}\"",
+            description=f"{total} resultado(s)." if total else "Nenhum transcrito encontrado.",
+            color=discord.Color.blue()
+        )
+        display_tz = ZoneInfo(DISPLAY_TIMEZONE)
+        for result in results:
+            closed_at = result['closed_at'].astimezone(display_tz).strftime('%d/%m/%Y %H:%M')
+            value = f"**{result['creator_name']}** · fechado em {closed_at}\n{result['snippet'][:700]}"
+            if result['transcript_message_id']:
+                value += f"\n[Abrir transcrito](https://discord.com/channels/{result['guild_id']}/{result['transcript_channel_id']}/{result['transcript_message_id']})"
+            embed.add_field(name=f"#{result['channel_name']} · {result['category']}", value=value[:1024], inline=False)
+        pages = max(1, (total + RESULTS_PER_PAGE - 1) // RESULTS_PER_PAGE)
+        embed.set_footer(text=f"Página {page + 1}/{pages} · {elapsed_ms:.0f} ms")
+        return embed, total
+
+    @transcript_group.command(name="search", description="Pesquisa nos transcritos dos tickets fechados.")
+    @app_commands.describe(
+        termos="Texto a pesquisar (aceita \"frase exata\", -excluir e OR).",
+        categoria="Apenas tickets desta categoria.",
+        criador="Apenas tickets abertos por este utilizador.",
+        desde="Fechados a partir de (DD/MM/YYYY).",
+        ate="Fechados até (DD/MM/YYYY)."
+    )
+    @app_commands.choices(categoria=[app_commands.Choice(name=cat[0], value=cat[0]) for cat in TICKET_CATEGORIES])
+    @has_guild_role()
+    async def transcript_search(self, interaction: discord.Interaction, termos: str,
+                                categoria: app_commands.Choice[str] = None, criador: discord.User = None,
+                                desde: str = None, ate: str = None):
+        await interaction.response.defer(ephemeral=True)
+        try:
+            start_time = _parse_date(desde)
+            end_time = _parse_date(ate, end_of_day=True)
+        except ValueError:
+            await interaction.followup.send("Formato de data inválido. Use DD/MM/YYYY.", ephemeral=True)
+            return
+
+        filters = {
+            'query': termos,
+            'guild_id': interaction.guild_id,
+            'category': categoria.value if categoria else None,
+            'creator_id': criador.id if criador else None,
+            'start_time': start_time,
+            'end_time': end_time
+        }
+        try:
+            embed, total = await self.build_results_embed(filters, 0)
+        except Exception as e:
+            await interaction.followup.send(f"❌ Erro ao pesquisar transcritos: {e}", ephemeral=True)
+            print(log_message("ERROR", f"Erro na pesquisa de transcritos por {interaction.user}: {e}", "❌"))
+            return
+
+        view = TranscriptSearchView(self, interaction.user.id, filters, total) if total > RESULTS_PER_PAGE else discord.utils.MISSING
+        await interaction.followup.send(embed=embed, view=view, ephemeral=True)
+        print(log_message("INFO", f"{interaction.user} pesquisou transcritos: '{termos}' ({total} resultado(s))", "🔎"))
+
+async def setup(bot):
+    await bot.add_cog(TranscriptsCog(bot))
@@ -1,9 +1,68 @@
 import os
+import socket
 import discord
 
 # --- Configurações de Conexão e Banco de Dados ---
 TOKEN = os.getenv('DISCORD_BOT_TOKEN') # O token do bot, lido de uma variável de ambiente
 
+# Número de shards do bot. Se não definido, o Discord recomenda o número adequado automaticamente.
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+
+# Pool de ligações do repositório (repository.py). Cada ligação prepara as consultas frequentes uma única vez.
+# O máximo deve ficar abaixo do limite de ligações do plano do PostgreSQL (as ligações de database.py contam à parte).
+DB_POOL_MIN_CONNECTIONS = int(os.getenv('DB_POOL_MIN_CONNECTIONS', '1'))
+DB_POOL_MAX_CONNECTIONS = int(os.getenv('DB_POOL_MAX_CONNECTIONS', '8'))
+# Réplica de leitura opcional (DATABASE_READ_URL) para relatórios e pesquisas. Acima deste atraso, em segundos,
+# as consultas voltam ao primário; o atraso é medido no máximo a cada DB_READ_LAG_CHECK_SECONDS.
+DB_READ_POOL_MAX_CONNECTIONS = int(os.getenv('DB_READ_POOL_MAX_CONNECTIONS', '4'))
+DB_READ_MAX_LAG_SECONDS = float(os.getenv('DB_READ_MAX_LAG_SECONDS', '30'))
+DB_READ_LAG_CHECK_SECONDS = 15
+
+# --- Perfil de Execução ---
+# Modo "lean": ativa apenas as intents de que os cogs carregados precisam, não guarda membros em cache
+# (os membros chegam nos payloads das interações e mensagens) e não faz chunking dos servidores no arranque.
+LEAN_MODE = os.getenv('LEAN_MODE', 'false').lower() in ('1', 'true', 'yes')
+# Modo só slash: desliga o parser de comandos de prefixo e a intent message_content.
+# Todos os comandos continuam disponíveis como comandos de barra (/).
+SLASH_ONLY_MODE = os.getenv('SLASH_ONLY_MODE', 'false').lower() in ('1', 'true', 'yes')
+# Conta os eventos recebidos do gateway (por tipo) para o relatório do comando !runtime.
+GATEWAY_EVENT_METRICS = os.getenv('GATEWAY_EVENT_METRICS', 'true').lower() in ('1', 'true', 'yes')
+
+# --- Monitorização do Event Loop ---
+# Um callback que bloqueie o event loop mais do que este limite é reportado com a stack (interações do Discord
+# têm 3 segundos para responder, por isso bloqueios longos acabam em "interaction failed").
+LOOP_LAG_THRESHOLD_MS = int(os.getenv('LOOP_LAG_THRESHOLD_MS', '250'))
+# Modo de depuração: ativa o modo debug do asyncio e deteta chamadas síncronas à base de dados feitas no event loop.
+LOOP_DEBUG = os.getenv('LOOP_DEBUG', 'false').lower() in ('1', 'true', 'yes')
+# Porta do endpoint HTTP /health (0 desativa). No Railway, a variável PORT é definida automaticamente.
+HEALTH_PORT = int(os.getenv('HEALTH_PORT') or os.getenv('PORT') or 0)
+
+# Tracing por interação (tracing.py): spans da interação, das consultas à base de dados e dos pedidos ao Discord,
+# escritos em JSON no formato OTLP em TRACE_FILE (com rotação). Ficam sempre os traces mais lentos do que
+# TRACE_SLOW_THRESHOLD_MS ou com erro, e uma fração TRACE_SAMPLE_RATE dos restantes.
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.05'))
+TRACE_SLOW_THRESHOLD_MS = float(os.getenv('TRACE_SLOW_THRESHOLD_MS', '2000'))
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces.otlp.jsonl')
+TRACE_FILE_MAX_BYTES = int(os.getenv('TRACE_FILE_MAX_BYTES', str(20 * 1024 * 1024)))
+TRACE_FILE_BACKUPS = 3
+
+# --- Fila de Saída para o Discord ---
+# Envios, edições e remoções passam por um despachante com prioridades (outbound.py).
+OUTBOUND_WORKERS = int(os.getenv('OUTBOUND_WORKERS', '4')) # Pedidos em simultâneo (no máximo um por canal)
+OUTBOUND_GLOBAL_RATE = int(os.getenv('OUTBOUND_GLOBAL_RATE', '40')) # Pedidos por segundo (o limite global do Discord é 50)
+OUTBOUND_BACKGROUND_SHARE = float(os.getenv('OUTBOUND_BACKGROUND_SHARE', '0.5')) # Parte do ritmo global que logs e operações em massa podem usar
+
+# --- Coordenação entre Instâncias ---
+# Identificador desta instância do bot (útil para deploys sem downtime com dois processos em simultâneo).
+INSTANCE_ID = os.getenv('INSTANCE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+# Intervalo (em segundos) entre tentativas de assumir as tarefas singleton (advisory locks no PostgreSQL).
+LEADER_ELECTION_INTERVAL_SECONDS = 15
+
+# --- Valores Padrão por Servidor ---
+# Os IDs abaixo são os valores padrão de cada servidor. Cada servidor pode substituí-los com o comando
+# !config (guardado na tabela 'guild_settings'), o que permite servir vários departamentos com um só bot.
+
 # IDs dos Canais (Lidos de variáveis de ambiente)
 # Certifique-se de que estas variáveis de ambiente estão definidas em seu .env (local) ou no Railway.
 PUNCH_CHANNEL_ID = int(os.getenv('PUNCH_CHANNEL_ID')) if os.getenv('PUNCH_CHANNEL_ID') else None # Canal onde os botões de ponto são enviados
@@ -12,11 +71,17 @@ PUNCH_LOGS_CHANNEL_ID = int(os.getenv('PUNCH_LOGS_CHANNEL_ID')) if os.getenv('PU
 TICKET_PANEL_CHANNEL_ID = int(os.getenv('TICKET_PANEL_CHANNEL_ID')) if os.getenv('TICKET_PANEL_CHANNEL_ID') else None # Canal onde o painel de tickets é enviado
 TICKET_TRANSCRIPTS_CHANNEL_ID = int(os.getenv('TICKET_TRANSCRIPTS_CHANNEL_ID')) if os.getenv('TICKET_TRANSCRIPTS_CHANNEL_ID') else None # Canal para enviar transcritos de tickets
 
-# Nome dos arquivos onde os IDs das mensagens serão salvos (para persistência das Views).
+# Nome dos arquivos onde os IDs das mensagens eram salvos (para persistência das Views).
+# Os IDs passaram a ser guardados por servidor na tabela 'guild_settings'; os arquivos só são lidos para migração.
 PUNCH_MESSAGE_FILE = 'punch_message_id.txt'
 TICKET_PANEL_MESSAGE_FILE = 'ticket_panel_message_id.txt'
 TICKET_MESSAGES_FILE = 'ticket_messages.json'
 
+# Journal local (append-only, com fsync) onde as picagens são escritas antes de irem para o PostgreSQL.
+# Se a base de dados estiver inacessível, as picagens ficam no journal e são reaplicadas por ordem quando voltar.
+PUNCH_JOURNAL_FILE = os.getenv('PUNCH_JOURNAL_FILE', 'punch_journal.jsonl')
+PUNCH_JOURNAL_REPLAY_INTERVAL_SECONDS = 10 # Intervalo entre tentativas de reaplicar o journal
+
 # ID do Cargo Autorizado (para comandos administrativos gerais, como !mascote, !forcereport, !clear, !clearpunchdb)
 ROLE_ID = int(os.getenv('ROLE_ID')) if os.getenv('ROLE_ID') else None
 # ID do cargo que pode fechar tickets (e.g., um cargo de Moderador ou Admin no sistema de tickets)
@@ -42,6 +107,48 @@ TICKET_MODERATOR_ROLES = {
     "Eventos": [1198476681569128480]
 }
 
+# Arquivo dos anexos dos tickets: ao fechar, os anexos são descarregados (os links do CDN do Discord expiram)
+# e enviados num .zip junto com o transcrito.
+TICKET_ARCHIVE_ATTACHMENTS = os.getenv('TICKET_ARCHIVE_ATTACHMENTS', 'true').lower() in ('1', 'true', 'yes')
+TICKET_ARCHIVE_CONCURRENCY = 4 # Downloads em simultâneo
+TICKET_ARCHIVE_MAX_FILE_BYTES = 25 * 1024 * 1024 # Anexos maiores do que isto não são arquivados
+TICKET_ARCHIVE_SPOOL_BYTES = 4 * 1024 * 1024 # Acima disto, os arquivos temporários passam da memória para o disco
+TICKET_ARCHIVE_DOWNLOAD_TIMEOUT_SECONDS = 60
+
+# As mensagens dos tickets abertos são guardadas na tabela 'ticket_messages' em lotes:
+# no máximo a cada TICKET_MESSAGE_FLUSH_SECONDS segundos, ou logo que o lote chegue a TICKET_MESSAGE_BATCH_SIZE mensagens.
+TICKET_MESSAGE_FLUSH_SECONDS = 2
+TICKET_MESSAGE_BATCH_SIZE = 100
+
+# Criação de tickets: cada utilizador pode ter no máximo TICKET_MAX_OPEN_PER_USER tickets abertos (um por categoria).
+# A vaga é reservada na base de dados antes de criar o canal; uma reserva sem canal ao fim de
+# TICKET_RESERVATION_TIMEOUT_SECONDS (por exemplo, o processo morreu a meio) é descartada.
+TICKET_MAX_OPEN_PER_USER = 2
+TICKET_RESERVATION_TIMEOUT_SECONDS = 300
+# Tempo entre a mensagem de fecho e a geração do transcrito/remoção do canal
+TICKET_CLOSE_DELAY_SECONDS = 5
+
+# Fecho automático de tickets inativos (sem mensagens de utilizadores), em horas por categoria (0 desativa).
+# O ticket recebe um aviso TICKET_INACTIVITY_WARNING_HOURS antes do prazo e é fechado se ninguém responder.
+TICKET_INACTIVITY_HOURS = {
+    "Administração": 168,
+    "Recrutamentos": 72,
+    "Recursos Humanos": 168,
+    "Eventos": 72
+}
+TICKET_INACTIVITY_DEFAULT_HOURS = int(os.getenv('TICKET_INACTIVITY_DEFAULT_HOURS', '72'))
+TICKET_INACTIVITY_WARNING_HOURS = 24
+TICKET_INACTIVITY_SWEEP_MINUTES = 10
+# A última atividade de cada ticket é gravada em lotes, no máximo a cada TICKET_ACTIVITY_FLUSH_SECONDS segundos.
+TICKET_ACTIVITY_FLUSH_SECONDS = 60
+
+# --- Relatórios agendados ---
+# Períodos publicados automaticamente no canal 'weekly_report_channel_id' de cada servidor ('semana' e/ou 'mes').
+# Depois de uma paragem, os períodos em falta são publicados por ordem, até REPORT_CATCH_UP_LIMIT por período.
+REPORT_SCHEDULE_PERIODS = tuple(p.strip() for p in os.getenv('REPORT_SCHEDULE_PERIODS', 'semana,mes').split(',') if p.strip())
+REPORT_SCHEDULER_INTERVAL_MINUTES = 15
+REPORT_CATCH_UP_LIMIT = 8
+
 
 # --- Configurações de Status e Atividade do Bot ---
 DEFAULT_STATUS_TYPE = discord.Status.online
@@ -56,6 +163,12 @@ BOT_ACTIVITIES = [
 
 ACTIVITY_CHANGE_INTERVAL_SECONDS = 30 # 30 segundos
 
+# O gateway do Discord aceita 120 comandos por 60 segundos por shard (o discord.py reserva 10 para heartbeats).
+# A rotação de atividades é adiada quando restam menos comandos do que este limite na janela atual,
+# e o intervalo de rotação é alargado (até ACTIVITY_MAX_SLOWDOWN vezes) enquanto o gateway estiver ocupado.
+PRESENCE_MIN_GATEWAY_BUDGET = 30
+ACTIVITY_MAX_SLOWDOWN = 4
+
 # --- Configurações de Fuso Horário ---
 # Fuso horário para exibição das horas no Discord.
 # Use nomes de fusos horários do banco de dados IANA (ex: 'Europe/Lisbon', 'America/Sao_Paulo', 'America/New_York')
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import threading
+import time
+import zlib
+import psycopg2
+import psycopg2.extensions
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import INSTANCE_ID
+from database import get_db_connection, INVALIDATION_CHANNEL
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+# --- Eleição de líder com advisory locks ---
+# Cada tarefa singleton (rotação de presença, reconciliação de arranque, ...) tem um advisory lock próprio.
+# O lock é de sessão: fica com a instância enquanto a sua ligação dedicada estiver aberta, e é libertado
+# automaticamente pelo PostgreSQL quando o processo termina (por exemplo, no fim de um deploy).
+
+_leader_conn = None
+_held_locks: set[str] = set()
+# Tarefas contínuas cuja liderança é disputada periodicamente pela tarefa de coordenação.
+_singleton_jobs: set[str] = set()
+
+def register_singleton_job(job: str):
+    """Regista uma tarefa contínua que só deve correr numa instância de cada vez."""
+    _singleton_jobs.add(job)
+
+def refresh_leadership() -> set[str]:
+    """
+    Tenta assumir (ou confirma) a liderança de todas as tarefas registadas.
+    Retorna o conjunto de tarefas lideradas por esta instância. Chamada bloqueante.
+    """
+    for job in sorted(_singleton_jobs):
+        try_acquire_leadership(job)
+    return set(_held_locks)
+
+def _lock_key(job: str) -> int:
+    """Converte o nome da tarefa numa chave estável de advisory lock (int32 com sinal)."""
+    return zlib.crc32(f"lspd:{job}".encode()) - 2**31
+
+def _get_leader_connection():
+    global _leader_conn
+    if _leader_conn is None or _leader_conn.closed:
+        # Uma ligação nova não tem locks: qualquer liderança anterior foi perdida.
+        _held_locks.clear()
+        _leader_conn = get_db_connection()
+        _leader_conn.autocommit = True
+    return _leader_conn
+
+def try_acquire_leadership(job: str) -> bool:
+    """
+    Tenta tornar esta instância líder da tarefa indicada (não bloqueia).
+    Retorna True se esta instância é (ou passou a ser) a líder.
+    Chamada bloqueante: usar com asyncio.to_thread a partir do event loop.
+    """
+    try:
+        conn = _get_leader_connection()
+        with conn.cursor() as cursor:
+            if job in _held_locks:
+                # Confirma que a ligação continua viva (se caiu, o lock foi libertado).
+                cursor.execute("SELECT 1")
+                return True
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (_lock_key(job),))
+            acquired = cursor.fetchone()[0]
+        if acquired:
+            _held_locks.add(job)
+            print(log_message("INFO", f"Instância {INSTANCE_ID} é agora líder de '{job}'", "👑"))
+        return acquired
+    except Exception as e:
+        print(log_message("ERROR", f"Falha na eleição de líder para '{job}': {e}", "❌"))
+        _release_leader_connection()
+        return False
+
+def release_leadership(job: str):
+    """Liberta a liderança da tarefa indicada (chamada bloqueante)."""
+    if job not in _held_locks:
+        return
+    try:
+        with _get_leader_connection().cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (_lock_key(job),))
+    except Exception as e:
+        print(log_message("ERROR", f"Falha ao libertar liderança de '{job}': {e}", "❌"))
+    _held_locks.discard(job)
+
+def is_leader(job: str) -> bool:
+    """Retorna se esta instância é a líder da tarefa (sem consultar a base de dados)."""
+    return job in _held_locks
+
+def _release_leader_connection():
+    global _leader_conn
+    _held_locks.clear()
+    if _leader_conn is not None:
+        try:
+            _leader_conn.close()
+        except Exception:
+            pass
+    _leader_conn = None
+
+def close_leadership():
+    """Fecha a ligação de liderança, libertando todos os locks desta instância."""
+    _release_leader_connection()
+
+# --- Invalidação de caches com LISTEN/NOTIFY ---
+# As escritas em database.py publicam uma notificação no canal INVALIDATION_CHANNEL dentro da mesma
+# transação (só é entregue após o commit). Cada instância escuta esse canal e chama os handlers
+# registados para o tipo de notificação, ignorando as notificações que ela própria publicou.
+#
+# As notificações de cada tipo são entregues por ordem, uma de cada vez, numa thread: um resultado antigo nunca
+# substitui um mais recente. Uma ressincronização completa ('resync') espera RESYNC_DEBOUNCE_SECONDS e cobre
+# todas as notificações desse tipo que chegaram antes dela, que deixam de ser entregues uma a uma.
+
+RESYNC_DEBOUNCE_SECONDS = 2
+
+_invalidation_handlers: dict[str, list] = {}
+
+def register_invalidation_handler(kind: str, handler):
+    """
+    Regista um handler para um tipo de notificação ('punches', 'tickets', 'guild_config', ...).
+    O handler recebe o payload (dict) e é executado numa thread, podendo fazer chamadas bloqueantes.
+    """
+    _invalidation_handlers.setdefault(kind, []).append(handler)
+
+def unregister_invalidation_handler(kind: str, handler):
+    """Remove um handler registado (por exemplo, quando um cog é descarregado)."""
+    handlers = _invalidation_handlers.get(kind, [])
+    if handler in handlers:
+        handlers.remove(handler)
+
+def _open_listen_connection():
+    """Abre a ligação do listener, já em autocommit e a escutar o canal de invalidação (chamada bloqueante)."""
+    conn = get_db_connection()
+    try:
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+class _InvalidationDispatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues: dict[str, deque] = {}
+        self._draining: set[str] = set()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="invalidation")
+
+    def submit(self, payload: dict):
+        """Põe a notificação na fila do seu tipo (pode ser chamada de qualquer thread)."""
+        kind = payload.get('kind')
+        with self._lock:
+            self._queues.setdefault(kind, deque()).append(payload)
+            if kind in self._draining:
+                return
+            self._draining.add(kind)
+        self._executor.submit(self._drain, kind)
+
+    def _take(self, kind: str) -> list[dict]:
+        with self._lock:
+            batch = list(self._queues[kind])
+            self._queues[kind].clear()
+            if not batch:
+                self._draining.discard(kind)
+            return batch
+
+    def _drain(self, kind: str):
+        while batch := self._take(kind):
+            if any(payload.get('resync') for payload in batch):
+                time.sleep(RESYNC_DEBOUNCE_SECONDS)
+                with self._lock:
+                    batch += self._queues[kind]
+                    self._queues[kind].clear()
+                # A última ressincronização já reflete tudo o que veio antes dela
+                last = max(index for index, payload in enumerate(batch) if payload.get('resync'))
+                batch = batch[last:]
+            for payload in batch:
+                for handler in list(_invalidation_handlers.get(kind, [])):
+                    _run_handler(handler, payload)
+
+_dispatcher = _InvalidationDispatcher()
+
+class CacheInvalidationListener:
+    """Escuta o canal de invalidação numa ligação dedicada, integrada no event loop com add_reader."""
+
+    def __init__(self):
+        self._conn = None
+        self._loop = None
+
+    @property
+    def running(self) -> bool:
+        return self._conn is not None and not self._conn.closed
+
+    async def start(self):
+        """Abre a ligação dedicada e começa a escutar. Levanta exceção se a base de dados estiver inacessível."""
+        self._loop = asyncio.get_running_loop()
+        # A ligação (que pode esperar pelo timeout de ligação com a base de dados em baixo) é aberta numa thread;
+        # só o registo do reader fica no event loop.
+        conn = await asyncio.to_thread(_open_listen_connection)
+        self._conn = conn
+        self._loop.add_reader(conn.fileno(), self._on_readable)
+        print(log_message("INFO", f"A escutar invalidações de cache no canal '{INVALIDATION_CHANNEL}' (instância {INSTANCE_ID})", "📡"))
+
+    def stop(self):
+        if self._conn is None:
+            return
+        try:
+            self._loop.remove_reader(self._conn.fileno())
+        except Exception:
+            pass
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            # A ligação caiu: para de escutar; a tarefa de coordenação volta a ligar.
+            print(log_message("ERROR", f"Ligação de invalidação perdida: {e}", "❌"))
+            self.stop()
+            return
+
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            try:
+                payload = json.loads(notify.payload)
+            except json.JSONDecodeError:
+                print(log_message("WARNING", f"Notificação inválida ignorada: {notify.payload!r}", "⚠️"))
+                continue
+            if payload.get('instance') == INSTANCE_ID:
+                continue
+            _dispatcher.submit(payload)
+
+def notify_resync():
+    """
+    Entrega a todos os handlers um payload de ressincronização completa (pela fila de cada tipo).
+    Usado depois de (re)ligar o listener, já que as notificações enviadas sem ligação se perderam.
+    """
+    for kind in list(_invalidation_handlers):
+        _dispatcher.submit({'kind': kind, 'resync': True})
+
+def _run_handler(handler, payload: dict):
+    try:
+        handler(payload)
+    except Exception as e:
+        print(log_message("ERROR", f"Erro no handler de invalidação '{payload.get('kind')}': {e}", "❌"))
+
+invalidation_listener = CacheInvalidationListener()
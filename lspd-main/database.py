@@ -1,6 +1,21 @@
 import os
+import io
+import csv
+import json
+import time
+import threading
 import psycopg2
-from datetime import datetime, timedelta, timezone
+import psycopg2.extras
+import psycopg2.extensions
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import INSTANCE_ID, DISPLAY_TIMEZONE, DB_READ_MAX_LAG_SECONDS, DB_READ_LAG_CHECK_SECONDS
+# Com o tracing ligado, cada consulta é um span da interação que a fez
+from tracing import db_connect_kwargs
+
+# Canal LISTEN/NOTIFY usado para invalidar as caches das outras instâncias do bot (ver coordination.py).
+INVALIDATION_CHANNEL = 'lspd_cache_invalidation'
 
 def get_db_connection():
     """
@@ -12,13 +27,117 @@ def get_db_connection():
         if not database_url:
             raise ValueError("Variável de ambiente 'DATABASE_URL' não encontrada. Verifique as configurações do Railway.")
         
-        conn = psycopg2.connect(database_url)
+        conn = psycopg2.connect(database_url, **db_connect_kwargs())
         print("DEBUG DB: Conectado ao PostgreSQL com sucesso.")
         return conn
     except Exception as e:
         print(f"ERRO: Falha ao conectar ao PostgreSQL: {e}")
         raise
 
+# --- Réplica de leitura (opcional) ---
+# Com DATABASE_READ_URL definida, as consultas de relatório e de pesquisa (/horas, /cobertura, estatísticas,
+# pesquisa de transcritos, relatórios agendados) vão para a réplica, desde que o seu atraso não passe de
+# DB_READ_MAX_LAG_SECONDS. Sem réplica, com a réplica em baixo ou atrasada, usam o primário.
+# As escritas e as leituras que têm de ver as próprias escritas (estado das picagens, tickets, configurações,
+# ranking, registo dos relatórios agendados publicados) ficam sempre no primário.
+
+# Sessões só de leitura: uma escrita enviada por engano à réplica falha logo, em vez de depender da configuração dela
+READ_ONLY_OPTIONS = '-c default_transaction_read_only=on'
+
+_replica_lock = threading.Lock()
+_replica_state = {'lag_seconds': None, 'checked_at': 0.0, 'down_until': 0.0, 'error': None}
+
+def read_replica_url() -> str | None:
+    return os.getenv('DATABASE_READ_URL') or None
+
+def replica_down() -> bool:
+    """True se a réplica falhou há menos de DB_READ_LAG_CHECK_SECONDS (as leituras vão para o primário)."""
+    return time.monotonic() < _replica_state['down_until']
+
+def mark_replica_down(error: Exception):
+    """Desvia as leituras para o primário até à próxima verificação."""
+    with _replica_lock:
+        was_up = not replica_down()
+        _replica_state['down_until'] = time.monotonic() + DB_READ_LAG_CHECK_SECONDS
+        _replica_state['lag_seconds'] = None
+        _replica_state['error'] = str(error)
+    if was_up:
+        print(f"AVISO: Réplica de leitura indisponível, consultas de relatório no primário: {error}")
+
+def replica_is_fresh(conn) -> bool:
+    """
+    Indica se a réplica está dentro da tolerância de atraso. O atraso é medido na ligação indicada no máximo
+    a cada DB_READ_LAG_CHECK_SECONDS; entre medições usa o último valor. Chamada bloqueante.
+    """
+    now = time.monotonic()
+    with _replica_lock:
+        lag = _replica_state['lag_seconds']
+        if lag is not None and now - _replica_state['checked_at'] < DB_READ_LAG_CHECK_SECONDS:
+            return lag <= DB_READ_MAX_LAG_SECONDS
+
+    with conn.cursor() as cursor:
+        # Sem WAL por aplicar, a réplica está em dia mesmo que a última transação reproduzida seja antiga
+        cursor.execute('''
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+            END::double precision
+        ''')
+        lag = cursor.fetchone()[0]
+    conn.rollback()
+
+    with _replica_lock:
+        previous = _replica_state['lag_seconds']
+        was_fresh = previous is None or previous <= DB_READ_MAX_LAG_SECONDS
+        _replica_state.update(lag_seconds=lag, checked_at=now, error=None)
+    fresh = lag <= DB_READ_MAX_LAG_SECONDS
+    if was_fresh and not fresh:
+        print(f"AVISO: Réplica de leitura com {lag:.0f}s de atraso (tolerância {DB_READ_MAX_LAG_SECONDS}s), consultas de relatório no primário.")
+    return fresh
+
+def replica_status() -> dict | None:
+    """Estado da réplica para o diagnóstico, ou None se não houver réplica configurada."""
+    if not read_replica_url():
+        return None
+    with _replica_lock:
+        lag = _replica_state['lag_seconds']
+        error = _replica_state['error']
+    if replica_down():
+        state = 'indisponível'
+    elif lag is None:
+        state = 'por verificar'
+    else:
+        state = 'em uso' if lag <= DB_READ_MAX_LAG_SECONDS else 'atrasada'
+    return {'state': state, 'lag_seconds': lag, 'max_lag_seconds': DB_READ_MAX_LAG_SECONDS, 'error': error}
+
+def get_read_db_connection():
+    """
+    Retorna uma conexão para consultas de relatório: a réplica, se configurada e em dia, senão o primário.
+    Não usar em leituras que têm de ver escritas acabadas de fazer.
+    """
+    replica_url = read_replica_url()
+    if replica_url and not replica_down():
+        try:
+            conn = psycopg2.connect(replica_url, options=READ_ONLY_OPTIONS, **db_connect_kwargs())
+        except Exception as e:
+            mark_replica_down(e)
+        else:
+            try:
+                if replica_is_fresh(conn):
+                    return conn
+            except Exception as e:
+                mark_replica_down(e)
+            conn.close()
+    return get_db_connection()
+
+def publish_invalidation(cursor, kind: str, **payload):
+    """
+    Publica uma notificação de invalidação de cache na transação atual.
+    O PostgreSQL só a entrega às outras instâncias depois do commit (e descarta-a num rollback).
+    """
+    cursor.execute("SELECT pg_notify(%s, %s)", (INVALIDATION_CHANNEL, json.dumps({'kind': kind, 'instance': INSTANCE_ID, **payload})))
+
 def setup_database():
     """
     Cria as tabelas 'punches' e 'tickets' se elas não existirem no PostgreSQL.
@@ -49,8 +168,120 @@ def setup_database():
                 created_at TIMESTAMP WITH TIME ZONE NOT NULL
             )
         ''')
+
+        # Configurações por servidor (guild). As chaves ausentes usam os valores padrão do config.py.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS guild_settings (
+                guild_id BIGINT PRIMARY KEY,
+                settings JSONB NOT NULL DEFAULT '{}'::jsonb,
+                updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+            )
+        ''')
+
+        # Migração multi-servidor: pontos e tickets passam a guardar o servidor de origem.
+        # Registos antigos ficam com guild_id NULL e continuam visíveis em todos os servidores.
+        cursor.execute("ALTER TABLE punches ADD COLUMN IF NOT EXISTS guild_id BIGINT")
+        cursor.execute("ALTER TABLE tickets ADD COLUMN IF NOT EXISTS guild_id BIGINT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_punches_guild_punch_in ON punches (guild_id, punch_in_time)")
+
+        # IDs das entradas do journal local (punch_journal.py), para a reaplicação ignorar duplicados.
+        cursor.execute("ALTER TABLE punches ADD COLUMN IF NOT EXISTS journal_id VARCHAR(32)")
+        cursor.execute("ALTER TABLE punches ADD COLUMN IF NOT EXISTS punch_out_journal_id VARCHAR(32)")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_punches_journal_id ON punches (journal_id)")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_punches_punch_out_journal_id ON punches (punch_out_journal_id)")
+
+        # Mensagens dos tickets abertos, guardadas à medida que chegam (o transcrito é gerado a partir daqui).
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_messages (
+                message_id BIGINT PRIMARY KEY,
+                channel_id BIGINT NOT NULL,
+                author_id BIGINT NOT NULL,
+                author_name VARCHAR(255) NOT NULL,
+                content TEXT NOT NULL DEFAULT '',
+                attachments JSONB NOT NULL DEFAULT '[]'::jsonb,
+                embeds JSONB NOT NULL DEFAULT '[]'::jsonb,
+                created_at TIMESTAMP WITH TIME ZONE NOT NULL
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticket_messages_channel ON ticket_messages (channel_id, message_id)")
+
+        # Transcritos dos tickets fechados, com pesquisa de texto integral (tsvector gerado + índice GIN).
+        # O nome do canal e do criador pesam mais (A) do que o conteúdo da conversa (B) na ordenação.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_transcripts (
+                id SERIAL PRIMARY KEY,
+                channel_id BIGINT NOT NULL UNIQUE,
+                guild_id BIGINT,
+                channel_name VARCHAR(255) NOT NULL,
+                category VARCHAR(255) NOT NULL,
+                creator_id BIGINT,
+                creator_name VARCHAR(255) NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE,
+                closed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                content TEXT NOT NULL,
+                transcript_channel_id BIGINT,
+                transcript_message_id BIGINT,
+                search_vector TSVECTOR GENERATED ALWAYS AS (
+                    setweight(to_tsvector('portuguese', coalesce(channel_name, '') || ' ' || coalesce(creator_name, '')), 'A') ||
+                    setweight(to_tsvector('portuguese', content), 'B')
+                ) STORED
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticket_transcripts_search ON ticket_transcripts USING GIN (search_vector)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticket_transcripts_guild_closed ON ticket_transcripts (guild_id, closed_at)")
+
+        # Reserva de tickets: a linha é criada (sem canal) antes de o canal existir no Discord,
+        # e o índice único garante um só ticket aberto por criador e categoria em cada servidor.
+        cursor.execute("ALTER TABLE tickets ALTER COLUMN channel_id DROP NOT NULL")
+        cursor.execute("SAVEPOINT ticket_unique_index")
+        try:
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_tickets_open_per_category
+                ON tickets (guild_id, creator_id, category) WHERE guild_id IS NOT NULL
+            """)
+        except psycopg2.errors.UniqueViolation:
+            # Tickets duplicados criados antes desta versão: o índice é criado no arranque seguinte, depois de fecharem
+            cursor.execute("ROLLBACK TO SAVEPOINT ticket_unique_index")
+            print("AVISO: Existem tickets duplicados (mesmo criador e categoria); o índice único fica para depois de serem fechados.")
+
+        # Última atividade dos tickets (fecho automático por inatividade). Os tickets existentes partem da data de criação.
+        cursor.execute("ALTER TABLE tickets ADD COLUMN IF NOT EXISTS last_activity_at TIMESTAMP WITH TIME ZONE")
+        cursor.execute("ALTER TABLE tickets ADD COLUMN IF NOT EXISTS inactivity_warned_at TIMESTAMP WITH TIME ZONE")
+        cursor.execute("UPDATE tickets SET last_activity_at = created_at WHERE last_activity_at IS NULL")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tickets_last_activity ON tickets (last_activity_at) WHERE channel_id IS NOT NULL")
+
+        # Totais diários de serviço por servidor e oficial, mantidos por triggers por instrução em 'punches'.
+        # Cada sessão conta para o dia (no fuso horário de exibição) em que começou, como no /horas.
+        # guild_id 0 guarda os registos antigos sem servidor. Os relatórios agendados somam estes totais.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS duty_daily_totals (
+                guild_id BIGINT NOT NULL DEFAULT 0,
+                day DATE NOT NULL,
+                user_id BIGINT NOT NULL,
+                username VARCHAR(255) NOT NULL,
+                total_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+                sessions INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (guild_id, day, user_id)
+            )
+        ''')
+        _setup_duty_daily_totals_trigger(cursor)
+
+        # Execuções dos relatórios agendados: uma linha por servidor, período e início do período.
+        # A linha é reclamada antes do envio (completed_at NULL) e completada depois, para não repetir relatórios.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS report_runs (
+                guild_id BIGINT NOT NULL,
+                period VARCHAR(16) NOT NULL,
+                period_start DATE NOT NULL,
+                period_end DATE NOT NULL,
+                claimed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+                completed_at TIMESTAMP WITH TIME ZONE,
+                message_id BIGINT,
+                PRIMARY KEY (guild_id, period, period_start)
+            )
+        ''')
         conn.commit()
-        print("DEBUG: Tabelas de banco de dados 'punches' e 'tickets' verificadas/criadas no PostgreSQL.")
+        print("DEBUG: Tabelas de banco de dados 'punches', 'tickets', 'guild_settings' e de relatórios verificadas/criadas no PostgreSQL.")
     except Exception as e:
         print(f"ERRO: Falha ao configurar tabelas no PostgreSQL: {e}")
         if conn:
@@ -60,118 +291,282 @@ def setup_database():
         if conn:
             conn.close()
 
+def _duty_day_sql(column: str) -> str:
+    """Expressão SQL do dia (no fuso horário de exibição) em que começou a sessão."""
+    return f"({column} AT TIME ZONE '{DISPLAY_TIMEZONE}')::date"
+
+def _setup_duty_daily_totals_trigger(cursor):
+    """
+    Cria (ou atualiza) os triggers que mantêm 'duty_daily_totals' a partir de 'punches'. Os triggers cobrem todas
+    as escritas: journal de picagens, importação em massa, !clearpunchdb e correções manuais.
+    São triggers por instrução, com tabelas de transição: uma importação de milhões de linhas atualiza os totais
+    com uma única agregação no fim da instrução, em vez de um upsert por linha.
+    Se a tabela de totais é nova ou o fuso horário de exibição mudou, os totais são recalculados de raiz.
+    """
+    cursor.execute("SELECT prosrc FROM pg_proc WHERE proname = 'duty_daily_totals_apply'")
+    row = cursor.fetchone()
+    needs_rebuild = row is None or _duty_day_sql('punch_in_time') not in row[0]
+
+    # As tabelas de transição só existem para os eventos de cada trigger (old_rows: UPDATE/DELETE,
+    # new_rows: INSERT/UPDATE); o PL/pgSQL só prepara as consultas dos ramos que executa.
+    cursor.execute(f'''
+        CREATE OR REPLACE FUNCTION duty_daily_totals_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO duty_daily_totals (guild_id, day, user_id, username, total_seconds, sessions)
+                SELECT COALESCE(guild_id, 0), {_duty_day_sql('punch_in_time')}, user_id,
+                       (ARRAY_AGG(username ORDER BY punch_in_time DESC))[1],
+                       SUM(EXTRACT(EPOCH FROM punch_out_time - punch_in_time)), COUNT(*)
+                FROM new_rows
+                WHERE punch_in_time IS NOT NULL AND punch_out_time IS NOT NULL
+                GROUP BY 1, 2, 3
+                ON CONFLICT (guild_id, day, user_id) DO UPDATE
+                SET total_seconds = duty_daily_totals.total_seconds + EXCLUDED.total_seconds,
+                    sessions = duty_daily_totals.sessions + EXCLUDED.sessions,
+                    username = EXCLUDED.username;
+            ELSIF TG_OP = 'UPDATE' THEN
+                -- Diferença por (servidor, dia, oficial): sessões antigas a subtrair, novas a somar
+                INSERT INTO duty_daily_totals (guild_id, day, user_id, username, total_seconds, sessions)
+                SELECT guild_id, day, user_id,
+                       COALESCE((ARRAY_AGG(username ORDER BY punch_in_time DESC) FILTER (WHERE username IS NOT NULL))[1], user_id::text),
+                       SUM(seconds), SUM(sessions)
+                FROM (
+                    SELECT COALESCE(guild_id, 0) AS guild_id, {_duty_day_sql('punch_in_time')} AS day, user_id,
+                           NULL::varchar AS username, punch_in_time,
+                           -EXTRACT(EPOCH FROM punch_out_time - punch_in_time) AS seconds, -1 AS sessions
+                    FROM old_rows
+                    WHERE punch_in_time IS NOT NULL AND punch_out_time IS NOT NULL
+                    UNION ALL
+                    SELECT COALESCE(guild_id, 0), {_duty_day_sql('punch_in_time')}, user_id,
+                           username, punch_in_time,
+                           EXTRACT(EPOCH FROM punch_out_time - punch_in_time), 1
+                    FROM new_rows
+                    WHERE punch_in_time IS NOT NULL AND punch_out_time IS NOT NULL
+                ) AS changes
+                GROUP BY guild_id, day, user_id
+                ON CONFLICT (guild_id, day, user_id) DO UPDATE
+                SET total_seconds = duty_daily_totals.total_seconds + EXCLUDED.total_seconds,
+                    sessions = duty_daily_totals.sessions + EXCLUDED.sessions,
+                    username = EXCLUDED.username;
+            ELSE
+                UPDATE duty_daily_totals AS totals
+                SET total_seconds = totals.total_seconds - removed.total_seconds,
+                    sessions = totals.sessions - removed.sessions
+                FROM (
+                    SELECT COALESCE(guild_id, 0) AS guild_id, {_duty_day_sql('punch_in_time')} AS day, user_id,
+                           SUM(EXTRACT(EPOCH FROM punch_out_time - punch_in_time)) AS total_seconds, COUNT(*) AS sessions
+                    FROM old_rows
+                    WHERE punch_in_time IS NOT NULL AND punch_out_time IS NOT NULL
+                    GROUP BY 1, 2, 3
+                ) AS removed
+                WHERE totals.guild_id = removed.guild_id AND totals.day = removed.day AND totals.user_id = removed.user_id;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM duty_daily_totals AS totals
+                USING (SELECT DISTINCT COALESCE(guild_id, 0) AS guild_id, {_duty_day_sql('punch_in_time')} AS day, user_id
+                       FROM old_rows WHERE punch_in_time IS NOT NULL) AS touched
+                WHERE totals.guild_id = touched.guild_id AND totals.day = touched.day AND totals.user_id = touched.user_id
+                AND totals.sessions <= 0;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    # O trigger por linha das versões anteriores
+    cursor.execute("DROP TRIGGER IF EXISTS punches_duty_daily_totals ON punches")
+    for event, transition in (
+        ('INSERT', 'NEW TABLE AS new_rows'),
+        ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+        ('DELETE', 'OLD TABLE AS old_rows'),
+    ):
+        cursor.execute(f"DROP TRIGGER IF EXISTS punches_duty_daily_totals_{event.lower()} ON punches")
+        cursor.execute(f'''
+            CREATE TRIGGER punches_duty_daily_totals_{event.lower()}
+            AFTER {event} ON punches
+            REFERENCING {transition}
+            FOR EACH STATEMENT EXECUTE FUNCTION duty_daily_totals_apply()
+        ''')
+
+    if needs_rebuild:
+        cursor.execute("TRUNCATE duty_daily_totals")
+        cursor.execute(f'''
+            INSERT INTO duty_daily_totals (guild_id, day, user_id, username, total_seconds, sessions)
+            SELECT COALESCE(guild_id, 0), {_duty_day_sql('punch_in_time')}, user_id,
+                   (ARRAY_AGG(username ORDER BY punch_in_time DESC))[1],
+                   SUM(EXTRACT(EPOCH FROM punch_out_time - punch_in_time)), COUNT(*)
+            FROM punches
+            WHERE punch_in_time IS NOT NULL AND punch_out_time IS NOT NULL
+            GROUP BY 1, 2, 3
+        ''')
+        print(f"DEBUG: Totais diários de serviço recalculados ({cursor.rowcount} linha(s), fuso horário {DISPLAY_TIMEZONE}).")
+
 # --- Funções para Picagem de Ponto ---
+# As picagens do journal e a consulta de horas por período estão em repository.py (consultas preparadas).
 
-def record_punch_in(user_id: int, username: str) -> bool:
+def get_duty_statistics(start_time: datetime, end_time: datetime, guild_id: int = None, user_id: int = None) -> list[dict]:
     """
-    Registra a entrada em serviço de um usuário no PostgreSQL.
-    Retorna True se a entrada foi registrada, False se o usuário já estava em serviço.
+    Estatísticas de serviço calculadas no PostgreSQL (agregações por conjunto, sem percorrer linhas em Python).
+    Para cada oficial e para a unidade inteira (a linha com user_id None): número de sessões, tempo total,
+    média, mediana e p90 da duração das sessões, sessões por semana no período e médias diárias móveis
+    de 7 e 30 dias (terminando no fim do período). As durações vêm em segundos.
+    Se user_id for indicado, só esse oficial é considerado. Levanta exceção em caso de erro.
     """
     conn = None
     try:
-        conn = get_db_connection()
+        # Consulta de relatório: pode ir para a réplica de leitura
+        conn = get_read_db_connection()
         cursor = conn.cursor()
-        
-        print(f"DEBUG: record_punch_in - Verificando se {username} ({user_id}) já está em serviço...")
-        cursor.execute("SELECT id FROM punches WHERE user_id = %s AND punch_out_time IS NULL", (user_id,))
-        existing_punch = cursor.fetchone()
-        if existing_punch:
-            print(f"DEBUG: record_punch_in - {username} ({user_id}) JÁ está em serviço com ID {existing_punch[0]}.")
-            return False
-
-        current_time = datetime.now(timezone.utc)
-        print(f"DEBUG: record_punch_in - Registrando entrada para {username} ({user_id}) em {current_time}...")
-        cursor.execute("INSERT INTO punches (user_id, username, punch_in_time) VALUES (%s, %s, %s)",
-                       (user_id, username, current_time))
-        conn.commit()
-        print(f"DEBUG: record_punch_in - Entrada para {username} ({user_id}) REGISTRADA e commitada.")
-        return True
+        # As sessões são lidas desde o início da janela mais antiga (o período ou os 30 dias móveis);
+        # os agregados do período filtram com FILTER, as médias móveis com a sua própria janela.
+        cursor.execute("""
+            WITH bounds AS (
+                SELECT %(start)s::timestamptz AS period_start, %(end)s::timestamptz AS period_end
+            ),
+            sessions AS (
+                SELECT p.user_id, p.username, p.punch_in_time,
+                       EXTRACT(EPOCH FROM p.punch_out_time - p.punch_in_time)::double precision AS seconds
+                FROM punches p, bounds b
+                WHERE p.punch_out_time IS NOT NULL
+                  AND p.punch_in_time >= LEAST(b.period_start, b.period_end - INTERVAL '30 days')
+                  AND p.punch_in_time <= b.period_end
+                  AND (%(guild_id)s::bigint IS NULL OR p.guild_id = %(guild_id)s OR p.guild_id IS NULL)
+                  AND (%(user_id)s::bigint IS NULL OR p.user_id = %(user_id)s)
+            )
+            SELECT
+                s.user_id,
+                (ARRAY_AGG(s.username ORDER BY s.punch_in_time DESC))[1] AS username,
+                COUNT(*) FILTER (WHERE s.punch_in_time >= b.period_start) AS sessions,
+                COALESCE(SUM(s.seconds) FILTER (WHERE s.punch_in_time >= b.period_start), 0) AS total_seconds,
+                AVG(s.seconds) FILTER (WHERE s.punch_in_time >= b.period_start) AS mean_seconds,
+                PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY s.seconds) FILTER (WHERE s.punch_in_time >= b.period_start) AS median_seconds,
+                PERCENTILE_CONT(0.9) WITHIN GROUP (ORDER BY s.seconds) FILTER (WHERE s.punch_in_time >= b.period_start) AS p90_seconds,
+                COUNT(*) FILTER (WHERE s.punch_in_time >= b.period_start)
+                    / GREATEST(EXTRACT(EPOCH FROM b.period_end - b.period_start) / 604800.0, 1.0) AS sessions_per_week,
+                COALESCE(SUM(s.seconds) FILTER (WHERE s.punch_in_time > b.period_end - INTERVAL '7 days'), 0) / 7.0 AS rolling_7d_daily_seconds,
+                COALESCE(SUM(s.seconds) FILTER (WHERE s.punch_in_time > b.period_end - INTERVAL '30 days'), 0) / 30.0 AS rolling_30d_daily_seconds
+            FROM sessions s, bounds b
+            GROUP BY GROUPING SETS ((s.user_id, b.period_start, b.period_end), (b.period_start, b.period_end))
+            HAVING COUNT(*) FILTER (WHERE s.punch_in_time >= b.period_start) > 0
+            ORDER BY s.user_id NULLS FIRST
+        """, {'start': start_time, 'end': end_time, 'guild_id': guild_id, 'user_id': user_id})
+
+        columns = ('user_id', 'username', 'sessions', 'total_seconds', 'mean_seconds', 'median_seconds', 'p90_seconds',
+                   'sessions_per_week', 'rolling_7d_daily_seconds', 'rolling_30d_daily_seconds')
+        results = []
+        for row in cursor.fetchall():
+            stats = dict(zip(columns, row))
+            for key in columns[3:]:
+                stats[key] = float(stats[key]) if stats[key] is not None else 0.0
+            results.append(stats)
+        return results
     except Exception as e:
-        print(f"ERRO: Falha ao registrar entrada de ponto no PostgreSQL para {username}: {e}")
-        if conn:
-            conn.rollback()
-        return False
+        print(f"ERRO: Falha ao calcular estatísticas de serviço no PostgreSQL: {e}")
+        raise
     finally:
         if conn:
             conn.close()
 
-def record_punch_out(user_id: int) -> tuple[bool, timedelta | None]:
+@contextmanager
+def duty_totals_snapshot():
     """
-    Registra a saída de serviço de um usuário no PostgreSQL.
-    Retorna (True, timedelta) se a saída foi registrada com a duração,
-    (False, None) se o usuário não estava em serviço.
+    Abre uma transação REPEATABLE READ para reconstruir o ranking em memória (leaderboard.py) e entrega
+    duas funções que leem o mesmo snapshot:
+      totals_since(start_time): tempo total de serviço (em segundos) por servidor e oficial, das sessões
+        fechadas iniciadas desde start_time;
+      closed_sessions(session_ids): quais das sessões indicadas (journal_id da saída) já estão nesses totais.
+    Levanta exceção em caso de erro.
     """
     conn = None
     try:
         conn = get_db_connection()
+        conn.set_session(isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
         cursor = conn.cursor()
-        
-        print(f"DEBUG: record_punch_out - Procurando último ponto aberto para {user_id}...")
-        cursor.execute("SELECT id, punch_in_time FROM punches WHERE user_id = %s AND punch_out_time IS NULL ORDER BY id DESC LIMIT 1", (user_id,))
-        active_punch = cursor.fetchone()
-
-        if active_punch:
-            punch_id, punch_in_time = active_punch[0], active_punch[1] 
-            print(f"DEBUG: record_punch_out - Ponto aberto encontrado: ID {punch_id}, Entrada {punch_in_time}.")
-            
-            current_time = datetime.now(timezone.utc)
-            time_diff = current_time - punch_in_time
-            
-            print(f"DEBUG: record_punch_out - Atualizando ponto ID {punch_id} com saída {current_time}...")
-            cursor.execute("UPDATE punches SET punch_out_time = %s WHERE id = %s",
-                           (current_time, punch_id))
-            conn.commit()
-            print(f"DEBUG: record_punch_out - Saída para ponto ID {punch_id} REGISTRADA e commitada. Duração: {time_diff}.")
-            return True, time_diff
-        else:
-            print(f"DEBUG: record_punch_out - NENHUM ponto aberto encontrado para {user_id}.")
-            return False, None
+
+        def totals_since(start_time: datetime) -> list[dict]:
+            cursor.execute("""
+                SELECT guild_id, user_id, (ARRAY_AGG(username ORDER BY punch_in_time DESC))[1],
+                       SUM(EXTRACT(EPOCH FROM punch_out_time - punch_in_time))::double precision
+                FROM punches
+                WHERE punch_in_time >= %s AND punch_out_time IS NOT NULL
+                GROUP BY guild_id, user_id
+            """, (start_time,))
+            return [
+                {'guild_id': row[0], 'user_id': row[1], 'username': row[2], 'total_seconds': row[3]}
+                for row in cursor.fetchall()
+            ]
+
+        def closed_sessions(session_ids: list[str]) -> set[str]:
+            if not session_ids:
+                return set()
+            cursor.execute("SELECT punch_out_journal_id FROM punches WHERE punch_out_journal_id = ANY(%s)", (list(session_ids),))
+            return {row[0] for row in cursor.fetchall()}
+
+        yield totals_since, closed_sessions
     except Exception as e:
-        print(f"ERRO: Falha ao registrar saída de ponto no PostgreSQL para {user_id}: {e}")
-        if conn:
-            conn.rollback()
-        return False, None
+        print(f"ERRO: Falha ao obter totais de serviço no PostgreSQL: {e}")
+        raise
     finally:
         if conn:
             conn.close()
 
-def get_punches_for_period(start_time: datetime, end_time: datetime):
+def bulk_import_punches(batches, guild_id: int = None, dry_run: bool = False, on_progress=None) -> dict:
     """
-    Retorna todos os registros de picagem de ponto dentro de um período específico no PostgreSQL.
-    Ajusta a data de fim para incluir o dia inteiro.
-    Retorna uma lista de dicionários para compatibilidade com os cogs.
+    Importa pontos históricos em massa com COPY (ver import_punches.py).
+    `batches` é um iterável de listas de tuplos (user_id, username, punch_in_time, punch_out_time), com datas ISO 8601
+    com fuso horário. Cada lote é copiado para uma tabela temporária; no fim, só as sessões que ainda não existem em
+    'punches' (mesmo utilizador e mesma hora de entrada) são inseridas, numa única instrução e numa única transação.
+    on_progress(linhas_copiadas) é chamado depois de cada lote. Com dry_run, tudo é desfeito no fim.
+    Retorna {'copied': ..., 'inserted': ..., 'duplicates': ...}. Levanta exceção em caso de erro.
     """
     conn = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        
-        # Garante que as datas de início e fim são timezone-aware em UTC para a comparação
-        adjusted_start_time = start_time.replace(tzinfo=timezone.utc) if start_time.tzinfo is None else start_time
-        adjusted_end_time = end_time.replace(hour=23, minute=59, second=59, microsecond=999999, tzinfo=timezone.utc) if end_time.tzinfo is None else end_time
+        cursor.execute("""
+            CREATE TEMP TABLE punches_import (
+                user_id BIGINT NOT NULL,
+                username VARCHAR(255) NOT NULL,
+                punch_in_time TIMESTAMP WITH TIME ZONE NOT NULL,
+                punch_out_time TIMESTAMP WITH TIME ZONE NOT NULL
+            ) ON COMMIT DROP
+        """)
+
+        copied = 0
+        for batch in batches:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert("COPY punches_import (user_id, username, punch_in_time, punch_out_time) FROM STDIN WITH (FORMAT csv)", buffer)
+            copied += len(batch)
+            if on_progress:
+                on_progress(copied)
 
-        print(f"DEBUG: get_punches_for_period - Buscando pontos de {adjusted_start_time} a {adjusted_end_time}...")
+        cursor.execute("ANALYZE punches_import")
+        # Anti-join: ignora sessões já importadas (ou registadas pelo bot) e duplicados dentro da própria fonte.
         cursor.execute("""
-            SELECT user_id, username, punch_in_time, punch_out_time
-            FROM punches
-            WHERE punch_in_time BETWEEN %s AND %s
-            AND punch_out_time IS NOT NULL
-            ORDER BY punch_in_time ASC
-        """, (adjusted_start_time, adjusted_end_time))
+            INSERT INTO punches (user_id, username, punch_in_time, punch_out_time, guild_id)
+            SELECT DISTINCT ON (i.user_id, i.punch_in_time) i.user_id, i.username, i.punch_in_time, i.punch_out_time, %s
+            FROM punches_import i
+            WHERE NOT EXISTS (
+                SELECT 1 FROM punches p
+                WHERE p.user_id = i.user_id AND p.punch_in_time = i.punch_in_time
+            )
+            ORDER BY i.user_id, i.punch_in_time, i.punch_out_time DESC
+        """, (guild_id,))
+        inserted = cursor.rowcount
+        if inserted and not dry_run:
+            publish_invalidation(cursor, 'punches', resync=True)
 
-        results = []
-        for row in cursor.fetchall():
-            results.append({
-                'user_id': row[0],
-                'username': row[1],
-                'punch_in_time': row[2].isoformat(),
-                'punch_out_time': row[3].isoformat()
-            })
-        print(f"DEBUG: get_punches_for_period - Encontrados {len(results)} pontos.")
-        return results
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+        return {'copied': copied, 'inserted': inserted, 'duplicates': copied - inserted}
     except Exception as e:
-        print(f"ERRO: Falha ao obter pontos para período no PostgreSQL: {e}")
-        return []
+        print(f"ERRO: Falha na importação em massa de pontos no PostgreSQL: {e}")
+        if conn:
+            conn.rollback()
+        raise
     finally:
         if conn:
             conn.close()
@@ -188,6 +583,7 @@ def clear_punches_table() -> bool:
         cursor = conn.cursor()
         print("DEBUG: clear_punches_table - Tentando limpar todos os registos da tabela 'punches'...")
         cursor.execute("DELETE FROM punches")
+        publish_invalidation(cursor, 'punches', resync=True)
         conn.commit()
         print("DEBUG: clear_punches_table - Todos os registos da tabela 'punches' foram limpos com sucesso.")
         return True
@@ -236,27 +632,166 @@ def get_punches_for_overdue_notification(threshold_hours: int):
             conn.close()
 
 # --- Funções para o banco de dados de tickets (adaptadas para PostgreSQL) ---
+# A abertura, o fecho e a consulta de tickets abertos estão em repository.py (consultas preparadas).
+
+# --- Funções para as mensagens dos tickets ---
 
-def add_ticket_to_db(channel_id: int, creator_id: int, creator_name: str, category: str):
+def save_ticket_messages(messages: list[dict]):
+    """
+    Guarda (ou atualiza, no caso de edições) um lote de mensagens de tickets num único INSERT.
+    Cada mensagem é um dict com message_id, channel_id, author_id, author_name, content, attachments, embeds e created_at.
+    Levanta exceção em caso de erro, para o chamador voltar a tentar com o mesmo lote.
+    """
+    if not messages:
+        return
     conn = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        created_at = datetime.now(timezone.utc)
-        
-        print(f"DEBUG: add_ticket_to_db - Tentando adicionar ticket para canal {channel_id}...")
-        cursor.execute("INSERT INTO tickets (channel_id, creator_id, creator_name, category, created_at) VALUES (%s, %s, %s, %s, %s) ON CONFLICT (channel_id) DO NOTHING",
-                      (channel_id, creator_id, creator_name, category, created_at))
-        
+        psycopg2.extras.execute_values(
+            cursor,
+            """
+            INSERT INTO ticket_messages (message_id, channel_id, author_id, author_name, content, attachments, embeds, created_at)
+            VALUES %s
+            ON CONFLICT (message_id) DO UPDATE SET
+                content = EXCLUDED.content, attachments = EXCLUDED.attachments, embeds = EXCLUDED.embeds
+            """,
+            [
+                (m['message_id'], m['channel_id'], m['author_id'], m['author_name'], m['content'],
+                 psycopg2.extras.Json(m['attachments']), psycopg2.extras.Json(m['embeds']), m['created_at'])
+                for m in messages
+            ],
+            page_size=500
+        )
         conn.commit()
-        if cursor.rowcount > 0:
-            print(f"DEBUG: Ticket {channel_id} (Criador: {creator_name}, Categoria: {category}) adicionado ao DB PostgreSQL.")
-            return True
-        else:
-            print(f"DEBUG: Erro: Ticket para o canal {channel_id} já existe no DB PostgreSQL (ON CONFLICT).")
-            return False
     except Exception as e:
-        print(f"ERRO: Falha ao adicionar ticket ao DB PostgreSQL para {channel_id}: {e}")
+        print(f"ERRO: Falha ao guardar {len(messages)} mensagem(ns) de tickets no PostgreSQL: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def delete_ticket_messages(message_ids: list[int]):
+    """Remove mensagens apagadas no Discord. Levanta exceção em caso de erro."""
+    if not message_ids:
+        return
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM ticket_messages WHERE message_id = ANY(%s)", (list(message_ids),))
+        conn.commit()
+    except Exception as e:
+        print(f"ERRO: Falha ao remover mensagens de tickets do PostgreSQL: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def get_ticket_messages(channel_id: int) -> list[dict]:
+    """Retorna as mensagens guardadas de um ticket, por ordem cronológica. Levanta exceção em caso de erro."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT message_id, channel_id, author_id, author_name, content, attachments, embeds, created_at
+            FROM ticket_messages WHERE channel_id = %s ORDER BY message_id
+            """,
+            (channel_id,)
+        )
+        columns = ('message_id', 'channel_id', 'author_id', 'author_name', 'content', 'attachments', 'embeds', 'created_at')
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"ERRO: Falha ao obter mensagens do ticket {channel_id} do PostgreSQL: {e}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def get_last_ticket_message_ids(channel_ids: list[int]) -> dict:
+    """
+    Retorna o ID da última mensagem guardada de cada ticket, no formato {channel_id: message_id}.
+    Tickets sem mensagens guardadas não aparecem. Levanta exceção em caso de erro.
+    """
+    if not channel_ids:
+        return {}
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT channel_id, MAX(message_id) FROM ticket_messages WHERE channel_id = ANY(%s) GROUP BY channel_id",
+            (list(channel_ids),)
+        )
+        return dict(cursor.fetchall())
+    except Exception as e:
+        print(f"ERRO: Falha ao obter as últimas mensagens dos tickets do PostgreSQL: {e}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def purge_orphan_ticket_messages() -> int:
+    """
+    Remove mensagens de tickets que já não existem (por exemplo, um lote guardado depois de o ticket ser fechado).
+    A margem de uma hora protege os tickets acabados de criar. Retorna o número de mensagens removidas.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            DELETE FROM ticket_messages m
+            WHERE m.created_at < NOW() - INTERVAL '1 hour'
+              AND NOT EXISTS (SELECT 1 FROM tickets t WHERE t.channel_id = m.channel_id)
+            """
+        )
+        conn.commit()
+        return cursor.rowcount
+    except Exception as e:
+        print(f"ERRO: Falha ao remover mensagens órfãs de tickets no PostgreSQL: {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if conn:
+            conn.close()
+
+# --- Funções para os transcritos dos tickets ---
+
+def save_ticket_transcript(transcript: dict) -> bool:
+    """
+    Guarda o transcrito de um ticket fechado (um por canal; um novo fecho do mesmo canal substitui o anterior).
+    O dict tem channel_id, guild_id, channel_name, category, creator_id, creator_name, created_at, closed_at,
+    content, transcript_channel_id e transcript_message_id.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO ticket_transcripts (channel_id, guild_id, channel_name, category, creator_id, creator_name,
+                                            created_at, closed_at, content, transcript_channel_id, transcript_message_id)
+            VALUES (%(channel_id)s, %(guild_id)s, %(channel_name)s, %(category)s, %(creator_id)s, %(creator_name)s,
+                    %(created_at)s, %(closed_at)s, %(content)s, %(transcript_channel_id)s, %(transcript_message_id)s)
+            ON CONFLICT (channel_id) DO UPDATE SET
+                closed_at = EXCLUDED.closed_at, content = EXCLUDED.content,
+                transcript_channel_id = EXCLUDED.transcript_channel_id, transcript_message_id = EXCLUDED.transcript_message_id
+            """,
+            transcript
+        )
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"ERRO: Falha ao guardar o transcrito do ticket {transcript.get('channel_id')} no PostgreSQL: {e}")
         if conn:
             conn.rollback()
         return False
@@ -264,45 +799,155 @@ def add_ticket_to_db(channel_id: int, creator_id: int, creator_name: str, catego
         if conn:
             conn.close()
 
-def remove_ticket_from_db(channel_id: int):
+def search_ticket_transcripts(query: str, guild_id: int = None, category: str = None, creator_id: int = None,
+                              start_time: datetime = None, end_time: datetime = None,
+                              limit: int = 5, offset: int = 0) -> tuple[int, list[dict]]:
+    """
+    Pesquisa de texto integral nos transcritos (sintaxe de pesquisa web: "frase exata", -excluir, OR).
+    Os resultados são ordenados por relevância e filtrados por categoria, criador e data de fecho.
+    Retorna (total de resultados, página pedida); cada resultado traz um excerto com os termos destacados.
+    Levanta exceção em caso de erro.
+    """
+    conn = None
+    try:
+        # Pesquisa: pode ir para a réplica de leitura
+        conn = get_read_db_connection()
+        cursor = conn.cursor()
+        # O excerto (ts_headline) é caro: só é calculado para a página pedida, depois do LIMIT.
+        cursor.execute(
+            """
+            WITH q AS (SELECT websearch_to_tsquery('portuguese', %(query)s) AS tsq),
+            page AS (
+                SELECT t.id, t.channel_id, t.guild_id, t.channel_name, t.category, t.creator_id, t.creator_name,
+                       t.closed_at, t.content, t.transcript_channel_id, t.transcript_message_id,
+                       ts_rank_cd(t.search_vector, q.tsq) AS rank,
+                       COUNT(*) OVER () AS total
+                FROM ticket_transcripts t, q
+                WHERE t.search_vector @@ q.tsq
+                  AND (%(guild_id)s::bigint IS NULL OR t.guild_id = %(guild_id)s OR t.guild_id IS NULL)
+                  AND (%(category)s::text IS NULL OR t.category = %(category)s)
+                  AND (%(creator_id)s::bigint IS NULL OR t.creator_id = %(creator_id)s)
+                  AND (%(start_time)s::timestamptz IS NULL OR t.closed_at >= %(start_time)s)
+                  AND (%(end_time)s::timestamptz IS NULL OR t.closed_at <= %(end_time)s)
+                ORDER BY rank DESC, t.closed_at DESC
+                LIMIT %(limit)s OFFSET %(offset)s
+            )
+            SELECT page.id, page.channel_id, page.guild_id, page.channel_name, page.category, page.creator_id,
+                   page.creator_name, page.closed_at, page.transcript_channel_id, page.transcript_message_id, page.rank,
+                   ts_headline('portuguese', page.content, q.tsq,
+                               'MaxFragments=2, MaxWords=18, MinWords=6, StartSel=**, StopSel=**') AS snippet,
+                   page.total
+            FROM page, q
+            ORDER BY page.rank DESC, page.closed_at DESC
+            """,
+            {'query': query, 'guild_id': guild_id, 'category': category, 'creator_id': creator_id,
+             'start_time': start_time, 'end_time': end_time, 'limit': limit, 'offset': offset}
+        )
+        rows = cursor.fetchall()
+        columns = ('id', 'channel_id', 'guild_id', 'channel_name', 'category', 'creator_id', 'creator_name',
+                   'closed_at', 'transcript_channel_id', 'transcript_message_id', 'rank', 'snippet')
+        total = rows[0][-1] if rows else 0
+        return total, [dict(zip(columns, row[:-1])) for row in rows]
+    except Exception as e:
+        print(f"ERRO: Falha ao pesquisar transcritos no PostgreSQL: {e}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+# --- Funções para as configurações por servidor (guild) ---
+
+def get_all_guild_settings() -> dict:
+    """
+    Retorna as configurações guardadas de todos os servidores, no formato {guild_id: {chave: valor}}.
+    Levanta exceção em caso de erro (um resultado vazio significaria "nenhum servidor tem configurações").
+    """
     conn = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        print(f"DEBUG: remove_ticket_from_db - Tentando remover ticket para canal {channel_id}...")
-        cursor.execute("DELETE FROM tickets WHERE channel_id = %s", (channel_id,))
+        print("DEBUG: get_all_guild_settings - Buscando configurações de todos os servidores...")
+        cursor.execute("SELECT guild_id, settings FROM guild_settings")
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    except Exception as e:
+        print(f"ERRO: Falha ao obter configurações dos servidores no PostgreSQL: {e}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def get_guild_settings(guild_id: int) -> dict | None:
+    """
+    Retorna as configurações guardadas de um servidor ({} se não houver nenhuma), ou None em caso de erro.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT settings FROM guild_settings WHERE guild_id = %s", (guild_id,))
+        row = cursor.fetchone()
+        return row[0] if row else {}
+    except Exception as e:
+        print(f"ERRO: Falha ao obter configurações do servidor {guild_id} no PostgreSQL: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def upsert_guild_settings(guild_id: int, settings: dict) -> dict | None:
+    """
+    Junta as chaves indicadas às configurações guardadas do servidor.
+    Retorna as configurações resultantes, ou None em caso de erro.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        print(f"DEBUG: upsert_guild_settings - Atualizando {list(settings)} para o servidor {guild_id}...")
+        cursor.execute("""
+            INSERT INTO guild_settings (guild_id, settings, updated_at)
+            VALUES (%s, %s::jsonb, NOW())
+            ON CONFLICT (guild_id) DO UPDATE
+            SET settings = guild_settings.settings || EXCLUDED.settings, updated_at = NOW()
+            RETURNING settings
+        """, (guild_id, json.dumps(settings)))
+        merged = cursor.fetchone()[0]
+        publish_invalidation(cursor, 'guild_config', guild_id=guild_id)
         conn.commit()
-        print(f"DEBUG: Ticket para o canal {channel_id} removido do DB PostgreSQL.")
+        return merged
     except Exception as e:
-        print(f"ERRO: Falha ao remover ticket do DB PostgreSQL para {channel_id}: {e}")
+        print(f"ERRO: Falha ao atualizar configurações do servidor {guild_id} no PostgreSQL: {e}")
         if conn:
             conn.rollback()
+        return None
     finally:
         if conn:
             conn.close()
 
-def get_all_open_tickets():
+def delete_guild_setting(guild_id: int, key: str) -> dict | None:
+    """
+    Remove uma chave das configurações do servidor (volta a usar o valor padrão do config.py).
+    Retorna as configurações resultantes, ou None em caso de erro.
+    """
     conn = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        print(f"DEBUG: get_all_open_tickets - Buscando todos os tickets abertos...")
-        cursor.execute("SELECT channel_id, creator_id, creator_name, category, created_at FROM tickets")
-        tickets_raw = cursor.fetchall()
-        
-        tickets_formatted = []
-        for t in tickets_raw:
-            tickets_formatted.append({
-                'channel_id': t[0],
-                'creator_id': t[1],
-                'creator_name': t[2],
-                'category': t[3],
-                'created_at': t[4].isoformat()
-            })
-        return tickets_formatted
+        print(f"DEBUG: delete_guild_setting - Removendo '{key}' do servidor {guild_id}...")
+        cursor.execute("""
+            UPDATE guild_settings SET settings = settings - %s, updated_at = NOW()
+            WHERE guild_id = %s
+            RETURNING settings
+        """, (key, guild_id))
+        row = cursor.fetchone()
+        publish_invalidation(cursor, 'guild_config', guild_id=guild_id)
+        conn.commit()
+        return row[0] if row else {}
     except Exception as e:
-        print(f"ERRO: Falha ao obter tickets abertos do DB PostgreSQL: {e}")
-        return []
+        print(f"ERRO: Falha ao remover configuração '{key}' do servidor {guild_id} no PostgreSQL: {e}")
+        if conn:
+            conn.rollback()
+        return None
     finally:
         if conn:
             conn.close()
@@ -0,0 +1,122 @@
+import heapq
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from config import DISPLAY_TIMEZONE
+
+# --- Cobertura de serviço por hora da semana ---
+# Conta quantos oficiais estão em serviço ao mesmo tempo, por dia da semana e hora (no fuso horário de exibição).
+# As sessões viram eventos de início (+1) e fim (-1), ordenados uma única vez (O(n log n)); um varrimento
+# percorre os eventos e as fronteiras de hora por ordem, somando "oficiais x segundos" em cada célula.
+# O custo é O(n log n + horas do período), por isso meses de dados continuam rápidos.
+
+WEEKDAYS = ("Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom")
+HEAT_LEVELS = " ░▒▓█"
+
+class CoverageGrid:
+    """Resultado do varrimento: uma célula por (dia da semana, hora), com segunda-feira = 0."""
+
+    def __init__(self):
+        self.officer_seconds = [[0.0] * 24 for _ in range(7)]  # Soma de oficiais em serviço x segundos
+        self.slot_seconds = [[0.0] * 24 for _ in range(7)]  # Duração total da célula dentro do período
+        self.uncovered_seconds = [[0.0] * 24 for _ in range(7)]  # Tempo sem nenhum oficial em serviço
+        self.peak = [[0] * 24 for _ in range(7)]  # Máximo de oficiais em simultâneo
+
+    def average(self, weekday: int, hour: int) -> float | None:
+        """Média de oficiais em serviço na célula, ou None se a célula não ocorre no período."""
+        slot = self.slot_seconds[weekday][hour]
+        return self.officer_seconds[weekday][hour] / slot if slot else None
+
+    def uncovered_ratio(self, weekday: int, hour: int) -> float | None:
+        slot = self.slot_seconds[weekday][hour]
+        return self.uncovered_seconds[weekday][hour] / slot if slot else None
+
+    def cells(self):
+        for weekday in range(7):
+            for hour in range(24):
+                if self.slot_seconds[weekday][hour]:
+                    yield weekday, hour
+
+    def weakest(self, limit: int = 5) -> list[tuple[int, int, float, float]]:
+        """As células com menor média de oficiais: [(dia, hora, média, fração sem cobertura)]."""
+        ranked = heapq.nsmallest(limit, self.cells(), key=lambda cell: (self.average(*cell), -self.uncovered_ratio(*cell)))
+        return [(weekday, hour, self.average(weekday, hour), self.uncovered_ratio(weekday, hour)) for weekday, hour in ranked]
+
+def _hour_boundaries(start: datetime, end: datetime, tz: ZoneInfo):
+    """Gera (início UTC, dia da semana, hora local) de cada hora local que toca em [start, end)."""
+    local = start.astimezone(tz).replace(minute=0, second=0, microsecond=0)
+    boundary = local.astimezone(timezone.utc)
+    while boundary < end:
+        local = boundary.astimezone(tz)
+        yield boundary, local.weekday(), local.hour
+        # Avança em UTC: uma mudança de hora (DST) não salta nem repete células
+        boundary += timedelta(hours=1)
+
+def compute_coverage(sessions: list[tuple[datetime, datetime]], start: datetime, end: datetime, tz_name: str = DISPLAY_TIMEZONE) -> CoverageGrid:
+    """
+    Calcula a cobertura de [start, end) a partir das sessões (início, fim), cortadas aos limites do período.
+    As datas têm de ter fuso horário. Chamada só de CPU: usar com asyncio.to_thread para períodos grandes.
+    """
+    grid = CoverageGrid()
+    events = []
+    for session_start, session_end in sessions:
+        session_start, session_end = max(session_start, start), min(session_end, end)
+        if session_start < session_end:
+            events.append((session_start, 1))
+            events.append((session_end, -1))
+    # Num mesmo instante as saídas vêm antes das entradas: uma troca de turno não conta como sobreposição
+    events.sort()
+
+    boundaries = _hour_boundaries(start, end, ZoneInfo(tz_name))
+    boundary, weekday, hour = next(boundaries)
+    next_boundary = next(boundaries, None)
+    cursor = max(start, boundary)
+    active = 0
+    index = 0
+
+    while cursor < end:
+        slot_end = min(next_boundary[0] if next_boundary else end, end)
+        # Aplica todos os eventos até ao fim da célula atual, acumulando o intervalo anterior a cada um
+        while index < len(events) and events[index][0] < slot_end:
+            event_time, delta = events[index]
+            _accumulate(grid, weekday, hour, active, (event_time - cursor).total_seconds())
+            cursor = event_time
+            active += delta
+            grid.peak[weekday][hour] = max(grid.peak[weekday][hour], active)
+            index += 1
+        _accumulate(grid, weekday, hour, active, (slot_end - cursor).total_seconds())
+        cursor = slot_end
+        if next_boundary is None:
+            break
+        _, weekday, hour = next_boundary
+        next_boundary = next(boundaries, None)
+        grid.peak[weekday][hour] = max(grid.peak[weekday][hour], active)
+    return grid
+
+def _accumulate(grid: CoverageGrid, weekday: int, hour: int, active: int, seconds: float):
+    if seconds <= 0:
+        return
+    grid.slot_seconds[weekday][hour] += seconds
+    grid.officer_seconds[weekday][hour] += active * seconds
+    if active == 0:
+        grid.uncovered_seconds[weekday][hour] += seconds
+
+def render_heatmap(grid: CoverageGrid) -> str:
+    """Mapa de calor em texto (dias nas linhas, horas nas colunas), para um bloco de código do Discord."""
+    averages = [grid.average(weekday, hour) for weekday, hour in grid.cells()]
+    top = max(averages, default=0) or 1
+    lines = ["    " + "".join(f"{hour:<3}" if hour % 3 == 0 else "" for hour in range(24)).rstrip()]
+    for weekday, name in enumerate(WEEKDAYS):
+        row = []
+        for hour in range(24):
+            average = grid.average(weekday, hour)
+            if average is None:
+                row.append("·")
+            elif average == 0:
+                row.append(HEAT_LEVELS[0])
+            else:
+                # Qualquer cobertura aparece pelo menos com o primeiro tom
+                row.append(HEAT_LEVELS[max(1, round(average / top * (len(HEAT_LEVELS) - 1)))])
+        lines.append(f"{name} " + "".join(row))
+    lines.append(f"    ' ' 0  '█' {top:.1f} oficiais (média)  '·' fora do período")
+    return "\n".join(lines)
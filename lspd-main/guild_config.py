@@ -0,0 +1,157 @@
+import discord
+from discord import app_commands
+from datetime import datetime
+
+# Importa configurações (valores padrão de todos os servidores)
+from config import (
+    PUNCH_CHANNEL_ID, PUNCH_LOGS_CHANNEL_ID, WEEKLY_REPORT_CHANNEL_ID,
+    TICKET_PANEL_CHANNEL_ID, TICKET_TRANSCRIPTS_CHANNEL_ID,
+    ROLE_ID, TICKET_MODERATOR_ROLE_ID, TICKET_CATEGORIES, TICKET_MODERATOR_ROLES
+)
+from database import get_all_guild_settings, get_guild_settings, upsert_guild_settings, delete_guild_setting
+from coordination import register_invalidation_handler
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+# Chaves simples (um ID de canal ou cargo) que podem ser definidas por servidor.
+CHANNEL_KEYS = (
+    'punch_channel_id', 'punch_logs_channel_id', 'weekly_report_channel_id',
+    'ticket_panel_channel_id', 'ticket_transcripts_channel_id',
+)
+ROLE_KEYS = ('role_id', 'ticket_moderator_role_id')
+
+# Estado partilhado entre instâncias: IDs das mensagens com Views persistentes, por servidor.
+MESSAGE_ID_KEYS = ('punch_message_id', 'ticket_panel_message_id')
+
+# Chaves compostas: {label da categoria: ID da categoria} e {label da categoria: [IDs de cargos]}.
+TICKET_CATEGORIES_KEY = 'ticket_categories'
+TICKET_MODERATOR_ROLES_KEY = 'ticket_moderator_roles'
+
+def _build_default_config() -> dict:
+    """Constrói a configuração padrão a partir do config.py."""
+    return {
+        'punch_channel_id': PUNCH_CHANNEL_ID,
+        'punch_logs_channel_id': PUNCH_LOGS_CHANNEL_ID,
+        'weekly_report_channel_id': WEEKLY_REPORT_CHANNEL_ID,
+        'ticket_panel_channel_id': TICKET_PANEL_CHANNEL_ID,
+        'ticket_transcripts_channel_id': TICKET_TRANSCRIPTS_CHANNEL_ID,
+        'role_id': ROLE_ID,
+        'ticket_moderator_role_id': TICKET_MODERATOR_ROLE_ID,
+        TICKET_CATEGORIES_KEY: {label: category_id for label, _, _, category_id in TICKET_CATEGORIES},
+        TICKET_MODERATOR_ROLES_KEY: {label: list(role_ids) for label, role_ids in TICKET_MODERATOR_ROLES.items()},
+        'punch_message_id': None,
+        'ticket_panel_message_id': None,
+    }
+
+DEFAULT_GUILD_CONFIG = _build_default_config()
+
+# Cache em memória: {guild_id: configuração já combinada com os valores padrão}.
+# As leituras são um simples acesso a dicionário (O(1)); a base de dados só é lida no arranque e nas escritas.
+_guild_configs: dict[int, dict] = {}
+
+def _merge_with_defaults(overrides: dict) -> dict:
+    """Combina as configurações guardadas de um servidor com os valores padrão."""
+    merged = dict(DEFAULT_GUILD_CONFIG)
+    for key, value in overrides.items():
+        if key in (TICKET_CATEGORIES_KEY, TICKET_MODERATOR_ROLES_KEY):
+            # As categorias são combinadas label a label, para que um servidor só precise de definir as que mudam.
+            merged[key] = {**DEFAULT_GUILD_CONFIG[key], **value}
+        elif key in DEFAULT_GUILD_CONFIG:
+            merged[key] = value
+    return merged
+
+def load_guild_configs():
+    """
+    Carrega as configurações de todos os servidores da base de dados para a cache.
+    A cache nova é construída à parte e trocada numa só atribuição: as leituras nunca veem uma cache vazia,
+    e se a base de dados falhar (exceção) a cache anterior fica intacta.
+    """
+    global _guild_configs
+    stored = get_all_guild_settings()
+    _guild_configs = {guild_id: _merge_with_defaults(overrides) for guild_id, overrides in stored.items()}
+    print(log_message("INFO", f"Configurações carregadas para {len(_guild_configs)} servidor(es)", "🗂️"))
+
+def reload_guild_config(guild_id: int):
+    """Volta a ler da base de dados a configuração de um servidor (chamada bloqueante)."""
+    stored = get_guild_settings(guild_id)
+    if stored is None:
+        return
+    if stored:
+        _guild_configs[guild_id] = _merge_with_defaults(stored)
+    else:
+        _guild_configs.pop(guild_id, None)
+
+def reload_default_config():
+    """
+    Reconstrói os valores padrão depois de o config.py ser recarregado (ver hot_reload.py) e volta a combinar
+    a configuração de cada servidor em cache. Chamada bloqueante.
+    """
+    global DEFAULT_GUILD_CONFIG
+    DEFAULT_GUILD_CONFIG = _build_default_config()
+    try:
+        # Uma só consulta para todos os servidores; a cache nova é trocada de uma vez (ver load_guild_configs)
+        load_guild_configs()
+    except Exception as e:
+        # A cache guarda as configurações já combinadas: em caso de erro, ficam com os valores padrão antigos
+        print(log_message("WARNING", f"Falha ao recarregar as configurações dos servidores, mantida a cache atual: {e}", "⚠️"))
+
+def _on_guild_config_invalidated(payload: dict):
+    """Outra instância alterou a configuração de um servidor: atualiza a cache local."""
+    if payload.get('guild_id') is not None and not payload.get('resync'):
+        reload_guild_config(payload['guild_id'])
+        return
+    try:
+        load_guild_configs()
+    except Exception as e:
+        print(log_message("WARNING", f"Falha ao recarregar as configurações dos servidores, mantida a cache atual: {e}", "⚠️"))
+
+register_invalidation_handler('guild_config', _on_guild_config_invalidated)
+
+def get_guild_config(guild_id: int | None) -> dict:
+    """Retorna a configuração do servidor (ou a configuração padrão, se o servidor não tiver nenhuma guardada)."""
+    return _guild_configs.get(guild_id, DEFAULT_GUILD_CONFIG)
+
+def get_ticket_category_id(guild_id: int | None, label: str) -> int | None:
+    """Retorna o ID da categoria do Discord associada ao label de ticket, no servidor indicado."""
+    return get_guild_config(guild_id)[TICKET_CATEGORIES_KEY].get(label)
+
+def get_ticket_moderator_role_ids(guild_id: int | None, label: str) -> list[int]:
+    """Retorna os IDs dos cargos moderadores da categoria de ticket, no servidor indicado."""
+    return get_guild_config(guild_id)[TICKET_MODERATOR_ROLES_KEY].get(label, [])
+
+def set_guild_settings(guild_id: int, settings: dict) -> bool:
+    """Guarda as chaves indicadas para o servidor e atualiza a cache. Retorna True em caso de sucesso."""
+    merged = upsert_guild_settings(guild_id, settings)
+    if merged is None:
+        return False
+    _guild_configs[guild_id] = _merge_with_defaults(merged)
+    return True
+
+def reset_guild_setting(guild_id: int, key: str) -> bool:
+    """Remove a chave do servidor (volta ao valor padrão) e atualiza a cache. Retorna True em caso de sucesso."""
+    remaining = delete_guild_setting(guild_id, key)
+    if remaining is None:
+        return False
+    _guild_configs[guild_id] = _merge_with_defaults(remaining)
+    return True
+
+def member_has_guild_role(member: discord.Member, key: str = 'role_id') -> bool:
+    """Verifica se o membro tem o cargo configurado (pela chave indicada) no seu servidor."""
+    role_id = get_guild_config(member.guild.id).get(key)
+    return role_id is not None and member.get_role(role_id) is not None
+
+def has_guild_role(key: str = 'role_id'):
+    """
+    Check para comandos de barra equivalente a app_commands.checks.has_role,
+    mas que resolve o cargo a partir da configuração do servidor onde o comando foi usado.
+    """
+    def predicate(interaction: discord.Interaction) -> bool:
+        if not isinstance(interaction.user, discord.Member):
+            raise app_commands.NoPrivateMessage()
+        if member_has_guild_role(interaction.user, key):
+            return True
+        raise app_commands.MissingRole(get_guild_config(interaction.guild_id).get(key) or 0)
+    return app_commands.check(predicate)
@@ -0,0 +1,78 @@
+import importlib
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import config
+from guild_config import reload_default_config
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+# --- Recarregamento a quente da configuração e dos cogs ---
+# O config.py é relido no mesmo processo e os nomes importados com "from config import ..." nos módulos
+# do bot são atualizados para os novos valores. A ligação ao gateway, as Views persistentes, as caches,
+# as pools da base de dados e as tarefas em segundo plano dos cogs que não são recarregados continuam vivas.
+#
+# Valores usados só no arranque (token, shards, intents, tamanho das pools, número de workers da fila
+# de saída, intervalos de tasks.loop dos cogs não recarregados, caminho do journal) só mudam com um reinício.
+
+PROJECT_DIR = Path(__file__).resolve().parent
+
+def _project_modules():
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path and Path(path).resolve().is_relative_to(PROJECT_DIR) and module is not config:
+            yield module
+
+def reload_config() -> list[str]:
+    """
+    Relê o config.py e atualiza os nomes importados dele nos módulos já carregados.
+    Retorna os nomes das configurações que mudaram. Chamada bloqueante (volta a ler as configurações por servidor).
+    """
+    previous = {name: value for name, value in vars(config).items() if name.isupper()}
+    importlib.reload(config)
+    current = {name: value for name, value in vars(config).items() if name.isupper()}
+    changed = sorted(name for name in current.keys() | previous.keys() if current.get(name) != previous.get(name))
+
+    for module in _project_modules():
+        namespace = vars(module)
+        for name in changed:
+            # Só os nomes que o módulo tem e que ainda apontam para o valor antigo do config (e não constantes
+            # próprias do módulo); o "in namespace" evita injetar nomes cujo valor antigo era None
+            if name in previous and name in current and name in namespace and namespace[name] is previous[name]:
+                namespace[name] = current[name]
+
+    # Os valores padrão por servidor são combinados com as configurações guardadas na cache
+    reload_default_config()
+    print(log_message("INFO", f"config.py recarregado ({', '.join(changed) if changed else 'sem alterações'})", "🔁"))
+    return changed
+
+def _app_command_payload(bot) -> list[dict]:
+    return sorted((command.to_dict() for command in bot.tree.get_commands()), key=lambda payload: payload['name'])
+
+async def reload_extensions(bot, names: list[str]) -> tuple[list[str], dict[str, Exception], bool]:
+    """
+    Recarrega os cogs indicados (cog_unload do antigo, cog_load do novo), um de cada vez.
+    Se um cog falhar a carregar, o discord.py repõe a versão anterior. Sincroniza os comandos de aplicação
+    apenas se as suas definições mudaram. Retorna (recarregados, falhas, comandos sincronizados).
+    """
+    before = _app_command_payload(bot)
+    reloaded, failed = [], {}
+    for name in names:
+        try:
+            await bot.reload_extension(name)
+            reloaded.append(name)
+            print(log_message("INFO", f"Cog {name.split('.')[-1]} recarregado", "🔁"))
+        except Exception as e:
+            failed[name] = e
+            print(log_message("ERROR", f"Erro ao recarregar cog {name.split('.')[-1]}: {e}", "❌"))
+
+    synced = False
+    if _app_command_payload(bot) != before:
+        await bot.tree.sync()
+        synced = True
+        print(log_message("INFO", "Comandos de aplicação alterados pelo recarregamento, sincronizados com o Discord", "🔄"))
+    return reloaded, failed, synced
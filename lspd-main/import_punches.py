@@ -0,0 +1,109 @@
+"""
+Importa o histórico de pontos de uma base de dados SQLite antiga (punch_card.db) ou de um CSV para o PostgreSQL.
+
+Uso:
+    python import_punches.py punch_card.db --guild-id 123456789012345678
+    python import_punches.py historico.csv --timezone Europe/Lisbon --dry-run
+
+O CSV deve ter cabeçalho com as colunas user_id, username, punch_in_time e punch_out_time (datas ISO 8601).
+Datas sem fuso horário são interpretadas no fuso indicado em --timezone (padrão: UTC).
+Pontos sem saída registada são ignorados. Voltar a correr a importação não duplica sessões.
+"""
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from database import setup_database, bulk_import_punches
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+def read_sqlite(path: str, fetch_size: int):
+    """Lê os pontos da tabela 'punches' da base de dados SQLite, em blocos (sem carregar tudo em memória)."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute("SELECT user_id, username, punch_in_time, punch_out_time FROM punches ORDER BY id")
+        while rows := cursor.fetchmany(fetch_size):
+            yield from rows
+    finally:
+        conn.close()
+
+def read_csv(path: str):
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield row['user_id'], row['username'], row['punch_in_time'], row['punch_out_time']
+
+def _parse_time(value, tz) -> datetime | None:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(str(value).strip())
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed
+
+def batched_rows(rows, batch_size: int, tz, stats: dict):
+    """Valida e normaliza as linhas, agrupando-as em lotes para o COPY."""
+    batch = []
+    for user_id, username, punch_in_time, punch_out_time in rows:
+        try:
+            punch_in, punch_out = _parse_time(punch_in_time, tz), _parse_time(punch_out_time, tz)
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            stats['invalid'] += 1
+            continue
+        if punch_in is None or punch_out is None or punch_out < punch_in:
+            # Pontos abertos (ou com saída antes da entrada) não são sessões completas
+            stats['invalid'] += 1
+            continue
+        batch.append((user_id, str(username or user_id)[:255], punch_in.isoformat(), punch_out.isoformat()))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa o histórico de pontos (SQLite ou CSV) para o PostgreSQL com COPY.")
+    parser.add_argument("source", help="Arquivo .db (SQLite) ou .csv")
+    parser.add_argument("--format", choices=("sqlite", "csv"), help="Formato da fonte (por omissão, pela extensão)")
+    parser.add_argument("--guild-id", type=int, default=None, help="Servidor a atribuir aos pontos importados (padrão: nenhum, visíveis em todos)")
+    parser.add_argument("--timezone", default="UTC", help="Fuso horário das datas sem fuso (padrão: UTC)")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Linhas por lote de COPY")
+    parser.add_argument("--dry-run", action="store_true", help="Faz a importação e desfaz tudo no fim (só mostra as contagens)")
+    args = parser.parse_args()
+
+    source_format = args.format or ("csv" if args.source.lower().endswith(".csv") else "sqlite")
+    tz = timezone.utc if args.timezone.upper() == "UTC" else ZoneInfo(args.timezone)
+    rows = read_csv(args.source) if source_format == "csv" else read_sqlite(args.source, args.batch_size)
+    stats = {'invalid': 0}
+
+    started = time.perf_counter()
+
+    def on_progress(copied: int):
+        elapsed = time.perf_counter() - started
+        print(log_message("INFO", f"{copied} linha(s) copiada(s) ({copied / max(elapsed, 1e-6):.0f}/s)", "📥"), flush=True)
+
+    setup_database()
+    print(log_message("INFO", f"A importar {args.source} ({source_format}){' em modo de teste' if args.dry_run else ''}...", "🚚"))
+    try:
+        result = bulk_import_punches(batched_rows(rows, args.batch_size, tz, stats), args.guild_id, args.dry_run, on_progress)
+    except Exception as e:
+        print(log_message("ERROR", f"Importação cancelada, nada foi gravado: {e}", "❌"))
+        sys.exit(1)
+
+    elapsed = time.perf_counter() - started
+    print(log_message(
+        "INFO",
+        f"Importação {'simulada' if args.dry_run else 'concluída'} em {elapsed:.1f}s: {result['inserted']} inserida(s), "
+        f"{result['duplicates']} duplicada(s), {stats['invalid']} ignorada(s) (incompletas ou inválidas)",
+        "✅"
+    ))
+
+if __name__ == '__main__':
+    main()
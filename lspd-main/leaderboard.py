@@ -0,0 +1,155 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sortedcontainers import SortedList
+
+from config import DISPLAY_TIMEZONE
+from database import duty_totals_snapshot
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+# --- Ranking de horas de serviço em memória ---
+# Um ranking por servidor e por período (semana e mês correntes, no fuso horário de exibição).
+# Cada saída de serviço (desta instância ou, pela notificação de invalidação, de outra) atualiza o ranking
+# em O(log n); consultar o ranking não toca na base de dados.
+# O ranking é reconstruído a partir do PostgreSQL no arranque, quando o período muda e numa ressincronização.
+# Como no /horas, cada sessão conta para o período em que começou.
+#
+# Uma sessão é identificada pelo journal_id da saída (punch_out_journal_id na base de dados). As sessões somadas
+# incrementalmente ficam registadas até uma reconstrução confirmar que já estão nos totais lidos: uma sessão
+# somada durante a reconstrução, mas ainda não escrita no snapshot lido (por exemplo, uma saída ainda no journal),
+# é somada outra vez aos rankings novos em vez de se perder, e uma que já lá está não conta a dobrar.
+
+PERIODS = {
+    'semana': "Semana atual",
+    'mes': "Mês atual",
+}
+
+def period_start(period: str, now: datetime | None = None) -> datetime:
+    """Início do período corrente (segunda-feira 00:00 ou dia 1 00:00, no fuso horário de exibição)."""
+    local_now = (now or datetime.now(timezone.utc)).astimezone(ZoneInfo(DISPLAY_TIMEZONE))
+    start = local_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'semana':
+        start -= timedelta(days=start.weekday())
+    else:
+        start = start.replace(day=1)
+    return start
+
+class RankingBoard:
+    """Ranking de um servidor num período: totais por oficial mantidos numa SortedList ordenada por tempo."""
+
+    def __init__(self):
+        self._totals: dict[int, tuple[float, str]] = {}  # user_id -> (segundos, nome)
+        self._order = SortedList()  # (-segundos, user_id)
+
+    def __len__(self) -> int:
+        return len(self._totals)
+
+    def add(self, user_id: int, username: str, seconds: float):
+        previous = self._totals.get(user_id)
+        total = seconds
+        if previous is not None:
+            self._order.remove((-previous[0], user_id))
+            total += previous[0]
+        self._totals[user_id] = (total, username or (previous[1] if previous else str(user_id)))
+        self._order.add((-total, user_id))
+
+    def top(self, limit: int) -> list[tuple[int, str, float]]:
+        """Os primeiros `limit` oficiais: [(user_id, nome, segundos)]."""
+        return [(user_id, self._totals[user_id][1], -negative) for negative, user_id in self._order[:limit]]
+
+    def position(self, user_id: int) -> tuple[int, float] | None:
+        """(posição a começar em 1, segundos) do oficial, ou None se não tem horas no período."""
+        entry = self._totals.get(user_id)
+        if entry is None:
+            return None
+        return self._order.index((-entry[0], user_id)) + 1, entry[0]
+
+class DutyLeaderboard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards: dict[tuple[str, int | None], RankingBoard] = {}
+        self._starts: dict[str, datetime] = {}
+        # Sessões somadas incrementalmente e ainda não confirmadas numa reconstrução:
+        # {session_id: (guild_id, user_id, nome, início, segundos)}
+        self._sessions: dict[str, tuple] = {}
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._starts)
+
+    def needs_rollover(self) -> bool:
+        """True se ainda não foi construído ou se algum período mudou desde a última reconstrução."""
+        return not self._starts or any(self._starts.get(period) != period_start(period) for period in PERIODS)
+
+    def rebuild(self, guild_ids: list[int]):
+        """
+        Reconstrói todos os rankings a partir do PostgreSQL. Os pontos antigos sem servidor (guild_id NULL)
+        contam em todos os servidores indicados, como no /horas. Chamada bloqueante; as reconstruções não
+        devem correr em paralelo (ver RankingCog.rebuild).
+        """
+        starts = {period: period_start(period) for period in PERIODS}
+        boards: dict[tuple[str, int | None], RankingBoard] = {}
+        with duty_totals_snapshot() as (totals_since, closed_sessions):
+            for period, start in starts.items():
+                for row in totals_since(start):
+                    targets = guild_ids if row['guild_id'] is None else [row['guild_id']]
+                    for guild_id in targets:
+                        boards.setdefault((period, guild_id), RankingBoard()).add(row['user_id'], row['username'], row['total_seconds'])
+
+            # As sessões somadas entretanto são verificadas no mesmo snapshot, até não haver nenhuma por verificar;
+            # a troca dos rankings acontece sob o lock, sem sessões novas pelo meio.
+            confirmed: set[str] = set()
+            checked: set[str] = set()
+            while True:
+                with self._lock:
+                    unchecked = [session_id for session_id in self._sessions if session_id not in checked]
+                    if not unchecked:
+                        sessions = {
+                            session_id: session for session_id, session in self._sessions.items()
+                            if session_id not in confirmed and session[3] >= min(starts.values())
+                        }
+                        for guild_id, user_id, username, punch_in_time, seconds in sessions.values():
+                            self._add_session(boards, starts, guild_id, user_id, username, punch_in_time, seconds)
+                        self._boards = boards
+                        self._starts = starts
+                        self._sessions = sessions
+                        break
+                confirmed |= closed_sessions(unchecked)
+                checked.update(unchecked)
+        print(log_message("INFO", f"Ranking de horas reconstruído ({len(boards)} ranking(s))", "🏆"))
+
+    @staticmethod
+    def _add_session(boards: dict, starts: dict, guild_id: int | None, user_id: int, username: str, punch_in_time: datetime, seconds: float):
+        for period, start in starts.items():
+            if punch_in_time >= start:
+                boards.setdefault((period, guild_id), RankingBoard()).add(user_id, username, seconds)
+
+    def record_session(self, session_id: str, guild_id: int | None, user_id: int, username: str, punch_in_time: datetime, seconds: float):
+        """Soma uma sessão terminada aos rankings dos períodos em que começou (O(log n)). Ignora sessões repetidas."""
+        with self._lock:
+            if session_id in self._sessions:
+                return
+            self._sessions[session_id] = (guild_id, user_id, username, punch_in_time, seconds)
+            self._add_session(self._boards, self._starts, guild_id, user_id, username, punch_in_time, seconds)
+
+    def top(self, period: str, guild_id: int | None, limit: int = 10) -> list[tuple[int, str, float]]:
+        with self._lock:
+            board = self._boards.get((period, guild_id))
+            return board.top(limit) if board else []
+
+    def position(self, period: str, guild_id: int | None, user_id: int) -> tuple[int, float] | None:
+        with self._lock:
+            board = self._boards.get((period, guild_id))
+            return board.position(user_id) if board else None
+
+    def size(self, period: str, guild_id: int | None) -> int:
+        with self._lock:
+            board = self._boards.get((period, guild_id))
+            return len(board) if board else 0
+
+leaderboard = DutyLeaderboard()
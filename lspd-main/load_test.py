@@ -0,0 +1,608 @@
+"""
+Teste de carga sintético dos fluxos de picagem de ponto e de tickets.
+
+Chama diretamente os callbacks de PunchCardView, TicketCategorySelect e TicketControlView com interações
+falsas, contra uma camada HTTP do Discord simulada (latência e limites de ritmo por rota) e contra o PostgreSQL
+local (DATABASE_URL) ou um backend em memória com latência simulada.
+
+Uso:
+    python load_test.py --scenario punch --users 200 --ramp 60
+    python load_test.py --scenario tickets --users 50 --concurrency 20 --api-latency-ms 120
+    python load_test.py --scenario all --backend postgres --guild-id 1
+
+O relatório mostra, por operação, o débito, os percentis de latência (até ao fim do callback e até à primeira
+resposta à interação), as interações que passaram dos 3 segundos do Discord e os erros.
+Com --backend postgres os dados são escritos na base de dados de DATABASE_URL, no servidor --guild-id:
+use uma base de dados local, nunca a de produção.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+import discord
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+# O Discord considera a interação falhada se não receber resposta em 3 segundos
+INTERACTION_DEADLINE_SECONDS = 3.0
+
+# --- Camada HTTP do Discord simulada ---
+# Limites aproximados por rota: (pedidos, janela em segundos), por recurso principal (canal, servidor, webhook).
+# Um pedido acima do limite recebe um 429 simulado e espera o retry_after, como o discord.py faz.
+ROUTE_LIMITS = {
+    'POST /channels/{channel_id}/messages': (5, 5.0),
+    'PATCH /channels/{channel_id}/messages/{message_id}': (5, 5.0),
+    'PATCH /channels/{channel_id}': (2, 600.0),
+    'DELETE /channels/{channel_id}': (5, 5.0),
+    'POST /guilds/{guild_id}/channels': (10, 10.0),
+    'POST /webhooks/{application_id}/{token}': (5, 2.0),
+}
+GLOBAL_RATE_LIMIT = 50  # Pedidos por segundo (as respostas às interações não contam)
+UNLIMITED_ROUTES = {'POST /interactions/{interaction_id}/{token}/callback'}
+
+class FakeDiscordHTTP:
+    def __init__(self, latency_ms: float, jitter_ms: float):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self._windows: dict[tuple[str, int], deque[float]] = {}
+        self._global: deque[float] = deque()
+        self.requests: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+
+    def _retry_after(self, route: str, major: int, now: float) -> float:
+        if route not in UNLIMITED_ROUTES:
+            while self._global and now - self._global[0] >= 1.0:
+                self._global.popleft()
+            if len(self._global) >= GLOBAL_RATE_LIMIT:
+                return 1.0 - (now - self._global[0])
+        limit = ROUTE_LIMITS.get(route)
+        if limit:
+            count, per = limit
+            window = self._windows.setdefault((route, major), deque())
+            while window and now - window[0] >= per:
+                window.popleft()
+            if len(window) >= count:
+                return per - (now - window[0])
+            window.append(now)
+        if route not in UNLIMITED_ROUTES:
+            self._global.append(now)
+        return 0.0
+
+    async def request(self, route: str, major: int):
+        while (retry_after := self._retry_after(route, major, time.monotonic())) > 0:
+            self.rate_limited[route] += 1
+            await asyncio.sleep(retry_after)
+        self.requests[route] += 1
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+_snowflakes = itertools.count(int(time.time() * 1000) << 22)
+
+def next_snowflake() -> int:
+    return next(_snowflakes)
+
+# --- Objetos do Discord falsos ---
+
+class FakeMember:
+    def __init__(self, user_id: int, name: str, bot: bool = False):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.roles = []
+        self.bot = bot
+
+    def __str__(self):
+        return self.name
+
+class FakeMessage:
+    def __init__(self, http: FakeDiscordHTTP, channel, author: FakeMember, content: str | None, embeds: list):
+        self.http = http
+        self.id = next_snowflake()
+        self.channel = channel
+        self.author = author
+        self.content = content or ""
+        self.embeds = embeds
+        self.attachments = []
+        self.created_at = datetime.now(timezone.utc)
+
+    async def edit(self, **kwargs):
+        await self.http.request('PATCH /channels/{channel_id}/messages/{message_id}', self.channel.id)
+        return self
+
+class FakeTextChannel:
+    def __init__(self, http: FakeDiscordHTTP, bot, guild, name: str):
+        self.http = http
+        self.bot = bot
+        self.id = next_snowflake()
+        self.guild = guild
+        self.name = name
+        self.mention = f"<#{self.id}>"
+        self.messages: list[FakeMessage] = []
+
+    async def send(self, content=None, *, embed=None, embeds=None, **kwargs):
+        await self.http.request('POST /channels/{channel_id}/messages', self.id)
+        message = FakeMessage(self.http, self, self.bot.user, content, [embed] if embed else list(embeds or []))
+        self.messages.append(message)
+        # O gateway entrega a mensagem do próprio bot aos listeners (captura das mensagens dos tickets)
+        self.bot.dispatch_message(message)
+        return message
+
+    async def edit(self, **kwargs):
+        await self.http.request('PATCH /channels/{channel_id}', self.id)
+        if 'name' in kwargs:
+            self.name = kwargs['name']
+
+    async def delete(self, reason: str | None = None):
+        await self.http.request('DELETE /channels/{channel_id}', self.id)
+        self.bot.channels.pop(self.id, None)
+
+    async def history(self, limit=None, after=None, oldest_first=True):
+        for message in list(self.messages):
+            yield message
+
+class FakeCategory(discord.CategoryChannel):
+    """Passa no isinstance(..., discord.CategoryChannel) da criação de tickets."""
+
+    def __init__(self, http: FakeDiscordHTTP, bot, guild):
+        self.http = http
+        self.bot = bot
+        self.id = next_snowflake()
+        self._guild = guild
+
+    async def create_text_channel(self, name: str, **kwargs):
+        await self.http.request('POST /guilds/{guild_id}/channels', self._guild.id)
+        channel = FakeTextChannel(self.http, self.bot, self._guild, name)
+        self.bot.channels[channel.id] = channel
+        return channel
+
+class FakeGuild:
+    def __init__(self, guild_id: int, bot):
+        self.id = guild_id
+        self.name = "Servidor de carga"
+        self.default_role = "@everyone"
+        self.me = bot.user
+        self.category: FakeCategory | None = None
+
+    def get_channel(self, channel_id):
+        # Qualquer ID de categoria configurado resolve para a categoria de teste
+        return self.category
+
+    def get_role(self, role_id):
+        return None
+
+class FakeBot:
+    def __init__(self):
+        self.user = FakeMember(next_snowflake(), "LSPD Bot", bot=True)
+        self.channels: dict[int, FakeTextChannel] = {}
+        self.guilds = []
+        self.message_listeners = []
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def dispatch_message(self, message: FakeMessage):
+        for listener in self.message_listeners:
+            asyncio.create_task(listener(message))
+
+    async def wait_until_ready(self):
+        return
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def _ack(self):
+        await self._interaction.http.request('POST /interactions/{interaction_id}/{token}/callback', self._interaction.id)
+        if self._interaction.acked_at is None:
+            self._interaction.acked_at = time.perf_counter()
+
+    async def send_message(self, content=None, **kwargs):
+        await self._ack()
+
+    async def defer(self, **kwargs):
+        await self._ack()
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        await self._interaction.http.request('POST /webhooks/{application_id}/{token}', self._interaction.id)
+        if self._interaction.acked_at is None:
+            self._interaction.acked_at = time.perf_counter()
+
+class FakeInteraction:
+    def __init__(self, http: FakeDiscordHTTP, user: FakeMember, guild: FakeGuild, channel=None, message=None):
+        self.http = http
+        self.id = next_snowflake()
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = channel
+        self.message = message
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.started_at = time.perf_counter()
+        self.acked_at: float | None = None
+
+# --- Backend em memória ---
+
+class MemoryCursor:
+    def __init__(self, backend: 'MemoryBackend'):
+        self.backend = backend
+        self.rows: list[tuple] = []
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def execute(self, sql: str, params: tuple = ()):
+        # Só as notificações de invalidação passam por aqui; o payload tem de ser JSON válido, como no PostgreSQL
+        if not sql.startswith("SELECT pg_notify"):
+            raise NotImplementedError(sql)
+        self.backend.notifications.append(json.loads(params[1]))
+        self.rows, self.rowcount = [("",)], 1
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+class MemoryConnection:
+    """
+    Ligação falsa que executa as consultas preparadas das picagens sobre o estado em memória.
+    As funções de repository.py (apply_punch_in_entry, apply_punch_out_entry, get_open_punches) correm tal como
+    no bot, com os mesmos parâmetros e resultados, por isso a reaplicação do journal é verificada de ponta a ponta.
+    """
+
+    def __init__(self, backend: 'MemoryBackend'):
+        self.backend = backend
+
+    def cursor(self):
+        return MemoryCursor(self.backend)
+
+    def execute_prepared(self, cursor: MemoryCursor, name: str, params: tuple = ()):
+        self.backend._wait()
+        with self.backend._lock:
+            cursor.rows = getattr(self.backend, f"_statement_{name}")(*params)
+        cursor.rowcount = len(cursor.rows)
+
+class MemoryBackend:
+    """
+    Substitui a base de dados usada pelos fluxos por estado em memória, com a latência indicada.
+    As funções são chamadas em threads (asyncio.to_thread), por isso a latência é um time.sleep, como o psycopg2.
+    """
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self._lock = threading.Lock()
+        # Linhas de 'punches': [user_id, nome, guild_id, entrada, saída, journal_id, journal_id da saída]
+        self.punches: list[list] = []
+        self.notifications: list[dict] = []
+        self.tickets: dict[int, dict] = {}
+        self._ticket_ids = itertools.count(1)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    # Mesma semântica das consultas preparadas de repository.py (STATEMENTS)
+
+    def _statement_open_punches(self) -> list[tuple]:
+        return [(row[0], row[2], row[3]) for row in self.punches if row[4] is None]
+
+    def _statement_punch_in(self, user_id, username, punch_in_time, guild_id, journal_id) -> list[tuple]:
+        if any(row[5] == journal_id or (row[0], row[2], row[4]) == (user_id, guild_id, None) for row in self.punches):
+            return []
+        self.punches.append([user_id, username, guild_id, punch_in_time, None, journal_id, None])
+        return [()]
+
+    def _statement_punch_out(self, user_id, guild_id, punch_out_time, journal_id) -> list[tuple]:
+        if any(row[6] == journal_id for row in self.punches):
+            return []
+        open_rows = [row for row in self.punches if (row[0], row[2], row[4]) == (user_id, guild_id, None) and row[3] <= punch_out_time]
+        if not open_rows:
+            return []
+        row = open_rows[-1]
+        row[4], row[6] = punch_out_time, journal_id
+        return [(row[1], row[3])]
+
+    def install(self):
+        import repository
+        import cogs.tickets as tickets
+        from repository import TicketRecord
+
+        def reserve_ticket(guild_id, creator_id, creator_name, category):
+            self._wait()
+            with self._lock:
+                mine = {t['category']: t['channel_id'] for t in self.tickets.values() if (t['guild_id'], t['creator_id']) == (guild_id, creator_id)}
+                if category in mine:
+                    return 'exists', mine[category]
+                if len(mine) >= tickets.TICKET_MAX_OPEN_PER_USER:
+                    return 'limit', None
+                ticket_id = next(self._ticket_ids)
+                self.tickets[ticket_id] = {
+                    'channel_id': None, 'guild_id': guild_id, 'creator_id': creator_id,
+                    'creator_name': creator_name, 'category': category, 'created_at': datetime.now(timezone.utc)
+                }
+                return 'reserved', ticket_id
+
+        def attach_ticket_channel(ticket_id, channel_id, guild_id):
+            self._wait()
+            with self._lock:
+                ticket = self.tickets.get(ticket_id)
+                if ticket is None or ticket['channel_id'] is not None:
+                    return False
+                ticket['channel_id'] = channel_id
+                return True
+
+        def release_ticket_reservation(ticket_id):
+            self._wait()
+            with self._lock:
+                self.tickets.pop(ticket_id, None)
+
+        def _find(channel_id):
+            return next((ticket_id for ticket_id, t in self.tickets.items() if t['channel_id'] == channel_id), None)
+
+        def get_open_ticket(channel_id):
+            self._wait()
+            with self._lock:
+                ticket_id = _find(channel_id)
+                if ticket_id is None:
+                    return None
+                t = self.tickets[ticket_id]
+                return TicketRecord(t['channel_id'], t['creator_id'], t['creator_name'], t['category'], t['created_at'], t['guild_id'])
+
+        def remove_ticket(channel_id):
+            self._wait()
+            with self._lock:
+                self.tickets.pop(_find(channel_id), None)
+
+        def no_op(*args, **kwargs):
+            self._wait()
+
+        repository.connection = lambda: contextlib.nullcontext(MemoryConnection(self))
+        tickets.reserve_ticket = reserve_ticket
+        tickets.attach_ticket_channel = attach_ticket_channel
+        tickets.release_ticket_reservation = release_ticket_reservation
+        tickets.get_open_ticket = get_open_ticket
+        tickets.remove_ticket = remove_ticket
+        tickets.get_open_tickets = lambda guild_id=None: []
+        tickets.save_ticket_messages = no_op
+        tickets.delete_ticket_messages = no_op
+        tickets.touch_ticket_activity = no_op
+        tickets.save_ticket_transcript = lambda transcript: no_op() or True
+        # Sem mensagens guardadas: o transcrito é lido do histórico do canal falso
+        tickets.get_ticket_messages = lambda channel_id: no_op() or []
+
+# --- Medições ---
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.ack_latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, Counter] = {}
+        self.late_acks: Counter = Counter()
+
+    def record(self, operation: str, interaction: FakeInteraction | None, started: float, error: Exception | None = None):
+        self.latencies.setdefault(operation, []).append(time.perf_counter() - started)
+        if error is not None:
+            self.errors.setdefault(operation, Counter())[type(error).__name__] += 1
+        if interaction is not None:
+            ack = (interaction.acked_at or time.perf_counter()) - interaction.started_at
+            self.ack_latencies.setdefault(operation, []).append(ack)
+            if ack > INTERACTION_DEADLINE_SECONDS:
+                self.late_acks[operation] += 1
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def format_report(recorder: Recorder, http: FakeDiscordHTTP, elapsed: float, loop_lag: dict, outbound_stats: Counter) -> str:
+    lines = ["Relatório do teste de carga:"]
+    header = f"  {'operação':<14} {'total':>6} {'ops/s':>7} {'p50':>8} {'p90':>8} {'p99':>8} {'máx.':>8} {'ack p99':>8} {'>3s':>5} {'erros':>6}"
+    lines.append(header)
+    for operation, values in recorder.latencies.items():
+        values = sorted(values)
+        acks = sorted(recorder.ack_latencies.get(operation, []))
+        errors = sum(recorder.errors.get(operation, Counter()).values())
+        lines.append(
+            f"  {operation:<14} {len(values):>6} {len(values) / elapsed:>7.1f} "
+            f"{percentile(values, 0.5) * 1000:>6.0f}ms {percentile(values, 0.9) * 1000:>6.0f}ms "
+            f"{percentile(values, 0.99) * 1000:>6.0f}ms {values[-1] * 1000:>6.0f}ms "
+            f"{percentile(acks, 0.99) * 1000:>6.0f}ms {recorder.late_acks[operation]:>5} "
+            f"{errors / len(values):>6.1%}"
+        )
+    for operation, errors in recorder.errors.items():
+        lines.append(f"  erros em {operation}: {', '.join(f'{name} x{count}' for name, count in errors.most_common())}")
+    lines.append(f"  duração total: {elapsed:.1f}s")
+    lines.append(f"  pedidos ao Discord: {sum(http.requests.values())}, 429 simulados: {sum(http.rate_limited.values())}")
+    for route, count in http.rate_limited.most_common():
+        lines.append(f"    429 em {route}: {count}")
+    lines.append(f"  fila de saída: {dict(outbound_stats)}")
+    lines.append(
+        f"  lag do event loop: p50 {loop_lag['p50_ms']}ms, p99 {loop_lag['p99_ms']}ms, máx. {loop_lag['max_ms']}ms"
+    )
+    return "\n".join(lines)
+
+# --- Cenários ---
+
+async def run_users(users: int, concurrency: int, ramp: float, flow):
+    """Arranca `users` fluxos distribuídos ao longo de `ramp` segundos, com no máximo `concurrency` em simultâneo."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def start(index: int):
+        if ramp:
+            await asyncio.sleep(ramp * index / users)
+        async with semaphore:
+            await flow(index)
+
+    await asyncio.gather(*(start(index) for index in range(users)))
+
+async def timed_interaction(recorder: Recorder, operation: str, interaction: FakeInteraction, coro):
+    started = time.perf_counter()
+    try:
+        await coro
+    except Exception as e:
+        recorder.record(operation, interaction, started, e)
+        return False
+    recorder.record(operation, interaction, started)
+    return True
+
+async def punch_scenario(args, http: FakeDiscordHTTP, bot: FakeBot, guild: FakeGuild, recorder: Recorder):
+    import punch_journal
+    from cogs.punch_card import PunchCardCog, PunchCardView
+    from guild_config import get_guild_config
+
+    cog = PunchCardCog(bot)
+    view = PunchCardView(cog)
+    logs_channel = FakeTextChannel(http, bot, guild, "logs-picagem")
+    # O canal de logs é procurado pelo ID configurado para o servidor (None se não houver configuração)
+    bot.channels[get_guild_config(guild.id)['punch_logs_channel_id']] = logs_channel
+    await asyncio.to_thread(punch_journal.initialize)
+    button = view.children[0]
+
+    async def officer(index: int):
+        member = FakeMember(next_snowflake(), f"oficial-{index}")
+        interaction = FakeInteraction(http, member, guild)
+        await timed_interaction(recorder, "entrada", interaction, PunchCardView.punch_in_button_callback(view, interaction, button))
+        if args.think_time:
+            await asyncio.sleep(random.uniform(0, args.think_time))
+        interaction = FakeInteraction(http, member, guild)
+        await timed_interaction(recorder, "saída", interaction, PunchCardView.punch_out_button_callback(view, interaction, button))
+
+    await run_users(args.users, args.concurrency, args.ramp, officer)
+    # O journal é reaplicado em segundo plano; mede também quanto tempo leva a esvaziar
+    started = time.perf_counter()
+    await cog._replay_journal()
+    # Cada entrada e saída tem de chegar à base de dados: uma entrada presa bloqueia todas as seguintes
+    pending = punch_journal.pending_count()
+    error = RuntimeError(f"{pending} picagem(ns) por aplicar no journal depois da reaplicação") if pending else None
+    recorder.record("replay", None, started, error)
+
+async def ticket_scenario(args, http: FakeDiscordHTTP, bot: FakeBot, guild: FakeGuild, recorder: Recorder):
+    import cogs.tickets as tickets
+    from config import TICKET_CATEGORIES
+
+    tickets.TICKET_CLOSE_DELAY_SECONDS = 0
+    cog = tickets.TicketsCog(bot)
+    bot.message_listeners.append(cog.on_message)
+    guild.category = FakeCategory(http, bot, guild)
+    control_view = tickets.TicketControlView(cog)
+    close_button = control_view.children[0]
+
+    async def user(index: int):
+        member = FakeMember(next_snowflake(), f"utilizador-{index}")
+        label = TICKET_CATEGORIES[index % len(TICKET_CATEGORIES)][0]
+        select = tickets.TicketCategorySelect(cog, guild.id)
+        select._values = [label]
+        interaction = FakeInteraction(http, member, guild)
+        await timed_interaction(recorder, "criar ticket", interaction, select.callback(interaction))
+
+        channel = next((c for c in list(bot.channels.values()) if c.name == f"ticket-{member.name}"), None)
+        if channel is None:
+            return
+        # A conversa no ticket passa pela captura de mensagens
+        for _ in range(args.ticket_messages):
+            message = FakeMessage(http, channel, member, "mensagem de teste", [])
+            channel.messages.append(message)
+            await cog.on_message(message)
+        welcome = channel.messages[0] if channel.messages else FakeMessage(http, channel, bot.user, "", [])
+        interaction = FakeInteraction(http, member, guild, channel=channel, message=welcome)
+        await timed_interaction(recorder, "fechar ticket", interaction, tickets.TicketControlView.close_ticket(control_view, interaction, close_button))
+
+    await run_users(args.users, args.concurrency, args.ramp, user)
+    await cog.flush_ticket_messages()
+
+async def run(args) -> str:
+    from loop_watchdog import LoopWatchdog
+    from outbound import outbound
+    import punch_journal
+
+    http = FakeDiscordHTTP(args.api_latency_ms, args.api_jitter_ms)
+    bot = FakeBot()
+    guild = FakeGuild(args.guild_id, bot)
+    bot.guilds.append(guild)
+    recorder = Recorder()
+
+    if args.backend == 'memory':
+        MemoryBackend(args.db_latency_ms).install()
+    else:
+        from database import setup_database
+        await asyncio.to_thread(setup_database)
+
+    # O journal de picagens do teste fica num arquivo temporário, separado do journal do bot
+    journal_dir = tempfile.TemporaryDirectory()
+    punch_journal.journal = punch_journal.PunchJournal(os.path.join(journal_dir.name, "punch_journal.jsonl"))
+
+    watchdog = LoopWatchdog(threshold_ms=args.lag_threshold_ms)
+    watchdog.start(asyncio.get_running_loop())
+    started = time.perf_counter()
+    try:
+        if args.scenario in ('punch', 'all'):
+            await punch_scenario(args, http, bot, guild, recorder)
+        if args.scenario in ('tickets', 'all'):
+            await ticket_scenario(args, http, bot, guild, recorder)
+    finally:
+        elapsed = time.perf_counter() - started
+        watchdog.stop()
+        await outbound.stop()
+        journal_dir.cleanup()
+    return format_report(recorder, http, elapsed, watchdog.lag_stats(), outbound.stats)
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga dos fluxos de picagem de ponto e de tickets.")
+    parser.add_argument('--scenario', choices=('punch', 'tickets', 'all'), default='all')
+    parser.add_argument('--users', type=int, default=200, help="Número de oficiais/utilizadores simulados (padrão: 200)")
+    parser.add_argument('--concurrency', type=int, default=200, help="Fluxos em simultâneo (padrão: 200)")
+    parser.add_argument('--ramp', type=float, default=60.0, help="Segundos ao longo dos quais os utilizadores chegam (padrão: 60)")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Espera máxima entre entrada e saída de serviço, em segundos")
+    parser.add_argument('--ticket-messages', type=int, default=5, help="Mensagens enviadas em cada ticket antes de fechar")
+    parser.add_argument('--backend', choices=('memory', 'postgres'), default='memory',
+                        help="memory (padrão) ou postgres (usa DATABASE_URL; apenas uma base de dados local)")
+    parser.add_argument('--db-latency-ms', type=float, default=5.0, help="Latência simulada de cada chamada no backend em memória")
+    parser.add_argument('--api-latency-ms', type=float, default=80.0, help="Latência simulada de cada pedido ao Discord")
+    parser.add_argument('--api-jitter-ms', type=float, default=30.0)
+    parser.add_argument('--lag-threshold-ms', type=int, default=100, help="Bloqueios do event loop acima disto são reportados")
+    parser.add_argument('--guild-id', type=int, default=1, help="ID de servidor sintético usado nos registos (padrão: 1)")
+    parser.add_argument('--verbose', action='store_true', help="Mostra os logs dos cogs durante o teste")
+    args = parser.parse_args()
+
+    if args.backend == 'postgres' and not os.getenv('DATABASE_URL'):
+        print(log_message("ERROR", "--backend postgres precisa da variável DATABASE_URL (de uma base de dados local)", "❌"))
+        sys.exit(1)
+
+    print(log_message("INFO", f"Cenário '{args.scenario}': {args.users} utilizador(es), {args.concurrency} em simultâneo, chegada em {args.ramp:.0f}s, backend {args.backend}", "🏋️"))
+    logs = io.StringIO()
+    with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(logs):
+        report = asyncio.run(run(args))
+    print(log_message("INFO", report, "📊"))
+    errors = [line for line in logs.getvalue().splitlines() if "[ERROR" in line or "[WARNING" in line]
+    if errors:
+        print(log_message("WARNING", f"{len(errors)} aviso(s)/erro(s) nos logs dos cogs; os primeiros:\n" + "\n".join(errors[:10]), "⚠️"))
+
+if __name__ == '__main__':
+    main()
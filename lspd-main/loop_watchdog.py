@@ -0,0 +1,196 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+
+from aiohttp import web
+
+import psycopg2
+import psycopg2.pool
+from config import LOOP_LAG_THRESHOLD_MS, LOOP_DEBUG, HEALTH_PORT
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+# --- Monitorização do event loop ---
+# Uma corrotina acorda a cada HEARTBEAT_INTERVAL segundos e mede o atraso com que acordou (lag do loop).
+# Uma thread vigia esses batimentos: se o loop ficar parado mais do que LOOP_LAG_THRESHOLD_MS, captura
+# a stack da thread do loop nesse momento (o callback que está a bloquear) e regista-a.
+# No modo LOOP_DEBUG, as ligações à base de dados abertas na thread do loop também são registadas.
+
+HEARTBEAT_INTERVAL = 0.25
+LAG_SAMPLES = 240  # Últimos 60 segundos de amostras
+MAX_STALLS_KEPT = 20
+# Módulos de acesso à base de dados (para identificar a função chamada e quem a chamou)
+DB_MODULES = ('database.py', 'repository.py', 'coordination.py')
+
+class LoopWatchdog:
+    def __init__(self, threshold_ms: int = LOOP_LAG_THRESHOLD_MS):
+        self.threshold = threshold_ms / 1000
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._last_beat = time.monotonic()
+        self._lag_samples: deque[float] = deque(maxlen=LAG_SAMPLES)
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self.recent_stalls: deque[dict] = deque(maxlen=MAX_STALLS_KEPT)
+        # Chamadas síncronas à base de dados feitas no event loop (modo debug): {local da chamada: contagem}
+        self.blocking_calls: Counter = Counter()
+        self._factory_state = threading.local()
+        self._heartbeat_task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._health_runner: web.AppRunner | None = None
+        self.health_status = None  # Função opcional que retorna dados extra para o /health (por exemplo, o estado do bot)
+
+    # --- Lag e bloqueios ---
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat_task = loop.create_task(self._heartbeat())
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        if LOOP_DEBUG:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.threshold
+            self._install_blocking_detector()
+        print(log_message("INFO", f"Watchdog do event loop ativo (limite {self.threshold * 1000:.0f} ms{', modo debug' if LOOP_DEBUG else ''})", "🐕"))
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + HEARTBEAT_INTERVAL
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            self._lag_samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def _watch(self):
+        """Thread de vigilância: deteta o loop parado e captura a stack do que o está a bloquear."""
+        reported_beat = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._last_beat
+            blocked_for = time.monotonic() - beat - HEARTBEAT_INTERVAL
+            if blocked_for < self.threshold or beat == reported_beat:
+                continue
+            # Um relatório por bloqueio: só volta a reportar depois do próximo batimento
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "(stack indisponível)"
+            self.stall_count += 1
+            self.recent_stalls.append({
+                'at': datetime.now().isoformat(timespec='seconds'),
+                'blocked_ms': round(blocked_for * 1000),
+                'stack': stack[-4000:]
+            })
+            print(log_message("WARNING", f"Event loop bloqueado há {blocked_for * 1000:.0f} ms. Stack da thread do loop:\n{stack}", "🐢"))
+
+    def lag_stats(self) -> dict:
+        samples = sorted(self._lag_samples)
+        if not samples:
+            return {'current_ms': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'current_ms': round(self._lag_samples[-1] * 1000, 1),
+            'p50_ms': round(samples[len(samples) // 2] * 1000, 1),
+            'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 1),
+            'max_ms': round(self.max_lag * 1000, 1)
+        }
+
+    # --- Deteção de chamadas síncronas à base de dados (modo debug) ---
+
+    def _install_blocking_detector(self):
+        """
+        Envolve a abertura de ligações no próprio psycopg2 (psycopg2.connect e ThreadedConnectionPool.getconn):
+        qualquer acesso à base de dados, seja por database.py, pelas pools do repository.py ou pelas ligações
+        dedicadas de coordination.py, passa por um deles, por isso uma chamada feita diretamente no event loop
+        (sem asyncio.to_thread) é registada, mesmo que o módulo tenha importado a função com "from ... import".
+        """
+        targets = ((psycopg2, 'connect'), (psycopg2.pool.ThreadedConnectionPool, 'getconn'))
+        for owner, name in targets:
+            original = getattr(owner, name)
+            if getattr(original, '_watchdog_wrapped', False):
+                continue
+            setattr(owner, name, self._wrap_connection_factory(original))
+
+    def _wrap_connection_factory(self, original):
+        # Uma pool que abre uma ligação nova chama psycopg2.connect dentro do getconn: regista só a chamada exterior
+        def wrapper(*args, **kwargs):
+            nested = getattr(self._factory_state, 'active', False)
+            if threading.get_ident() == self._loop_thread_id and not nested:
+                self._record_blocking_call()
+            self._factory_state.active = True
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self._factory_state.active = nested
+
+        wrapper._watchdog_wrapped = True
+        return wrapper
+
+    def _record_blocking_call(self):
+        stack = traceback.extract_stack()[:-2]
+        # A função de acesso à base de dados chamada e o código que a chamou (o primeiro frame fora desses módulos)
+        db_function = next((f.name for f in reversed(stack) if f.filename.endswith(DB_MODULES)), '?')
+        caller = next((f for f in reversed(stack) if not f.filename.endswith(DB_MODULES + ('contextlib.py',))), None)
+        site = f"{db_function} <- {caller.filename.split('/')[-1]}:{caller.lineno} ({caller.name})" if caller else db_function
+        first_time = site not in self.blocking_calls
+        self.blocking_calls[site] += 1
+        if first_time:
+            print(log_message("WARNING", f"Chamada síncrona à base de dados no event loop: {site}\n{''.join(traceback.format_list(stack[-8:]))}", "🧱"))
+
+    # --- Endpoint /health ---
+
+    def health(self) -> dict:
+        stalled_for = max(0.0, time.monotonic() - self._last_beat - HEARTBEAT_INTERVAL)
+        data = {
+            'status': 'ok' if stalled_for < self.threshold else 'blocked',
+            'loop_lag': self.lag_stats(),
+            'stalls': self.stall_count,
+            'recent_stalls': list(self.recent_stalls)[-5:],
+            'debug': LOOP_DEBUG,
+            'blocking_db_calls': dict(self.blocking_calls.most_common(20)),
+        }
+        if self.health_status:
+            data.update(self.health_status())
+        return data
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        data = self.health()
+        return web.Response(
+            text=json.dumps(data, ensure_ascii=False, indent=2),
+            content_type='application/json',
+            status=200 if data['status'] == 'ok' else 503
+        )
+
+    async def start_health_server(self, port: int = HEALTH_PORT):
+        """Serve GET /health na porta indicada (não faz nada se a porta for 0)."""
+        if not port:
+            return
+        app = web.Application()
+        app.router.add_get('/health', self._handle_health)
+        self._health_runner = web.AppRunner(app, access_log=None)
+        await self._health_runner.setup()
+        await web.TCPSite(self._health_runner, '0.0.0.0', port).start()
+        print(log_message("INFO", f"Endpoint de saúde disponível em http://0.0.0.0:{port}/health", "🩺"))
+
+    async def stop_health_server(self):
+        if self._health_runner:
+            await self._health_runner.cleanup()
+            self._health_runner = None
+
+watchdog = LoopWatchdog()
@@ -1,14 +1,36 @@
+# O profiler é importado primeiro: o relatório de arranque mede a partir deste ponto
+from startup_profiler import startup_profiler
+
 import discord
 from discord.ext import commands
-import os
+from discord import app_commands
+import time
 import asyncio
+import importlib
+from pathlib import Path
 from datetime import datetime
 
 # Importa configurações
-from config import TOKEN, ROLE_ID
+from config import TOKEN, SHARD_COUNT, LEAN_MODE, SLASH_ONLY_MODE
 
 # Setup da base de dados e função para limpar a tabela de picagem
 from database import setup_database, clear_punches_table
+from punch_journal import sync_open_punches
+# Cache das configurações por servidor
+from guild_config import load_guild_configs, member_has_guild_role
+# Perfil de execução (intents e cache de membros)
+from runtime_profile import build_intents, build_member_cache_flags, enabled_intent_names
+# Watchdog do event loop (lag, bloqueios e endpoint /health)
+from loop_watchdog import watchdog
+from repository import close_pool
+# Fila de saída para o Discord (pedidos por prioridade)
+from outbound import outbound, Priority
+# Recarregamento a quente do config.py e dos cogs (!reload)
+from hot_reload import reload_config, reload_extensions
+# Tracing por interação (spans exportados para ficheiro, se TRACING_ENABLED)
+from tracing import tracer
+
+startup_profiler.mark("imports:main", startup_profiler.started_at)
 
 # Função auxiliar para formatar logs
 def log_message(level: str, message: str, emoji: str = "") -> str:
@@ -16,18 +38,135 @@ def log_message(level: str, message: str, emoji: str = "") -> str:
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
 
+# Pasta dos cogs, resolvida a partir deste arquivo (não depende do diretório de trabalho atual)
+COGS_FOLDER = Path(__file__).resolve().parent / 'cogs'
+
+def discover_extensions() -> list[str]:
+    """Lista os módulos de cogs (cogs.<nome>) existentes na pasta de cogs."""
+    return sorted(
+        f"cogs.{path.stem}" for path in COGS_FOLDER.glob('*.py')
+        if not path.name.startswith('__')
+    )
+
+# Módulos partilhados pelos cogs que main.py ainda não importou. São aquecidos em threads durante a
+# inicialização da base de dados; os próprios módulos dos cogs não, porque o load_extension do discord.py
+# executa-os sempre de novo (find_spec / exec_module) e o trabalho seria deitado fora.
+SHARED_COG_MODULES = ('discord.ext.tasks', 'leaderboard', 'ticket_archive', 'duty_coverage')
+
+def initialize_database():
+    """Cria/migra as tabelas e carrega a cache de configurações por servidor (chamada bloqueante)."""
+    setup_database()
+    print(log_message("INFO", "Base de dados configurada", "📦"))
+    load_guild_configs()
+
+class LSPDBot(commands.AutoShardedBot):
+    async def setup_hook(self):
+        """
+        Pipeline de arranque, executado antes de ligar ao gateway:
+        imports dos módulos partilhados em paralelo com a inicialização da base de dados, depois o setup dos cogs
+        (em paralelo) e a sincronização dos comandos de aplicação.
+        """
+        # O watchdog arranca primeiro, para apanhar bloqueios do próprio arranque
+        watchdog.start(asyncio.get_running_loop())
+        watchdog.health_status = lambda: {'gateway_ready': self.is_ready(), 'latency_ms': round(self.latency * 1000, 1) if self.is_ready() else None}
+        try:
+            await watchdog.start_health_server()
+        except Exception as e:
+            print(log_message("ERROR", f"Falha ao iniciar o endpoint de saúde: {e}", "❌"))
+        tracer.install(self)
+
+        extensions = discover_extensions()
+        if not extensions:
+            print(log_message("WARNING", f"Nenhum cog encontrado em '{COGS_FOLDER}'. Verifique a estrutura do projeto", "⚠️"))
+
+        async def timed(name: str, func, *args):
+            with startup_profiler.phase(name):
+                return await asyncio.to_thread(func, *args)
+
+        # Os imports dos módulos partilhados aquecem a cache de módulos em threads,
+        # enquanto a base de dados é inicializada noutra thread.
+        print(log_message("INFO", "Iniciando carregamento de cogs...", "🔄"))
+        import_results = await asyncio.gather(
+            timed("db_init", initialize_database),
+            *(timed(f"imports:{name}", importlib.import_module, name) for name in SHARED_COG_MODULES),
+            return_exceptions=True
+        )
+        if isinstance(import_results[0], Exception):
+            # Sem base de dados não há cogs: o bot não chega a ligar ao gateway
+            print(log_message("ERROR", f"Falha ao configurar base de dados: {import_results[0]}", "❌"))
+            raise RuntimeError("Falha ao configurar base de dados") from import_results[0]
+        for name, result in zip(SHARED_COG_MODULES, import_results[1:]):
+            if isinstance(result, Exception):
+                # O erro volta a aparecer ao carregar o cog que usa o módulo
+                print(log_message("WARNING", f"Erro ao importar módulo {name}: {result}", "⚠️"))
+
+        # O setup dos cogs corre no event loop; os que esperam por I/O no cog_load avançam em paralelo.
+        async def load(name: str):
+            try:
+                with startup_profiler.phase(f"cog_setup:{name}"):
+                    await self.load_extension(name)
+                print(log_message("INFO", f"Cog {name.split('.')[-1]} carregado", "✅"))
+            except Exception as e:
+                print(log_message("ERROR", f"Erro ao carregar cog {name.split('.')[-1]}: {e}", "❌"))
+
+        await asyncio.gather(*(load(name) for name in extensions))
+        print(log_message("INFO", "Todos os cogs foram carregados", "🚀"))
+        print("-" * 50)
+
+        # Sincronização de slash commands (comente após a primeira sincronização bem-sucedida)
+        try:
+            with startup_profiler.phase("tree_sync"):
+                await self.tree.sync()
+            print(log_message("INFO", "Comandos de aplicação (slash commands) sincronizados com o Discord", "🔄"))
+        except Exception as e:
+            print(log_message("ERROR", f"Falha ao sincronizar comandos de aplicação: {e}", "❌"))
+
+        self.gateway_connect_started_at = time.perf_counter()
+
+    async def close(self):
+        await watchdog.stop_health_server()
+        watchdog.stop()
+        await outbound.stop()
+        await super().close()
+        close_pool()
+        tracer.close()
+
+    async def invoke(self, ctx: commands.Context, /):
+        # Os comandos de prefixo abrem o seu próprio trace (as interações são instrumentadas em tracer.install)
+        name = ctx.command.qualified_name if ctx.command else ctx.invoked_with
+        attributes = {
+            'discord.guild.id': ctx.guild.id if ctx.guild else None,
+            'discord.channel.id': ctx.channel.id,
+            'discord.user.id': ctx.author.id,
+        }
+        with tracer.root_span(f"!{name}", attributes):
+            await super().invoke(ctx)
+
+    async def on_message(self, message: discord.Message):
+        # No modo só slash (SLASH_ONLY_MODE) as mensagens não passam pelo parser de comandos de prefixo
+        if SLASH_ONLY_MODE:
+            return
+        await self.process_commands(message)
+
 # Intents - Certifique-se de que estas estão ativadas no Discord Developer Portal!
-intents = discord.Intents.default()
-intents.members = True
-intents.message_content = True
-intents.reactions = True
-intents.presences = True
+# No modo lean (LEAN_MODE), só as intents de que os cogs precisam, sem cache de membros nem chunking.
+# No modo só slash (SLASH_ONLY_MODE), sem message_content: os comandos ficam disponíveis apenas como comandos de barra.
+intents = build_intents(discover_extensions())
+modes = ", ".join(mode for mode, enabled in (("modo lean", LEAN_MODE), ("só slash", SLASH_ONLY_MODE)) if enabled)
+print(log_message("INFO", f"Intents ativas{f' ({modes})' if modes else ''}: {', '.join(enabled_intent_names(intents))}", "🧭"))
 
-# Bot com prefixo "!"
-bot = commands.Bot(command_prefix='!', intents=intents)
+# Bot com prefixo "!" e sharding automático (vários servidores/departamentos no mesmo processo)
+bot = LSPDBot(
+    command_prefix='!',
+    intents=intents,
+    shard_count=SHARD_COUNT,
+    member_cache_flags=build_member_cache_flags(intents),
+    chunk_guilds_at_startup=not LEAN_MODE
+)
 
+# Os comandos são híbridos: funcionam com o prefixo "!" e como comandos de barra (/).
 # --- COMANDO: !mascote ---
-@bot.command(name="mascote", help="Exibe a mascote atual da LSPD.")
+@bot.hybrid_command(name="mascote", help="Exibe a mascote atual da LSPD.")
 async def hello(ctx):
     """Exibe a mascote atual da LSPD, restrito a membros com o cargo especificado."""
     if not isinstance(ctx.author, discord.Member):
@@ -35,8 +174,7 @@ async def hello(ctx):
         print(log_message("WARNING", f"Comando !mascote usado fora de servidor por {ctx.author}"))
         return
 
-    role = discord.utils.get(ctx.author.roles, id=ROLE_ID)
-    if role is None:
+    if not member_has_guild_role(ctx.author):
         await ctx.send("🚫 Não tens permissões para isso.", ephemeral=True)
         print(log_message("WARNING", f"Comando !mascote negado para {ctx.author.display_name} ({ctx.author.id}): sem cargo necessário"))
     else:
@@ -44,8 +182,10 @@ async def hello(ctx):
         print(log_message("INFO", f"Comando !mascote executado por {ctx.author.display_name} ({ctx.author.id})", "🐶"))
 
 # --- COMANDO: !clear ---
-@bot.command(name="clear", help="Limpa um número especificado de mensagens no canal. Uso: !clear <quantidade>")
+@bot.hybrid_command(name="clear", description="Limpa um número especificado de mensagens no canal.", help="Limpa um número especificado de mensagens no canal. Uso: !clear <quantidade>")
 @commands.has_permissions(manage_messages=True)
+@app_commands.default_permissions(manage_messages=True)
+@app_commands.describe(amount="Número de mensagens a limpar")
 async def clear_messages(ctx, amount: int):
     """
     Limpa um número especificado de mensagens no canal onde o comando foi invocado.
@@ -64,9 +204,12 @@ async def clear_messages(ctx, amount: int):
     await ctx.defer(ephemeral=True)
 
     try:
-        deleted = await ctx.channel.purge(limit=amount + 1)  # +1 para incluir a mensagem do comando
-        await ctx.send(f"✅ Foram limpas {len(deleted) - 1} mensagens.", ephemeral=True)
-        print(log_message("INFO", f"Comando !clear executado por {ctx.author.display_name} ({ctx.author.id}). Limpou {len(deleted) - 1} mensagens no canal {ctx.channel.name}", "🧹"))
+        # Com prefixo, +1 para incluir a mensagem do comando (um comando de barra não deixa mensagem no canal)
+        command_messages = 0 if ctx.interaction else 1
+        deleted = await outbound.submit(ctx.channel.id, lambda: ctx.channel.purge(limit=amount + command_messages), priority=Priority.BULK)
+        cleared = len(deleted) - command_messages
+        await ctx.send(f"✅ Foram limpas {cleared} mensagens.", ephemeral=True)
+        print(log_message("INFO", f"Comando !clear executado por {ctx.author.display_name} ({ctx.author.id}). Limpou {cleared} mensagens no canal {ctx.channel.name}", "🧹"))
     except discord.Forbidden:
         await ctx.send("❌ Não tenho permissão para gerenciar mensagens neste canal. Verifique as minhas permissões.", ephemeral=True)
         print(log_message("ERROR", f"Permissão negada ao limpar mensagens no canal {ctx.channel.name} por {ctx.author.display_name} ({ctx.author.id})", "🚫"))
@@ -78,8 +221,9 @@ async def clear_messages(ctx, amount: int):
         print(log_message("ERROR", f"Erro inesperado ao limpar mensagens por {ctx.author.display_name} ({ctx.author.id}): {e}", "❌"))
 
 # --- COMANDO: !clearpunchdb ---
-@bot.command(name="clearpunchdb", help="Limpa todos os registos da base de dados de picagem de ponto.")
+@bot.hybrid_command(name="clearpunchdb", help="Limpa todos os registos da base de dados de picagem de ponto.")
 @commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
 async def clear_punch_db_command(ctx):
     """
     Limpa todos os registos da tabela 'punches' na base de dados.
@@ -93,8 +237,10 @@ async def clear_punch_db_command(ctx):
     await ctx.defer(ephemeral=True)
 
     try:
-        success = clear_punches_table()
+        success = await asyncio.to_thread(clear_punches_table)
         if success:
+            # Limpa também o estado local de utilizadores em serviço
+            await asyncio.to_thread(sync_open_punches)
             await ctx.send("✅ Todos os registos da base de dados de picagem de ponto foram limpos com sucesso!", ephemeral=True)
             print(log_message("INFO", f"Comando !clearpunchdb executado por {ctx.author.display_name} ({ctx.author.id}). Registos de picagem limpos", "🗑️"))
         else:
@@ -104,43 +250,60 @@ async def clear_punch_db_command(ctx):
         await ctx.send(f"❌ Ocorreu um erro inesperado ao limpar a base de dados: {e}", ephemeral=True)
         print(log_message("ERROR", f"Erro inesperado ao limpar registos de picagem por {ctx.author.display_name} ({ctx.author.id}): {e}", "❌"))
 
-# --- Evento on_ready ---
-@bot.event
-async def on_ready():
-    print(log_message("INFO", f"Bot conectado como {bot.user.name} ({bot.user.id})", "✅"))
-    
-    # Configura base de dados
+# --- COMANDO: !reload ---
+@bot.hybrid_command(name="reload", help="Relê o config.py e recarrega cogs sem desligar o bot. Uso: !reload [cogs... | all]")
+@commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(cogs="Nomes dos cogs a recarregar, separados por espaços, ou 'all' (vazio: só o config.py)")
+async def reload_command(ctx, *, cogs: str = ""):
+    """
+    Relê o config.py e recarrega os cogs indicados no mesmo processo, sem nova ligação ao gateway.
+    Requer permissão de 'Administrador'.
+    """
+    await ctx.defer(ephemeral=True)
+
+    loaded = sorted(bot.extensions)
+    requested = cogs.split()
+    if requested == ['all']:
+        names = loaded
+    else:
+        names = [name if name.startswith('cogs.') else f"cogs.{name}" for name in requested]
+        unknown = [name for name in names if name not in loaded]
+        if unknown:
+            available = ", ".join(f"`{name.removeprefix('cogs.')}`" for name in loaded)
+            await ctx.send(f"Cog(s) desconhecido(s): {', '.join(f'`{name}`' for name in unknown)}. Carregados: {available}", ephemeral=True)
+            return
+
     try:
-        setup_database()
-        print(log_message("INFO", "Base de dados configurada", "📦"))
+        changed = await asyncio.to_thread(reload_config)
     except Exception as e:
-        print(log_message("ERROR", f"Falha ao configurar base de dados: {e}", "❌"))
-        return
-
-    # Carrega cogs
-    cogs_folder = './cogs'
-    if not os.path.exists(cogs_folder):
-        print(log_message("WARNING", f"Pasta '{cogs_folder}' não encontrada. Verifique a estrutura do projeto", "⚠️"))
+        # Erro no config.py (por exemplo, de sintaxe): o bot continua com a configuração anterior
+        await ctx.send(f"❌ Erro ao recarregar o config.py, nada foi alterado: {e}", ephemeral=True)
+        print(log_message("ERROR", f"Erro ao recarregar config.py por {ctx.author.display_name} ({ctx.author.id}): {e}", "❌"))
         return
 
-    print(log_message("INFO", "Iniciando carregamento de cogs...", "🔄"))
-    for filename in os.listdir(cogs_folder):
-        if filename.endswith('.py') and not filename.startswith('__'):
-            try:
-                await bot.load_extension(f'cogs.{filename[:-3]}')
-                print(log_message("INFO", f"Cog {filename[:-3]} carregado", "✅"))
-            except Exception as e:
-                print(log_message("ERROR", f"Erro ao carregar cog {filename[:-3]}: {e}", "❌"))
+    reloaded, failed, synced = await reload_extensions(bot, names)
+    lines = [f"✅ config.py relido ({len(changed)} valor(es) alterado(s){': ' + ', '.join(f'`{name}`' for name in changed) if changed else ''})."]
+    if reloaded:
+        lines.append("🔁 Cogs recarregados: " + ", ".join(f"`{name.removeprefix('cogs.')}`" for name in reloaded))
+    for name, error in failed.items():
+        lines.append(f"❌ `{name.removeprefix('cogs.')}` falhou e manteve a versão anterior: {error}")
+    if synced:
+        lines.append("🔄 Comandos de barra sincronizados com o Discord.")
+    await ctx.send("\n".join(lines)[:2000], ephemeral=True)
+    print(log_message("INFO", f"Comando !reload executado por {ctx.author.display_name} ({ctx.author.id}): {len(reloaded)} cog(s) recarregado(s), {len(failed)} falha(s)", "🔁"))
 
-    print(log_message("INFO", "Todos os cogs foram carregados", "🚀"))
-    print("-" * 50)
+# --- Evento on_ready ---
+@bot.event
+async def on_ready():
+    print(log_message("INFO", f"Bot conectado como {bot.user.name} ({bot.user.id}) em {len(bot.guilds)} servidor(es), {bot.shard_count} shard(s)", "✅"))
 
-    # Sincronização de slash commands (comente após a primeira sincronização bem-sucedida)
-    try:
-        await bot.tree.sync()
-        print(log_message("INFO", "Comandos de aplicação (slash commands) sincronizados com o Discord", "🔄"))
-    except Exception as e:
-        print(log_message("ERROR", f"Falha ao sincronizar comandos de aplicação: {e}", "❌"))
+    # Relatório de tempos de arranque, apenas no primeiro on_ready (as reconexões não contam)
+    if not startup_profiler.reported:
+        if getattr(bot, 'gateway_connect_started_at', None):
+            startup_profiler.mark("gateway_connect", bot.gateway_connect_started_at)
+        await startup_profiler.wait_until_settled()
+        print(log_message("INFO", startup_profiler.report(), "⏱️"))
 
 # --- Executa o bot ---
 if __name__ == '__main__':
@@ -0,0 +1,245 @@
+import asyncio
+import time
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+from enum import IntEnum
+
+from config import OUTBOUND_WORKERS, OUTBOUND_GLOBAL_RATE, OUTBOUND_BACKGROUND_SHARE
+from tracing import tracer
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+# --- Fila de saída para o Discord ---
+# Os cogs não chamam channel.send / message.edit / channel.delete diretamente: entregam o pedido ao despachante,
+# que o executa por ordem de prioridade. Cada canal tem no máximo um pedido em curso e uma janela de ritmo própria;
+# as prioridades baixas (operações em massa, logs, transcritos) só usam parte do ritmo global, deixando margem
+# para o que o utilizador está à espera. As respostas às interações (interaction.response / followup) não passam
+# por aqui: usam o token da interação, com limites próprios, e têm de responder em 3 segundos.
+#
+# Pedidos pendentes do mesmo tipo são juntados: logs de texto para o mesmo canal seguem numa só mensagem
+# e edições pendentes da mesma mensagem são fundidas numa única edição.
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # Mensagens que o utilizador está à espera de ver depois de um clique ou comando
+    NORMAL = 1       # Painéis e mensagens de estado
+    BULK = 2         # Operações em massa (limpar mensagens, apagar tickets)
+    LOG = 3          # Logs e transcritos
+
+# Limite por canal do Discord para mensagens: 5 pedidos em 5 segundos
+CHANNEL_WINDOW_LIMIT = 5
+CHANNEL_WINDOW_SECONDS = 5.0
+MAX_MESSAGE_LENGTH = 2000
+
+class _Job:
+    __slots__ = ('priority', 'bucket', 'kind', 'target', 'call', 'texts', 'kwargs', 'futures', 'trace_parent', 'enqueued_at')
+
+    def __init__(self, priority: Priority, bucket: int, kind: str, target=None, call=None, kwargs: dict | None = None):
+        self.priority = priority
+        self.bucket = bucket
+        self.kind = kind  # 'text' (envio de texto juntável), 'edit' (edição fundível) ou 'call' (qualquer outro pedido)
+        self.target = target
+        self.call = call
+        self.texts: list[str] = []
+        self.kwargs = kwargs or {}
+        self.futures: list[asyncio.Future] = []
+        # O span de quem pediu o envio: o pedido aparece no trace da interação, mesmo executado por um worker
+        self.trace_parent = tracer.current_span()
+        self.enqueued_at = time.monotonic()
+
+    async def run(self):
+        attributes = {'outbound.priority': self.priority.name, 'outbound.queue_wait_ms': round((time.monotonic() - self.enqueued_at) * 1000, 1)}
+        with tracer.attach(self.trace_parent), tracer.span(f"outbound {self.kind}", attributes):
+            if self.kind == 'text':
+                return await self.target.send("\n".join(self.texts), **self.kwargs)
+            if self.kind == 'edit':
+                return await self.target.edit(**self.kwargs)
+            return await self.call()
+
+class OutboundDispatcher:
+    def __init__(self, workers: int = OUTBOUND_WORKERS, global_rate: int = OUTBOUND_GLOBAL_RATE):
+        self.worker_count = workers
+        self.global_rate = global_rate
+        self.background_rate = max(1, int(global_rate * OUTBOUND_BACKGROUND_SHARE))
+        # Uma fila por prioridade: {bucket (ID do canal): deque de pedidos}, percorrida em round-robin entre canais
+        self._lanes: dict[Priority, OrderedDict[int, deque[_Job]]] = {priority: OrderedDict() for priority in Priority}
+        self._busy: set[int] = set()  # Canais com um pedido em curso
+        self._channel_windows: dict[int, deque[float]] = {}
+        self._global_window: deque[float] = deque()
+        self._pending_edits: dict[int, _Job] = {}  # ID da mensagem -> edição ainda por executar
+        self._wakeup: asyncio.Event | None = None
+        self._workers: list[asyncio.Task] = []
+        self.stats: Counter = Counter()  # Pedidos executados, juntados e falhados
+
+    # --- API para os cogs ---
+
+    def send(self, channel, content: str | None = None, *, priority: Priority = Priority.NORMAL, coalesce: bool = False, **kwargs) -> asyncio.Future:
+        """
+        Envia uma mensagem. Com coalesce=True, um texto simples (sem embeds, ficheiros nem Views) é juntado
+        a um envio de texto ainda pendente para o mesmo canal, se couber numa mensagem.
+        Retorna um Future com a mensagem enviada (pode ser ignorado: os erros são registados no log).
+        """
+        if coalesce and content and not kwargs:
+            for job in self._lanes[priority].get(channel.id, ()):
+                if job.kind == 'text' and sum(len(text) + 1 for text in job.texts) + len(content) <= MAX_MESSAGE_LENGTH:
+                    job.texts.append(content)
+                    self.stats['coalesced'] += 1
+                    return self._attach_future(job)
+            job = _Job(priority, channel.id, 'text', target=channel)
+            job.texts.append(content)
+            return self._enqueue(job)
+        return self.submit(channel.id, lambda: channel.send(content, **kwargs), priority=priority)
+
+    def edit(self, message, *, priority: Priority = Priority.NORMAL, **kwargs) -> asyncio.Future:
+        """Edita uma mensagem. Uma edição ainda pendente da mesma mensagem é fundida com esta (os campos novos prevalecem)."""
+        pending = self._pending_edits.get(message.id)
+        if pending is not None:
+            pending.kwargs.update(kwargs)
+            if priority < pending.priority:
+                # A edição fundida passa para a prioridade mais alta dos pedidos juntados
+                jobs = self._lanes[pending.priority][pending.bucket]
+                jobs.remove(pending)
+                if not jobs:
+                    del self._lanes[pending.priority][pending.bucket]
+                pending.priority = priority
+                self._lanes[priority].setdefault(pending.bucket, deque()).append(pending)
+            self.stats['coalesced'] += 1
+            return self._attach_future(pending)
+        job = _Job(priority, message.channel.id, 'edit', target=message, kwargs=kwargs)
+        self._pending_edits[message.id] = job
+        return self._enqueue(job)
+
+    def delete(self, target, *, priority: Priority = Priority.BULK, reason: str | None = None) -> asyncio.Future:
+        """Apaga um canal ou uma mensagem."""
+        bucket = target.channel.id if hasattr(target, 'channel') else target.id
+        if reason is not None:
+            return self.submit(bucket, lambda: target.delete(reason=reason), priority=priority)
+        return self.submit(bucket, target.delete, priority=priority)
+
+    def submit(self, bucket: int, call, *, priority: Priority = Priority.NORMAL) -> asyncio.Future:
+        """Executa um pedido qualquer (call() retorna a corrotina) no bucket indicado, normalmente o ID do canal."""
+        return self._enqueue(_Job(priority, bucket, 'call', call=call))
+
+    def pending(self) -> dict[str, int]:
+        """Pedidos à espera em cada prioridade."""
+        return {priority.name.lower(): sum(len(jobs) for jobs in self._lanes[priority].values()) for priority in Priority}
+
+    # --- Fila ---
+
+    def _attach_future(self, job: _Job) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        # O erro já é registado pelo despachante; evita o aviso "exception was never retrieved" em envios sem await
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        job.futures.append(future)
+        return future
+
+    def _enqueue(self, job: _Job) -> asyncio.Future:
+        self._ensure_started()
+        self._lanes[job.priority].setdefault(job.bucket, deque()).append(job)
+        self._wakeup.set()
+        return self._attach_future(job)
+
+    def _ensure_started(self):
+        if self._workers:
+            return
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker(), name=f"outbound-{i}") for i in range(self.worker_count)]
+
+    async def stop(self):
+        """Para os workers e cancela os pedidos pendentes (no encerramento do bot)."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for lane in self._lanes.values():
+            for jobs in lane.values():
+                for job in jobs:
+                    for future in job.futures:
+                        future.cancel()
+            lane.clear()
+        self._pending_edits.clear()
+
+    @staticmethod
+    def _trim(window: deque[float], now: float, span: float):
+        while window and now - window[0] >= span:
+            window.popleft()
+
+    def _wait_time(self, priority: Priority, bucket: int, now: float) -> float:
+        """Segundos até o pedido poder ser executado (0 se pode ser já)."""
+        rate = self.global_rate if priority <= Priority.NORMAL else self.background_rate
+        self._trim(self._global_window, now, 1.0)
+        wait = 0.0
+        if len(self._global_window) >= rate:
+            wait = 1.0 - (now - self._global_window[-rate])
+        window = self._channel_windows.get(bucket)
+        if window:
+            self._trim(window, now, CHANNEL_WINDOW_SECONDS)
+            if len(window) >= CHANNEL_WINDOW_LIMIT:
+                wait = max(wait, CHANNEL_WINDOW_SECONDS - (now - window[-CHANNEL_WINDOW_LIMIT]))
+            elif not window:
+                del self._channel_windows[bucket]
+        return wait
+
+    def _next_job(self) -> tuple[_Job | None, float | None]:
+        """Escolhe o próximo pedido: a prioridade mais alta com um canal livre. Sem nenhum, retorna o tempo de espera."""
+        now = time.monotonic()
+        earliest = None
+        for priority in Priority:
+            lane = self._lanes[priority]
+            for bucket in list(lane):
+                if bucket in self._busy:
+                    continue
+                wait = self._wait_time(priority, bucket, now)
+                if wait > 0:
+                    earliest = wait if earliest is None else min(earliest, wait)
+                    continue
+                jobs = lane[bucket]
+                job = jobs.popleft()
+                if jobs:
+                    lane.move_to_end(bucket)
+                else:
+                    del lane[bucket]
+                if job.kind == 'edit':
+                    self._pending_edits.pop(job.target.id, None)
+                self._busy.add(bucket)
+                self._global_window.append(now)
+                self._channel_windows.setdefault(bucket, deque()).append(now)
+                return job, None
+        return None, earliest
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            job, wait = self._next_job()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # Outro worker pode ter pedidos para executar (esta escolha pode ter libertado o caminho)
+            self._wakeup.set()
+            try:
+                result = await job.run()
+            except asyncio.CancelledError:
+                for future in job.futures:
+                    future.cancel()
+                raise
+            except Exception as e:
+                self.stats['failed'] += 1
+                print(log_message("ERROR", f"Pedido ao Discord falhou (prioridade {job.priority.name}, canal {job.bucket}): {e}", "❌"))
+                for future in job.futures:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                self.stats[job.priority.name.lower()] += 1
+                for future in job.futures:
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                self._busy.discard(job.bucket)
+                self._wakeup.set()
+
+outbound = OutboundDispatcher()
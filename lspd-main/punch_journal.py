@@ -0,0 +1,218 @@
+import os
+import json
+import uuid
+import threading
+from datetime import datetime, timedelta, timezone
+
+from config import PUNCH_JOURNAL_FILE
+from repository import get_open_punches, apply_punch_in_entry, apply_punch_out_entry
+from coordination import register_invalidation_handler
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+# --- Journal local de picagens ---
+# Cada picagem é primeiro acrescentada a um arquivo JSONL (uma entrada por linha, com fsync) e confirmada
+# ao utilizador de imediato. Um replayer aplica depois as entradas no PostgreSQL, pela ordem em que foram
+# escritas, e retira-as do journal. Se a base de dados cair, as entradas acumulam-se e são aplicadas quando voltar.
+#
+# A decisão "já está em serviço?" usa o estado local de pontos abertos: o estado do PostgreSQL
+# mais as entradas do journal ainda por aplicar. Assim uma falha da base de dados nunca dá uma resposta errada.
+
+class PunchJournal:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: list[dict] = []
+
+    def load(self) -> int:
+        """Lê as entradas pendentes do arquivo (ignora uma última linha incompleta). Retorna quantas existem."""
+        with self._lock:
+            self._pending = []
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            self._pending.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            # Escrita interrompida a meio (por exemplo, o processo morreu antes do fsync)
+                            print(log_message("WARNING", f"Linha inválida ignorada no journal {self.path}", "⚠️"))
+            except FileNotFoundError:
+                pass
+            return len(self._pending)
+
+    def append(self, entry: dict):
+        """Acrescenta a entrada ao arquivo e só retorna depois do fsync (a entrada sobrevive a um crash)."""
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending.append(entry)
+
+    def pending(self) -> list[dict]:
+        """Retorna uma cópia das entradas ainda por aplicar, pela ordem de escrita."""
+        with self._lock:
+            return list(self._pending)
+
+    def discard(self, entry_ids: set[str]):
+        """Retira do journal as entradas já aplicadas, reescrevendo o arquivo de forma atómica."""
+        if not entry_ids:
+            return
+        with self._lock:
+            self._pending = [entry for entry in self._pending if entry['id'] not in entry_ids]
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in self._pending:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+journal = PunchJournal(PUNCH_JOURNAL_FILE)
+
+# Estado local dos pontos abertos: {(user_id, guild_id): punch_in_time}
+_open_punches: dict[tuple[int, int | None], datetime] = {}
+_state_lock = threading.Lock()
+_state_synced = False
+
+def _overlay_pending(state: dict, entries: list[dict]):
+    """Aplica as entradas (por ordem) sobre um estado de pontos abertos."""
+    for entry in entries:
+        key = (entry['user_id'], entry['guild_id'])
+        if entry['op'] == 'in':
+            state.setdefault(key, datetime.fromisoformat(entry['ts']))
+        else:
+            state.pop(key, None)
+
+def sync_open_punches() -> bool:
+    """
+    Reconstrói o estado local a partir do PostgreSQL e das entradas pendentes do journal.
+    Retorna False (mantendo o estado atual) se a base de dados estiver inacessível. Chamada bloqueante.
+    """
+    global _state_synced
+    with _state_lock:
+        # O snapshot das pendentes é tirado antes da leitura da base de dados: uma entrada aplicada entretanto
+        # aparece nas duas, e reaplicá-la por ordem sobre o estado da base de dados dá o mesmo resultado.
+        pending = journal.pending()
+        try:
+            state = get_open_punches()
+        except Exception as e:
+            print(log_message("ERROR", f"Não foi possível sincronizar os pontos abertos com o PostgreSQL: {e}", "❌"))
+            if not _state_synced:
+                # Sem base de dados no arranque: o estado vem só do journal
+                _open_punches.clear()
+                _overlay_pending(_open_punches, pending)
+            return False
+        _overlay_pending(state, pending)
+        _open_punches.clear()
+        _open_punches.update(state)
+        _state_synced = True
+        return True
+
+def initialize() -> int:
+    """Carrega o journal e sincroniza o estado local. Retorna o número de entradas pendentes. Chamada bloqueante."""
+    pending_count = journal.load()
+    if pending_count:
+        print(log_message("WARNING", f"{pending_count} picagem(ns) pendente(s) no journal serão reaplicadas", "📒"))
+    sync_open_punches()
+    return pending_count
+
+def punch_in(user_id: int, username: str, guild_id: int | None) -> bool:
+    """
+    Regista a entrada em serviço no journal e confirma de imediato.
+    Retorna True se a entrada foi registada, False se o utilizador já estava em serviço. Chamada bloqueante (fsync).
+    """
+    key = (user_id, guild_id)
+    with _state_lock:
+        if key in _open_punches:
+            return False
+        now = datetime.now(timezone.utc)
+        journal.append({
+            'id': uuid.uuid4().hex, 'op': 'in', 'user_id': user_id, 'username': username,
+            'guild_id': guild_id, 'ts': now.isoformat()
+        })
+        _open_punches[key] = now
+    return True
+
+def punch_out(user_id: int, guild_id: int | None) -> tuple[bool, timedelta | None, str | None]:
+    """
+    Regista a saída de serviço no journal e confirma de imediato.
+    Retorna (True, duração, ID da sessão) se a saída foi registada, (False, None, None) se o utilizador não estava
+    em serviço. O ID da sessão é o ID da entrada no journal (punch_out_journal_id na base de dados).
+    Chamada bloqueante (fsync).
+    """
+    key = (user_id, guild_id)
+    with _state_lock:
+        punch_in_time = _open_punches.get(key)
+        if punch_in_time is None:
+            return False, None, None
+        now = datetime.now(timezone.utc)
+        entry_id = uuid.uuid4().hex
+        journal.append({
+            'id': entry_id, 'op': 'out', 'user_id': user_id, 'username': None,
+            'guild_id': guild_id, 'ts': now.isoformat()
+        })
+        del _open_punches[key]
+    return True, now - punch_in_time, entry_id
+
+def replay_pending() -> tuple[int, int]:
+    """
+    Aplica no PostgreSQL as entradas pendentes, por ordem, parando na primeira falha de ligação
+    (para não aplicar uma saída antes da entrada correspondente). As duplicadas são descartadas.
+    Retorna (aplicadas, ainda pendentes). Chamada bloqueante.
+    """
+    entries = journal.pending()
+    if not entries:
+        if not _state_synced:
+            sync_open_punches()
+        return 0, 0
+
+    done = set()
+    skipped = 0
+    for entry in entries:
+        params = {**entry, 'ts': datetime.fromisoformat(entry['ts'])}
+        try:
+            applied = apply_punch_in_entry(params) if entry['op'] == 'in' else apply_punch_out_entry(params)
+        except Exception as e:
+            print(log_message("ERROR", f"Falha ao reaplicar picagem {entry['id']}, nova tentativa mais tarde: {e}", "❌"))
+            break
+        if not applied:
+            skipped += 1
+        done.add(entry['id'])
+
+    journal.discard(done)
+    if skipped:
+        print(log_message("INFO", f"{skipped} picagem(ns) duplicada(s) ignorada(s) na reaplicação do journal", "📒"))
+    if done and not _state_synced:
+        # A base de dados voltou depois de um arranque sem ligação: alinha o estado local
+        sync_open_punches()
+    return len(done), len(entries) - len(done)
+
+def pending_count() -> int:
+    return len(journal.pending())
+
+def _on_punches_invalidated(payload: dict):
+    """
+    Outra instância escreveu picagens. Uma entrada ou saída atualiza o estado local diretamente (as entradas
+    pendentes deste journal para o mesmo utilizador continuam a prevalecer); o resto volta a sincronizar tudo.
+    """
+    op = payload.get('op')
+    if op not in ('in', 'out'):
+        sync_open_punches()
+        return
+    key = (payload['user_id'], payload.get('guild_id'))
+    with _state_lock:
+        if op == 'in':
+            _open_punches[key] = datetime.fromisoformat(payload['punch_in_time'])
+        else:
+            _open_punches.pop(key, None)
+        _overlay_pending(_open_punches, [entry for entry in journal.pending() if (entry['user_id'], entry['guild_id']) == key])
+
+register_invalidation_handler('punches', _on_punches_invalidated)
@@ -0,0 +1,491 @@
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import NamedTuple
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+from config import (
+    DB_POOL_MIN_CONNECTIONS, DB_POOL_MAX_CONNECTIONS, DB_READ_POOL_MAX_CONNECTIONS,
+    TICKET_MAX_OPEN_PER_USER, TICKET_RESERVATION_TIMEOUT_SECONDS
+)
+from database import (
+    publish_invalidation, read_replica_url, replica_down, replica_is_fresh, mark_replica_down, READ_ONLY_OPTIONS
+)
+from tracing import db_connect_kwargs
+
+# --- Repositório das consultas frequentes ---
+# As consultas do caminho quente (picagens, período de horas, tickets abertos) correm em ligações de um pool.
+# Cada ligação faz PREPARE de uma consulta na primeira vez que a usa e depois só envia EXECUTE com os parâmetros:
+# o PostgreSQL não volta a analisar nem a planear o SQL. Os resultados vêm como NamedTuple com datetimes nativos,
+# em vez de dicionários com datas em texto ISO que os cogs tinham de converter de volta.
+
+class PunchRecord(NamedTuple):
+    user_id: int
+    username: str
+    punch_in_time: datetime
+    punch_out_time: datetime
+
+class DutyTotal(NamedTuple):
+    user_id: int
+    username: str
+    total_seconds: float
+    sessions: int
+
+class IdleTicket(NamedTuple):
+    channel_id: int
+    guild_id: int | None
+    category: str
+    last_activity_at: datetime
+    inactivity_warned_at: datetime | None
+
+class TicketRecord(NamedTuple):
+    channel_id: int
+    creator_id: int
+    creator_name: str
+    category: str
+    created_at: datetime
+    guild_id: int | None
+
+# Consultas preparadas: nome -> (tipos dos parâmetros, SQL com $1..$n)
+STATEMENTS = {
+    'open_punches': ((), """
+        SELECT user_id, guild_id, punch_in_time FROM punches WHERE punch_out_time IS NULL ORDER BY id ASC
+    """),
+    'punch_in': (('bigint', 'text', 'timestamptz', 'bigint', 'text'), """
+        INSERT INTO punches (user_id, username, punch_in_time, guild_id, journal_id)
+        SELECT $1, $2, $3, $4, $5
+        WHERE NOT EXISTS (
+            SELECT 1 FROM punches
+            WHERE user_id = $1 AND guild_id IS NOT DISTINCT FROM $4 AND punch_out_time IS NULL
+        )
+        ON CONFLICT (journal_id) DO NOTHING
+    """),
+    'punch_out': (('bigint', 'bigint', 'timestamptz', 'text'), """
+        UPDATE punches SET punch_out_time = $3, punch_out_journal_id = $4
+        WHERE id = (
+            SELECT id FROM punches
+            WHERE user_id = $1 AND guild_id IS NOT DISTINCT FROM $2
+            AND punch_out_time IS NULL AND punch_in_time <= $3
+            ORDER BY id DESC LIMIT 1
+        )
+        AND NOT EXISTS (SELECT 1 FROM punches WHERE punch_out_journal_id = $4)
+        RETURNING username, punch_in_time
+    """),
+    'punches_for_period': (('timestamptz', 'timestamptz', 'bigint'), """
+        SELECT user_id, username, punch_in_time, punch_out_time
+        FROM punches
+        WHERE punch_in_time BETWEEN $1 AND $2
+        AND punch_out_time IS NOT NULL
+        AND ($3 IS NULL OR guild_id = $3 OR guild_id IS NULL)
+        ORDER BY punch_in_time ASC
+    """),
+    'open_tickets': (('bigint',), """
+        SELECT channel_id, creator_id, creator_name, category, created_at, guild_id
+        FROM tickets WHERE channel_id IS NOT NULL AND ($1 IS NULL OR guild_id = $1)
+    """),
+    'open_ticket': (('bigint',), """
+        SELECT channel_id, creator_id, creator_name, category, created_at, guild_id
+        FROM tickets WHERE channel_id = $1
+    """),
+    # Serializa as reservas do mesmo criador entre instâncias (o limite de tickets abrange várias categorias)
+    'lock_ticket_creator': (('bigint', 'bigint'), """
+        SELECT pg_advisory_xact_lock(hashtextextended('ticket:' || $1 || ':' || $2, 0))
+    """),
+    'discard_stale_reservations': (('bigint', 'bigint', 'interval'), """
+        DELETE FROM tickets
+        WHERE guild_id = $1 AND creator_id = $2 AND channel_id IS NULL AND created_at < NOW() - $3
+    """),
+    'creator_tickets': (('bigint', 'bigint'), """
+        SELECT category, channel_id FROM tickets WHERE guild_id = $1 AND creator_id = $2
+    """),
+    'reserve_ticket': (('bigint', 'bigint', 'text', 'text', 'timestamptz'), """
+        INSERT INTO tickets (guild_id, creator_id, creator_name, category, created_at, last_activity_at)
+        VALUES ($1, $2, $3, $4, $5, $5)
+        ON CONFLICT DO NOTHING
+        RETURNING ticket_id
+    """),
+    'attach_ticket_channel': (('integer', 'bigint'), """
+        UPDATE tickets SET channel_id = $2 WHERE ticket_id = $1 AND channel_id IS NULL
+    """),
+    # Uma mensagem nova também retira o aviso de inatividade
+    'touch_ticket_activity': (('bigint[]', 'timestamptz[]'), """
+        UPDATE tickets SET last_activity_at = GREATEST(tickets.last_activity_at, activity.at), inactivity_warned_at = NULL
+        FROM unnest($1, $2) AS activity(channel_id, at)
+        WHERE tickets.channel_id = activity.channel_id
+    """),
+    'idle_tickets': (('timestamptz',), """
+        SELECT channel_id, guild_id, category, last_activity_at, inactivity_warned_at
+        FROM tickets WHERE channel_id IS NOT NULL AND last_activity_at < $1
+        ORDER BY last_activity_at ASC
+    """),
+    'mark_ticket_warned': (('bigint', 'timestamptz'), """
+        UPDATE tickets SET inactivity_warned_at = $2 WHERE channel_id = $1
+    """),
+    'release_ticket_reservation': (('integer',), """
+        DELETE FROM tickets WHERE ticket_id = $1 RETURNING channel_id, guild_id
+    """),
+    'delete_ticket': (('bigint',), """
+        WITH removed AS (DELETE FROM tickets WHERE channel_id = $1)
+        DELETE FROM ticket_messages WHERE channel_id = $1
+    """),
+    'duty_totals_for_days': (('bigint', 'date', 'date'), """
+        SELECT user_id, (ARRAY_AGG(username ORDER BY day DESC))[1], SUM(total_seconds), SUM(sessions)::integer
+        FROM duty_daily_totals
+        WHERE guild_id IN ($1, 0) AND day >= $2 AND day < $3
+        GROUP BY user_id
+        ORDER BY 3 DESC
+    """),
+    'last_report_run': (('bigint', 'text'), """
+        SELECT MAX(period_start) FROM report_runs WHERE guild_id = $1 AND period = $2
+    """),
+    'claim_report_run': (('bigint', 'text', 'date', 'date'), """
+        INSERT INTO report_runs (guild_id, period, period_start, period_end) VALUES ($1, $2, $3, $4)
+        ON CONFLICT (guild_id, period, period_start) DO NOTHING
+    """),
+    'complete_report_run': (('bigint', 'text', 'date', 'bigint'), """
+        UPDATE report_runs SET completed_at = NOW(), message_id = $4
+        WHERE guild_id = $1 AND period = $2 AND period_start = $3
+    """),
+    'release_report_run': (('bigint', 'text', 'date'), """
+        DELETE FROM report_runs WHERE guild_id = $1 AND period = $2 AND period_start = $3 AND completed_at IS NULL
+    """),
+    'expire_report_claims': (('interval',), """
+        DELETE FROM report_runs WHERE completed_at IS NULL AND claimed_at < NOW() - $1
+    """),
+}
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Ligação que sabe que consultas já preparou (os PREPARE duram enquanto a sessão estiver aberta)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: set[str] = set()
+
+    def execute_prepared(self, cursor, name: str, params: tuple = ()):
+        if name not in self.prepared:
+            types, sql = STATEMENTS[name]
+            signature = f"({', '.join(types)})" if types else ""
+            cursor.execute(f"PREPARE {name}{signature} AS {sql}")
+            self.prepared.add(name)
+        placeholders = f"({', '.join(['%s'] * len(params))})" if params else ""
+        cursor.execute(f"EXECUTE {name}{placeholders}", params)
+
+_pool: psycopg2.pool.ThreadedConnectionPool | None = None
+_pool_lock = threading.Lock()
+# O ThreadedConnectionPool levanta PoolError quando esgota; o semáforo faz as threads esperarem por uma ligação livre.
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_CONNECTIONS)
+
+def _get_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            database_url = os.getenv('DATABASE_URL')
+            if not database_url:
+                raise ValueError("Variável de ambiente 'DATABASE_URL' não encontrada. Verifique as configurações do Railway.")
+            _pool = psycopg2.pool.ThreadedConnectionPool(
+                DB_POOL_MIN_CONNECTIONS, DB_POOL_MAX_CONNECTIONS, database_url,
+                connection_factory=PreparedConnection, **db_connect_kwargs()
+            )
+            print(f"DEBUG DB: Pool de ligações criado ({DB_POOL_MIN_CONNECTIONS}-{DB_POOL_MAX_CONNECTIONS} ligações).")
+        return _pool
+
+@contextmanager
+def connection():
+    """
+    Empresta uma ligação do pool, dentro de uma transação: commit no fim do bloco.
+    Numa exceção a ligação é fechada em vez de devolvida: pode ter caído, e um PREPARE feito numa transação
+    abortada deixaria o conjunto de consultas preparadas incerto. O pool abre outra, que volta a preparar.
+    Chamada bloqueante.
+    """
+    with _pool_slots:
+        pool = _get_pool()
+        conn = pool.getconn()
+        discard = True
+        try:
+            yield conn
+            conn.commit()
+            discard = False
+        finally:
+            pool.putconn(conn, close=discard or conn.closed != 0)
+
+# Pool da réplica de leitura (DATABASE_READ_URL), só para as consultas de relatório (ver database.py)
+_read_pool: psycopg2.pool.ThreadedConnectionPool | None = None
+_read_pool_slots = threading.BoundedSemaphore(DB_READ_POOL_MAX_CONNECTIONS)
+
+def _get_read_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    global _read_pool
+    with _pool_lock:
+        if _read_pool is None:
+            _read_pool = psycopg2.pool.ThreadedConnectionPool(
+                0, DB_READ_POOL_MAX_CONNECTIONS, read_replica_url(),
+                connection_factory=PreparedConnection, options=READ_ONLY_OPTIONS, **db_connect_kwargs()
+            )
+            print(f"DEBUG DB: Pool da réplica de leitura criado (até {DB_READ_POOL_MAX_CONNECTIONS} ligações).")
+        return _read_pool
+
+def _borrow_replica_connection():
+    """Empresta uma ligação da réplica se estiver configurada, disponível e em dia; senão retorna None."""
+    if not read_replica_url() or replica_down():
+        return None
+    _read_pool_slots.acquire()
+    conn = None
+    try:
+        pool = _get_read_pool()
+        conn = pool.getconn()
+        if replica_is_fresh(conn):
+            return conn
+        pool.putconn(conn)
+    except Exception as e:
+        mark_replica_down(e)
+        if conn is not None:
+            _read_pool.putconn(conn, close=True)
+    _read_pool_slots.release()
+    return None
+
+@contextmanager
+def read_connection():
+    """
+    Ligação para consultas de relatório: da réplica de leitura se estiver em dia, senão do pool do primário.
+    Uma falha da réplica desvia as leituras seguintes para o primário. Chamada bloqueante.
+    """
+    conn = _borrow_replica_connection()
+    if conn is None:
+        with connection() as conn:
+            yield conn
+        return
+    discard = True
+    try:
+        yield conn
+        conn.commit()
+        discard = False
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        mark_replica_down(e)
+        raise
+    finally:
+        _read_pool.putconn(conn, close=discard or conn.closed != 0)
+        _read_pool_slots.release()
+
+def _read_report(name: str, params: tuple) -> list[tuple]:
+    """Executa uma consulta de relatório; se a réplica falhar a meio, repete-a uma vez no primário."""
+    try:
+        with read_connection() as conn, conn.cursor() as cursor:
+            conn.execute_prepared(cursor, name, params)
+            return cursor.fetchall()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        if not replica_down():
+            raise
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, name, params)
+        return cursor.fetchall()
+
+def close_pool():
+    """Fecha todas as ligações dos pools (no encerramento do bot)."""
+    global _pool, _read_pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+        if _read_pool is not None:
+            _read_pool.closeall()
+            _read_pool = None
+
+# --- Picagens ---
+
+def get_open_punches() -> dict:
+    """
+    Retorna os pontos abertos (utilizadores em serviço), no formato {(user_id, guild_id): punch_in_time}.
+    Levanta a exceção se a base de dados estiver inacessível, para o chamador manter o estado que já tem.
+    """
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'open_punches')
+        return {(user_id, guild_id): punch_in_time for user_id, guild_id, punch_in_time in cursor}
+
+def apply_punch_in_entry(entry: dict) -> bool:
+    """
+    Aplica no PostgreSQL uma entrada de serviço do journal local (ver punch_journal.py).
+    É idempotente: uma entrada já aplicada (mesmo journal_id) ou um utilizador já em serviço são ignorados.
+    Retorna True se a linha foi inserida, False se foi ignorada como duplicada.
+    Levanta a exceção em caso de falha de ligação, para o journal tentar de novo mais tarde.
+    """
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'punch_in', (entry['user_id'], entry['username'], entry['ts'], entry['guild_id'], entry['id']))
+        inserted = cursor.rowcount > 0
+        if inserted:
+            publish_invalidation(
+                cursor, 'punches', user_id=entry['user_id'], guild_id=entry['guild_id'], op='in',
+                punch_in_time=entry['ts'].isoformat()
+            )
+        return inserted
+
+def apply_punch_out_entry(entry: dict) -> bool:
+    """
+    Aplica no PostgreSQL uma entrada de saída do journal local (ver punch_journal.py).
+    Fecha o último ponto aberto do utilizador iniciado antes da saída; é idempotente pelo journal_id da saída.
+    Retorna True se um ponto foi fechado, False se a entrada foi ignorada como duplicada.
+    Levanta a exceção em caso de falha de ligação, para o journal tentar de novo mais tarde.
+    """
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'punch_out', (entry['user_id'], entry['guild_id'], entry['ts'], entry['id']))
+        row = cursor.fetchone()
+        if row is None:
+            return False
+        # A sessão completa vai na notificação: as outras instâncias somam-na ao ranking sem o reconstruir
+        username, punch_in_time = row
+        # entry['ts'] já vem convertido para datetime por punch_journal.replay_pending
+        publish_invalidation(
+            cursor, 'punches', user_id=entry['user_id'], guild_id=entry['guild_id'], op='out',
+            session_id=entry['id'], username=username, punch_in_time=punch_in_time.isoformat(),
+            seconds=(entry['ts'] - punch_in_time).total_seconds()
+        )
+        return True
+
+def get_punches_for_period(start_time: datetime, end_time: datetime, guild_id: int = None) -> list[PunchRecord]:
+    """
+    Retorna os pontos fechados iniciados dentro do período (datas sem fuso são tratadas como UTC;
+    uma data de fim sem fuso inclui o dia inteiro). Com guild_id, só os pontos desse servidor
+    (e os registos antigos sem servidor).
+    """
+    start = start_time.replace(tzinfo=timezone.utc) if start_time.tzinfo is None else start_time
+    end = end_time.replace(hour=23, minute=59, second=59, microsecond=999999, tzinfo=timezone.utc) if end_time.tzinfo is None else end_time
+    try:
+        return list(map(PunchRecord._make, _read_report('punches_for_period', (start, end, guild_id))))
+    except Exception as e:
+        print(f"ERRO: Falha ao obter pontos para período no PostgreSQL: {e}")
+        return []
+
+# --- Tickets ---
+
+def get_open_tickets(guild_id: int = None) -> list[TicketRecord]:
+    """Retorna os tickets abertos (de um servidor, ou de todos)."""
+    try:
+        with connection() as conn, conn.cursor() as cursor:
+            conn.execute_prepared(cursor, 'open_tickets', (guild_id,))
+            return list(map(TicketRecord._make, cursor))
+    except Exception as e:
+        print(f"ERRO: Falha ao obter tickets abertos do DB PostgreSQL: {e}")
+        return []
+
+def get_open_ticket(channel_id: int) -> TicketRecord | None:
+    """Retorna o ticket aberto no canal indicado, ou None se o canal não for um ticket."""
+    try:
+        with connection() as conn, conn.cursor() as cursor:
+            conn.execute_prepared(cursor, 'open_ticket', (channel_id,))
+            row = cursor.fetchone()
+            return TicketRecord._make(row) if row else None
+    except Exception as e:
+        print(f"ERRO: Falha ao obter ticket do canal {channel_id} do DB PostgreSQL: {e}")
+        return None
+
+# A criação de um ticket tem três passos: reserve_ticket (antes de criar o canal no Discord),
+# attach_ticket_channel (depois de o canal existir) ou, se algo falhar, release_ticket_reservation.
+
+def reserve_ticket(guild_id: int, creator_id: int, creator_name: str, category: str) -> tuple[str, int | None]:
+    """
+    Reserva atomicamente a vaga (criador, categoria) antes de o canal ser criado.
+    Retorna ('reserved', ticket_id), ('exists', channel_id do ticket dessa categoria, ou None se ainda está a ser criado)
+    ou ('limit', None) se o criador já tem TICKET_MAX_OPEN_PER_USER tickets abertos.
+    Levanta a exceção em caso de falha da base de dados (o ticket não deve ser criado sem reserva).
+    """
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'lock_ticket_creator', (guild_id, creator_id))
+        conn.execute_prepared(cursor, 'discard_stale_reservations', (guild_id, creator_id, timedelta(seconds=TICKET_RESERVATION_TIMEOUT_SECONDS)))
+        conn.execute_prepared(cursor, 'creator_tickets', (guild_id, creator_id))
+        open_tickets = dict(cursor.fetchall())
+        if category in open_tickets:
+            return 'exists', open_tickets[category]
+        if len(open_tickets) >= TICKET_MAX_OPEN_PER_USER:
+            return 'limit', None
+        conn.execute_prepared(cursor, 'reserve_ticket', (guild_id, creator_id, creator_name, category, datetime.now(timezone.utc)))
+        row = cursor.fetchone()
+        # Sem linha: um ticket legado sem servidor ocupa a vaga pelo índice único (não deve acontecer com o lock)
+        return ('reserved', row[0]) if row else ('exists', None)
+
+def attach_ticket_channel(ticket_id: int, channel_id: int, guild_id: int) -> bool:
+    """Associa o canal criado à reserva e avisa as outras instâncias. Retorna False se a reserva já não existe."""
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'attach_ticket_channel', (ticket_id, channel_id))
+        attached = cursor.rowcount > 0
+        if attached:
+            publish_invalidation(cursor, 'tickets', action='add', channel_id=channel_id, guild_id=guild_id)
+        return attached
+
+def release_ticket_reservation(ticket_id: int):
+    """Desfaz uma reserva cuja criação falhou (o canal não foi criado ou já foi apagado)."""
+    try:
+        with connection() as conn, conn.cursor() as cursor:
+            conn.execute_prepared(cursor, 'release_ticket_reservation', (ticket_id,))
+            row = cursor.fetchone()
+            if row and row[0] is not None:
+                # O canal chegou a ser anunciado às outras instâncias
+                publish_invalidation(cursor, 'tickets', action='remove', channel_id=row[0], guild_id=row[1])
+    except Exception as e:
+        print(f"ERRO: Falha ao libertar a reserva de ticket {ticket_id} (expira em {TICKET_RESERVATION_TIMEOUT_SECONDS}s): {e}")
+
+def remove_ticket(channel_id: int):
+    """Remove o ticket e as mensagens guardadas do canal."""
+    try:
+        with connection() as conn, conn.cursor() as cursor:
+            conn.execute_prepared(cursor, 'delete_ticket', (channel_id,))
+            publish_invalidation(cursor, 'tickets', action='remove', channel_id=channel_id)
+    except Exception as e:
+        print(f"ERRO: Falha ao remover ticket do DB PostgreSQL para {channel_id}: {e}")
+
+def touch_ticket_activity(activity: dict[int, datetime]):
+    """Grava a última atividade de vários tickets ({channel_id: data}) numa só instrução. Levanta a exceção se falhar."""
+    if not activity:
+        return
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'touch_ticket_activity', (list(activity.keys()), list(activity.values())))
+
+def get_idle_tickets(idle_since: datetime) -> list[IdleTicket]:
+    """Retorna os tickets sem atividade desde a data indicada (usa o índice de last_activity_at). Levanta a exceção se falhar."""
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'idle_tickets', (idle_since,))
+        return list(map(IdleTicket._make, cursor))
+
+def mark_ticket_warned(channel_id: int, warned_at: datetime):
+    """Regista que o ticket recebeu o aviso de inatividade."""
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'mark_ticket_warned', (channel_id, warned_at))
+
+# --- Relatórios agendados ---
+# Os totais vêm de 'duty_daily_totals' (mantida por triggers em 'punches'): um relatório soma no máximo
+# um registo por oficial e por dia, independentemente do número de picagens do período.
+
+def get_duty_totals_for_days(guild_id: int, start_day: date, end_day: date) -> list[DutyTotal]:
+    """
+    Totais de serviço por oficial das sessões iniciadas em [start_day, end_day) (dias no fuso horário de exibição),
+    do servidor indicado e dos registos antigos sem servidor, do maior para o menor. Levanta a exceção se falhar.
+    """
+    return list(map(DutyTotal._make, _read_report('duty_totals_for_days', (guild_id, start_day, end_day))))
+
+def get_last_report_run(guild_id: int, period: str) -> date | None:
+    """Início do último período já publicado (ou reclamado) para o servidor, ou None se nunca correu."""
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'last_report_run', (guild_id, period))
+        return cursor.fetchone()[0]
+
+def claim_report_run(guild_id: int, period: str, period_start: date, period_end: date) -> bool:
+    """Reclama a publicação de um período. Retorna False se já foi reclamada (por esta ou por outra instância)."""
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'claim_report_run', (guild_id, period, period_start, period_end))
+        return cursor.rowcount > 0
+
+def complete_report_run(guild_id: int, period: str, period_start: date, message_id: int | None):
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'complete_report_run', (guild_id, period, period_start, message_id))
+
+def release_report_run(guild_id: int, period: str, period_start: date):
+    """Desfaz uma reclamação não completada (o envio falhou), para o período ser tentado de novo."""
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'release_report_run', (guild_id, period, period_start))
+
+def expire_report_claims(older_than: timedelta) -> int:
+    """Liberta as reclamações que nunca foram completadas (instância parada a meio do envio). Retorna quantas."""
+    with connection() as conn, conn.cursor() as cursor:
+        conn.execute_prepared(cursor, 'expire_report_claims', (older_than,))
+        return cursor.rowcount
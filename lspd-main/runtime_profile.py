@@ -0,0 +1,77 @@
+import discord
+
+from config import LEAN_MODE, SLASH_ONLY_MODE
+
+# Intents de que cada cog precisa para funcionar (chave: nome do módulo em cogs/), além das dos comandos.
+# As interações (botões, menus e comandos de barra) não precisam de intents. Ao criar um cog novo, acrescente aqui as suas intents.
+COG_INTENTS = {
+    'coordinator': (),
+    'diagnostics': ('guilds',),
+    'guild_settings': ('guilds',),
+    'punch_card': ('guilds',),
+    'ranking': ('guilds',),
+    'reports': ('guilds',),
+    'statistics': ('guilds',),
+    'status_changer': ('guilds',),
+    'transcripts': ('guilds',),
+    # As mensagens dos canais de ticket são guardadas à medida que chegam (transcritos sem pedidos à API)
+    'tickets': ('guilds', 'guild_messages', 'message_content'),
+}
+
+# Intents usadas pelos comandos definidos diretamente em main.py (!mascote, !clear, !clearpunchdb, !reload)
+MAIN_INTENTS = ('guilds',)
+
+# Intents necessárias para os comandos de prefixo (desligadas no modo só slash)
+PREFIX_INTENTS = ('guild_messages', 'message_content')
+
+def build_intents(extensions: list[str]) -> discord.Intents:
+    """
+    Intents do bot. No modo lean, apenas as necessárias para os cogs indicados (cogs.<nome>);
+    caso contrário, o conjunto completo usado historicamente pelo bot.
+    """
+    required = set(MAIN_INTENTS)
+    if not SLASH_ONLY_MODE:
+        required.update(PREFIX_INTENTS)
+    for extension in extensions:
+        name = extension.split('.')[-1]
+        # Cogs sem entrada no mapa recebem as intents padrão, por precaução
+        required.update(COG_INTENTS.get(name, [flag for flag, enabled in discord.Intents.default() if enabled]))
+
+    if not LEAN_MODE:
+        intents = discord.Intents.default()
+        intents.members = True
+        # No modo só slash, message_content só fica ativa se algum cog precisar dela
+        intents.message_content = 'message_content' in required
+        intents.reactions = True
+        intents.presences = True
+        return intents
+
+    intents = discord.Intents.none()
+    for flag in required:
+        setattr(intents, flag, True)
+    return intents
+
+def build_member_cache_flags(intents: discord.Intents) -> discord.MemberCacheFlags:
+    """No modo lean não há cache de membros (exceto o próprio bot, que o discord.py guarda sempre)."""
+    if LEAN_MODE:
+        return discord.MemberCacheFlags.none()
+    return discord.MemberCacheFlags.from_intents(intents)
+
+def enabled_intent_names(intents: discord.Intents) -> list[str]:
+    return [flag for flag, enabled in intents if enabled]
+
+def process_rss_bytes() -> int | None:
+    """Memória residente (RSS) atual do processo, em bytes. None se não for possível obtê-la."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # Em Linux ru_maxrss vem em KiB (é o pico, não o valor atual)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+class StartupProfiler:
+    """
+    Regista a duração de cada fase do arranque (imports, base de dados, cogs, gateway, Views, sync)
+    e imprime um relatório de tempos uma única vez, no primeiro on_ready.
+    """
+
+    def __init__(self):
+        # Referência: o momento em que este módulo foi importado (logo no início de main.py)
+        self.started_at = time.perf_counter()
+        self._phases: list[tuple[str, float, float]] = []  # (nome, início relativo, duração), em segundos
+        self._open_phases: set[str] = set()
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name: str):
+        """Mede um bloco de código como uma fase do arranque. Depois do relatório, não regista nada."""
+        if self.reported:
+            yield
+            return
+        start = time.perf_counter()
+        self._open_phases.add(name)
+        try:
+            yield
+        finally:
+            self._open_phases.discard(name)
+            self._phases.append((name, start - self.started_at, time.perf_counter() - start))
+
+    def mark(self, name: str, start: float):
+        """Regista uma fase cujo início (time.perf_counter()) foi medido noutro ponto do código."""
+        if not self.reported:
+            self._phases.append((name, start - self.started_at, time.perf_counter() - start))
+
+    async def wait_until_settled(self, timeout: float = 30.0):
+        """Espera que as fases em curso (por exemplo, as Views dos cogs no on_ready) terminem."""
+        deadline = time.perf_counter() + timeout
+        await asyncio.sleep(0)
+        while self._open_phases and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+
+    def report(self) -> str:
+        """Gera o relatório de tempos de arranque e marca-o como emitido."""
+        self.reported = True
+        total = time.perf_counter() - self.started_at
+        lines = ["Relatório de tempos de arranque:"]
+        for name, offset, duration in sorted(self._phases, key=lambda phase: phase[1]):
+            lines.append(f"  {name:<32} +{offset * 1000:>8.0f} ms  {duration * 1000:>8.0f} ms")
+        if self._open_phases:
+            lines.append(f"  (ainda em curso: {', '.join(sorted(self._open_phases))})")
+        lines.append(f"  {'total até ao on_ready':<32} {'':>10}  {total * 1000:>8.0f} ms")
+        return "\n".join(lines)
+
+startup_profiler = StartupProfiler()
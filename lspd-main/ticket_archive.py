@@ -0,0 +1,185 @@
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import NamedTuple
+
+import aiohttp
+import discord
+
+from config import (
+    TICKET_ARCHIVE_CONCURRENCY, TICKET_ARCHIVE_MAX_FILE_BYTES,
+    TICKET_ARCHIVE_SPOOL_BYTES, TICKET_ARCHIVE_DOWNLOAD_TIMEOUT_SECONDS
+)
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+# --- Arquivo dos anexos de um ticket ---
+# Os anexos são descarregados em paralelo (no máximo TICKET_ARCHIVE_CONCURRENCY de cada vez), cada um para um
+# SpooledTemporaryFile próprio, e copiados um a um para o .zip, que também é um SpooledTemporaryFile.
+# A memória usada fica limitada pelos limiares de spool, e não pelo tamanho total dos anexos.
+
+CHUNK_SIZE = 64 * 1024
+# Tipos que já vêm comprimidos: são guardados no .zip sem nova compressão
+_STORED_PREFIXES = ('image/', 'video/', 'audio/')
+_STORED_TYPES = {'application/zip', 'application/gzip', 'application/x-7z-compressed', 'application/x-rar-compressed', 'application/pdf'}
+
+class AttachmentTooLarge(Exception):
+    pass
+
+class StoredAttachment(NamedTuple):
+    """Anexo guardado na tabela ticket_messages (os mesmos atributos de discord.Attachment usados aqui)."""
+    id: int
+    filename: str
+    url: str
+    size: int
+    content_type: str | None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'StoredAttachment':
+        return cls(data['id'], data['filename'], data['url'], data['size'], data.get('content_type'))
+
+async def refresh_attachment_urls(http: discord.http.HTTPClient, attachments: list[StoredAttachment]) -> list[StoredAttachment]:
+    """
+    Os links guardados expiram ao fim de algum tempo: pede ao Discord links novos (50 por pedido).
+    Em caso de erro, mantém os links guardados.
+    """
+    refreshed = {}
+    urls = [attachment.url for attachment in attachments]
+    for start in range(0, len(urls), 50):
+        try:
+            data = await http.request(
+                discord.http.Route('POST', '/attachments/refresh-urls'),
+                json={'attachment_urls': urls[start:start + 50]}
+            )
+            for item in data.get('refreshed_urls', []):
+                refreshed[item['original']] = item['refreshed']
+        except Exception as e:
+            print(log_message("WARNING", f"Não foi possível renovar os links dos anexos: {e}", "⚠️"))
+            break
+    return [attachment._replace(url=refreshed.get(attachment.url, attachment.url)) for attachment in attachments]
+
+@dataclass
+class AttachmentArchive:
+    """Resultado do arquivo: o .zip (ou None, se nada foi arquivado) e o destino de cada anexo."""
+    file: tempfile.SpooledTemporaryFile | None = None
+    size: int = 0
+    archived: dict[int, str] = field(default_factory=dict)  # attachment.id -> nome no .zip
+    skipped: dict[int, str] = field(default_factory=dict)   # attachment.id -> motivo
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def _safe_name(index: int, filename: str) -> str:
+    name = re.sub(r'[^\w.\-]+', '_', filename).strip('._') or 'anexo'
+    return f"{index:04d}_{name[:100]}"
+
+def _format_size(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
+def _compress_type(content_type: str | None) -> int:
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type.startswith(_STORED_PREFIXES) or content_type in _STORED_TYPES:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+async def _download(session: aiohttp.ClientSession, attachment: discord.Attachment, max_bytes: int) -> tempfile.SpooledTemporaryFile:
+    """Descarrega o anexo em blocos para um SpooledTemporaryFile, abortando se ultrapassar max_bytes."""
+    buffer = tempfile.SpooledTemporaryFile(max_size=TICKET_ARCHIVE_SPOOL_BYTES)
+    try:
+        async with session.get(attachment.url) as response:
+            response.raise_for_status()
+            received = 0
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                received += len(chunk)
+                if received > max_bytes:
+                    raise AttachmentTooLarge()
+                buffer.write(chunk)
+        buffer.seek(0)
+        return buffer
+    except BaseException:
+        buffer.close()
+        raise
+
+def _write_entry(archive: zipfile.ZipFile, name: str, source, compress_type: int):
+    """Copia um anexo descarregado para o .zip (chamada bloqueante: a compressão corre numa thread)."""
+    info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = compress_type
+    with archive.open(info, 'w', force_zip64=True) as entry:
+        shutil.copyfileobj(source, entry, CHUNK_SIZE)
+
+async def archive_attachments(attachments: list[discord.Attachment | StoredAttachment], size_limit: int) -> AttachmentArchive:
+    """
+    Descarrega os anexos em paralelo e junta-os num .zip com no máximo size_limit bytes
+    (o limite de upload do servidor). Anexos que não cabem, grandes demais ou que falham são registados em skipped.
+    """
+    result = AttachmentArchive()
+    if not attachments:
+        return result
+
+    per_file_limit = min(TICKET_ARCHIVE_MAX_FILE_BYTES, size_limit)
+    semaphore = asyncio.Semaphore(TICKET_ARCHIVE_CONCURRENCY)
+    zip_lock = asyncio.Lock()
+    zip_buffer = tempfile.SpooledTemporaryFile(max_size=TICKET_ARCHIVE_SPOOL_BYTES)
+    archive = zipfile.ZipFile(zip_buffer, 'w', compression=zipfile.ZIP_DEFLATED)
+    # Margem para o diretório central do .zip (cabeçalhos de cada entrada)
+    reserved = 1024
+
+    async def process(index: int, attachment: discord.Attachment, session: aiohttp.ClientSession):
+        nonlocal reserved
+        if attachment.size > per_file_limit:
+            result.skipped[attachment.id] = f"excede o limite de {_format_size(per_file_limit)}"
+            return
+        async with semaphore:
+            try:
+                buffer = await _download(session, attachment, per_file_limit)
+            except AttachmentTooLarge:
+                result.skipped[attachment.id] = f"excede o limite de {_format_size(per_file_limit)}"
+                return
+            except Exception as e:
+                result.skipped[attachment.id] = f"falha no download ({e.__class__.__name__})"
+                return
+
+        name = _safe_name(index, attachment.filename)
+        try:
+            size = buffer.seek(0, os.SEEK_END)
+            buffer.seek(0)
+            async with zip_lock:
+                # O tamanho descomprimido é o pior caso: se não couber no limite, o anexo fica de fora
+                if zip_buffer.tell() + reserved + size + 512 > size_limit:
+                    result.skipped[attachment.id] = "não cabe no limite de upload do servidor"
+                    return
+                await asyncio.to_thread(_write_entry, archive, name, buffer, _compress_type(attachment.content_type))
+                reserved += 512
+                result.archived[attachment.id] = name
+        finally:
+            buffer.close()
+
+    timeout = aiohttp.ClientTimeout(total=TICKET_ARCHIVE_DOWNLOAD_TIMEOUT_SECONDS)
+    try:
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            await asyncio.gather(*(process(index, attachment, session) for index, attachment in enumerate(attachments, start=1)))
+        archive.close()
+    except BaseException:
+        archive.close()
+        zip_buffer.close()
+        raise
+
+    if not result.archived:
+        zip_buffer.close()
+        return result
+
+    result.size = zip_buffer.tell()
+    zip_buffer.seek(0)
+    result.file = zip_buffer
+    print(log_message("INFO", f"{len(result.archived)} anexo(s) arquivado(s) ({_format_size(result.size)}), {len(result.skipped)} ignorado(s)", "🗜️"))
+    return result
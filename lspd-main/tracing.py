@@ -0,0 +1,370 @@
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import discord
+import discord.webhook.async_
+import psycopg2.extensions
+
+from config import (
+    INSTANCE_ID, TRACING_ENABLED, TRACE_SAMPLE_RATE, TRACE_SLOW_THRESHOLD_MS,
+    TRACE_FILE, TRACE_FILE_MAX_BYTES, TRACE_FILE_BACKUPS
+)
+
+# Função auxiliar para formatar logs
+def log_message(level: str, message: str, emoji: str = "") -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] [{level.upper():<7}] {emoji} {message}"
+
+# --- Tracing por interação ---
+# Cada interação (botão, menu, modal, comando de barra) e cada comando de prefixo abre um span raiz.
+# Dentro dele, cada consulta à base de dados (cursor TracingCursor), cada pedido HTTP ao Discord e cada
+# envio da fila de saída é um span filho. O span atual segue num contextvar, por isso passa para as tarefas
+# criadas a partir da interação e para as threads de asyncio.to_thread.
+#
+# Amostragem: no fim do span raiz, o trace é guardado se for mais lento do que TRACE_SLOW_THRESHOLD_MS,
+# se tiver terminado em erro, ou numa fração TRACE_SAMPLE_RATE dos restantes. Os traces guardados são escritos
+# em TRACE_FILE (uma linha JSON no formato OTLP por trace, como o file exporter do OpenTelemetry Collector),
+# com rotação por tamanho, numa thread própria.
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+MAX_STATEMENT_LENGTH = 500
+
+_current_span: contextvars.ContextVar['Span | None'] = contextvars.ContextVar('current_span', default=None)
+
+class _Trace:
+    __slots__ = ('trace_id', 'spans', 'keep')
+
+    def __init__(self):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans: list[Span] = []
+        self.keep: bool | None = None  # Decidido no fim do span raiz
+
+class Span:
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'kind', 'start_ns', 'end_ns', 'attributes', 'status', 'status_message')
+
+    def __init__(self, trace: _Trace, parent: 'Span | None', name: str, kind: int, attributes: dict | None):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = 0
+        self.status_message = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"[:500]
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            'status': {'code': self.status, **({'message': self.status_message} if self.status_message else {})},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        encoded = {'boolValue': value}
+    elif isinstance(value, int):
+        encoded = {'intValue': str(value)}  # int64 vai como texto no JSON do OTLP
+    elif isinstance(value, float):
+        encoded = {'doubleValue': value}
+    else:
+        encoded = {'stringValue': str(value)}
+    return {'key': key, 'value': encoded}
+
+class _TraceFileWriter:
+    """Escreve as linhas numa thread própria (o event loop não espera pelo disco), com rotação por tamanho."""
+
+    def __init__(self, path: str, max_bytes: int, backups: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def write(self, line: str):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                self._thread.start()
+        self._queue.put(line)
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _run(self):
+        f = None
+        while True:
+            line = self._queue.get()
+            if line is None:
+                break
+            try:
+                if f is not None and f.tell() + len(line) > self.max_bytes:
+                    f.close()
+                    f = None
+                    self._rotate()
+                if f is None:
+                    f = open(self.path, 'a', encoding='utf-8')
+                f.write(line)
+                f.flush()
+            except OSError as e:
+                print(log_message("ERROR", f"Falha ao escrever traces em {self.path}: {e}", "❌"))
+        if f is not None:
+            f.close()
+
+class Tracer:
+    def __init__(self, enabled: bool = TRACING_ENABLED, sample_rate: float = TRACE_SAMPLE_RATE,
+                 slow_threshold_ms: float = TRACE_SLOW_THRESHOLD_MS):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.writer = _TraceFileWriter(TRACE_FILE, TRACE_FILE_MAX_BYTES, TRACE_FILE_BACKUPS)
+        self.exported = 0
+        self.dropped = 0
+        self._installed = False
+
+    # --- API dos spans ---
+
+    def current_span(self) -> Span | None:
+        return _current_span.get()
+
+    @contextmanager
+    def root_span(self, name: str, attributes: dict | None = None, kind: int = SPAN_KIND_SERVER):
+        """Abre um trace novo (uma interação ou um comando). Com o tracing desligado, não faz nada."""
+        if not self.enabled:
+            yield None
+            return
+        with self._span(_Trace(), None, name, kind, attributes) as span:
+            yield span
+
+    @contextmanager
+    def span(self, name: str, attributes: dict | None = None, kind: int = SPAN_KIND_INTERNAL):
+        """Abre um span filho do span atual. Fora de um trace (por exemplo, numa tarefa de fundo), não faz nada."""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        with self._span(parent.trace, parent, name, kind, attributes) as span:
+            yield span
+
+    @contextmanager
+    def attach(self, span: Span | None):
+        """Torna `span` o span atual (por exemplo, num worker que executa um pedido feito noutra tarefa)."""
+        token = _current_span.set(span)
+        try:
+            yield
+        finally:
+            _current_span.reset(token)
+
+    @contextmanager
+    def _span(self, trace: _Trace, parent: Span | None, name: str, kind: int, attributes: dict | None):
+        span = Span(trace, parent, name, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self._finish(span, is_root=parent is None)
+
+    def _finish(self, span: Span, is_root: bool):
+        trace = span.trace
+        if trace.keep is False:
+            return
+        if trace.keep is True:
+            # Span terminado depois da raiz (por exemplo, um envio ainda na fila de saída): exportado à parte
+            self._export([span])
+            return
+        trace.spans.append(span)
+        if not is_root:
+            return
+        trace.keep = (
+            span.duration_ms >= self.slow_threshold_ms
+            or any(s.status == STATUS_ERROR for s in trace.spans)
+            or random.random() < self.sample_rate
+        )
+        if trace.keep:
+            self._export(trace.spans)
+        else:
+            self.dropped += 1
+        trace.spans = []
+
+    def _export(self, spans: list[Span]):
+        payload = {'resourceSpans': [{
+            'resource': {'attributes': [
+                _otlp_attribute('service.name', 'lspd-bot'),
+                _otlp_attribute('service.instance.id', INSTANCE_ID),
+            ]},
+            'scopeSpans': [{'scope': {'name': 'lspd.tracing'}, 'spans': [span.to_otlp() for span in spans]}],
+        }]}
+        self.writer.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        self.exported += 1
+
+    def close(self):
+        self.writer.close()
+
+    # --- Instrumentação do discord.py ---
+
+    def install(self, bot):
+        """
+        Instrumenta o bot: spans raiz para os callbacks de Views e Modals e para os comandos de barra,
+        e spans de cliente para os pedidos HTTP do bot e das respostas às interações (webhooks).
+        Os comandos de prefixo são instrumentados em LSPDBot.invoke (main.py).
+        """
+        if not self.enabled or self._installed:
+            return
+        self._installed = True
+        tracer = self
+
+        # Os métodos internos abaixo são os do discord.py 2.3 (versão fixada em requirements.txt)
+        original_view_task = discord.ui.View._scheduled_task
+
+        async def view_task(view, item, interaction):
+            custom_id = getattr(item, 'custom_id', None)
+            with tracer.root_span(f"interaction {custom_id or type(item).__name__}", _interaction_attributes(interaction, view=type(view).__name__)):
+                return await original_view_task(view, item, interaction)
+        discord.ui.View._scheduled_task = view_task
+
+        original_modal_task = discord.ui.Modal._scheduled_task
+
+        async def modal_task(modal, interaction, components):
+            with tracer.root_span(f"modal {modal.custom_id}", _interaction_attributes(interaction, view=type(modal).__name__)):
+                return await original_modal_task(modal, interaction, components)
+        discord.ui.Modal._scheduled_task = modal_task
+
+        original_tree_call = bot.tree._call
+
+        async def tree_call(interaction):
+            name = interaction.command.qualified_name if interaction.command else (interaction.data or {}).get('name', '?')
+            with tracer.root_span(f"/{name}", _interaction_attributes(interaction)):
+                return await original_tree_call(interaction)
+        bot.tree._call = tree_call
+
+        original_request = bot.http.request
+
+        async def http_request(route, **kwargs):
+            with tracer.span(f"{route.method} {route.path}", _route_attributes(route), kind=SPAN_KIND_CLIENT) as span:
+                try:
+                    return await original_request(route, **kwargs)
+                except discord.HTTPException as e:
+                    if span:
+                        span.set_attribute('http.status_code', e.status)
+                    raise
+        bot.http.request = http_request
+
+        original_webhook_request = discord.webhook.async_.AsyncWebhookAdapter.request
+
+        async def webhook_request(adapter, route, session, **kwargs):
+            with tracer.span(f"{route.method} {route.path}", _route_attributes(route), kind=SPAN_KIND_CLIENT):
+                return await original_webhook_request(adapter, route, session, **kwargs)
+        discord.webhook.async_.AsyncWebhookAdapter.request = webhook_request
+
+        print(log_message("INFO", f"Tracing ativo: amostragem {self.sample_rate:.0%}, sempre acima de {self.slow_threshold_ms:.0f} ms, em {TRACE_FILE}", "🧵"))
+
+def _interaction_attributes(interaction: discord.Interaction, **extra) -> dict:
+    return {
+        'discord.interaction.id': interaction.id,
+        'discord.interaction.type': interaction.type.name if interaction.type else None,
+        'discord.guild.id': interaction.guild_id,
+        'discord.channel.id': interaction.channel_id,
+        'discord.user.id': interaction.user.id if interaction.user else None,
+        **{f"discord.{key}": value for key, value in extra.items()},
+    }
+
+def _route_attributes(route) -> dict:
+    return {
+        'http.method': route.method,
+        'http.route': route.path,
+        'discord.channel.id': route.channel_id,
+        'discord.guild.id': route.guild_id,
+    }
+
+class TracingCursor(psycopg2.extensions.cursor):
+    """Cursor que abre um span por consulta, quando a chamada faz parte de um trace."""
+
+    def execute(self, query, vars=None):
+        # Fora de um trace (tarefas de fundo, arranque), a consulta segue direta, sem preparar os atributos do span
+        if tracer.current_span() is None:
+            return super().execute(query, vars)
+        with tracer.span(_statement_name(query), _statement_attributes(query), kind=SPAN_KIND_CLIENT) as span:
+            result = super().execute(query, vars)
+            span.set_attribute('db.rows_affected', self.rowcount)
+            return result
+
+    def executemany(self, query, vars_list):
+        if tracer.current_span() is None:
+            return super().executemany(query, vars_list)
+        with tracer.span(_statement_name(query), _statement_attributes(query), kind=SPAN_KIND_CLIENT):
+            return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        if tracer.current_span() is None:
+            return super().copy_expert(sql, file, size)
+        with tracer.span("COPY", _statement_attributes(sql), kind=SPAN_KIND_CLIENT):
+            return super().copy_expert(sql, file, size)
+
+def db_connect_kwargs() -> dict:
+    """Argumentos extra de psycopg2.connect: com o tracing ligado, as ligações usam o TracingCursor."""
+    return {'cursor_factory': TracingCursor} if TRACING_ENABLED else {}
+
+def _statement_name(query) -> str:
+    text = query.decode() if isinstance(query, bytes) else str(query)
+    words = text.split(None, 2)
+    if not words:
+        return "SQL"
+    # Consultas preparadas do repositório: "EXECUTE punch_out(...)" fica "EXECUTE punch_out"
+    if words[0].upper() in ('EXECUTE', 'PREPARE') and len(words) > 1:
+        return f"{words[0].upper()} {words[1].split('(')[0]}"
+    return words[0].upper()
+
+def _statement_attributes(query) -> dict:
+    text = query.decode() if isinstance(query, bytes) else str(query)
+    return {'db.system': 'postgresql', 'db.statement': " ".join(text.split())[:MAX_STATEMENT_LENGTH]}
+
+tracer = Tracer()